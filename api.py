@@ -0,0 +1,229 @@
+import json
+from datetime import datetime
+
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    current_app,
+    request,
+    stream_with_context,
+)
+from sqlalchemy import select
+
+import genres
+import geo
+import scheduling
+from cache import cache
+from instrumentation import serializing
+from models import Artist, Genre, Venue, db
+from pagination import paginate
+from queries import (
+    artist_listing,
+    artist_page,
+    show_listing,
+    venue_listing,
+    venue_page,
+)
+from replicas import replica_reads
+from search import get_search
+
+# ----------------------------------------------------------------------------#
+# JSON API, v1.
+#
+# Collections are keyset-paginated like the HTML listings:
+#   {"data": [...], "next_cursor": "...", "prev_cursor": null}
+# With ?stream=1 (or Accept: application/x-ndjson) the whole collection is
+# sent instead as newline-delimited JSON, read through a server-side cursor.
+# ----------------------------------------------------------------------------#
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+NDJSON = "application/x-ndjson"
+STREAM_BATCH_SIZE = 500
+
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    return json.dumps(payload, separators=(",", ":"), default=json_default)
+
+
+def json_response(payload, status=200):
+    with serializing():
+        body = dumps(payload)
+    return Response(body, status=status, mimetype="application/json")
+
+
+def wants_stream():
+    if request.args.get("stream") in ("1", "true"):
+        return True
+    # JSON first, so that ties (e.g. "*/*") go to it: only a client that
+    # prefers NDJSON gets a stream.
+    best = request.accept_mimetypes.best_match(["application/json", NDJSON])
+    return best == NDJSON
+
+
+def stream_rows(stmt, keys):
+    """Stream every row of ``stmt`` as NDJSON, one chunk per fetched batch."""
+    stmt = stmt.order_by(*keys).execution_options(yield_per=STREAM_BATCH_SIZE)
+
+    def generate():
+        result = db.session.execute(stmt).mappings()
+        for rows in result.partitions():
+            yield "".join(dumps(dict(row)) + "\n" for row in rows)
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON)
+
+
+def collection(stmt, keys):
+    if wants_stream():
+        return stream_rows(stmt, keys)
+    page = paginate(stmt, keys=keys, cursor=request.args.get("cursor"))
+    return json_response(
+        {
+            "data": [dict(row._mapping) for row in page],
+            "next_cursor": page.next_cursor,
+            "prev_cursor": page.prev_cursor,
+        }
+    )
+
+
+@api.route("/venues")
+@replica_reads
+def venues():
+    args = request.args
+    return collection(
+        *venue_listing(args.get("sort"), args.get("genre"), args.get("state"))
+    )
+
+
+@api.route("/venues/near")
+@replica_reads
+def venues_near():
+    """Venues near ?lat=&lng= (or ?city=&state=) within ?radius= km, nearest
+    first, each with distance_km and its next upcoming shows."""
+    try:
+        point = geo.search_point(request.args)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    cap = current_app.config["NEAR_RESULT_LIMIT"]
+    limit = max(1, min(request.args.get("limit", cap, type=int), cap))
+    latitude, longitude, radius = point
+    data = geo.nearby(latitude, longitude, radius, limit)
+    return json_response(
+        {
+            "center": {"lat": latitude, "lng": longitude},
+            "radius_km": radius,
+            "count": len(data),
+            "data": data,
+        }
+    )
+
+
+@api.route("/venues/<int:venue_id>")
+@replica_reads
+def venue(venue_id):
+    data = venue_page(venue_id)
+    if data is None:
+        abort(404)
+    return json_response(data)
+
+
+@api.route("/artists")
+@replica_reads
+def artists():
+    return collection(
+        *artist_listing(request.args.get("genre"), request.args.get("state"))
+    )
+
+
+@api.route("/artists/<int:artist_id>")
+@replica_reads
+def artist(artist_id):
+    data = artist_page(artist_id)
+    if data is None:
+        abort(404)
+    return json_response(data)
+
+
+@api.route("/shows")
+@replica_reads
+def shows():
+    return collection(*show_listing())
+
+
+@api.route("/shows/batch", methods=["POST"])
+def create_shows():
+    """Schedule many shows at once; see scheduling.py.
+
+    Takes ``{"shows": [{"artist_id", "venue_id", "start_time"}, ...]}``.
+    Either every show is created (201, with their ids) or none is (422, with
+    the errors of each bad row).
+    """
+    payload = request.get_json(silent=True)
+    records = payload.get("shows") if isinstance(payload, dict) else None
+    if not isinstance(records, list) or not records:
+        return json_response({"error": 'expected a non-empty "shows" list'}, 400)
+    limit = current_app.config["SHOW_BATCH_MAX_ROWS"]
+    if len(records) > limit:
+        return json_response({"error": f"at most {limit} shows per batch"}, 413)
+    rows = scheduling.rows_from_records(records)
+    ids = scheduling.schedule(rows)
+    if not ids:
+        db.session.rollback()
+        return json_response(
+            {"errors": [row.as_dict() for row in rows if row.errors]}, 422
+        )
+    db.session.commit()
+    cache.invalidate(*scheduling.cache_tags(rows))
+    return json_response({"created": len(ids), "ids": ids}, 201)
+
+
+@api.route("/genres")
+@replica_reads
+def genre_counts():
+    """Every genre with its venue and artist counts: the listing facets."""
+    rows = db.session.execute(
+        select(Genre.name, Genre.venue_count, Genre.artist_count).order_by(Genre.name)
+    )
+    return json_response({"data": [dict(row._mapping) for row in rows]})
+
+
+@api.route("/search/<any(venues, artists, shows):kind>")
+@replica_reads
+def search(kind):
+    term = request.args.get("q", "").strip()
+    cap = current_app.config["SEARCH_RESULT_LIMIT"]
+    limit = max(1, min(request.args.get("limit", cap, type=int), cap))
+    backend = get_search()
+    # Every kind can be narrowed with ?genre= and ?state=.
+    genre, state = request.args.get("genre"), request.args.get("state")
+    if kind == "shows":
+        rows = backend.shows(term, limit, genres.show_filters(genre, state))
+    else:
+        model = Venue if kind == "venues" else Artist
+        rows = getattr(backend, kind)(term, limit, genres.filters(model, genre, state))
+    data = [dict(row._mapping) for row in rows]
+    return json_response({"count": len(data), "data": data})
+
+
+@api.route("/typeahead/<any(venues, artists):kind>")
+@replica_reads
+def typeahead(kind):
+    """Names starting with ?q=, for the venue and artist pickers."""
+    prefix = request.args.get("q", "").strip()
+    if len(prefix) < current_app.config["TYPEAHEAD_MIN_CHARS"]:
+        return json_response({"data": []})
+    model = Venue if kind == "venues" else Artist
+    rows = get_search().names(model, prefix, current_app.config["TYPEAHEAD_LIMIT"])
+    return json_response({"data": [dict(row._mapping) for row in rows]})
+
+
+@api.errorhandler(404)
+def not_found(error):
+    return json_response({"error": "not found"}, 404)
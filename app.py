@@ -3,19 +3,47 @@
 # ----------------------------------------------------------------------------#
 
 import logging
-from datetime import datetime
+from itertools import groupby
 from logging import FileHandler, Formatter
 
-import babel
-import dateutil.parser
-from flask import Flask, flash, redirect, render_template, request, url_for
+from flask import Flask, abort, flash, redirect, render_template, request, url_for
 from flask_migrate import Migrate
 from flask_moment import Moment
-from sqlalchemy import or_
-
+from sqlalchemy import select
+
+import assets
+import commands
+import counters
+import deletion
+import feed
+import formatting
+import fragments
+import genres
+import geo
+import instrumentation
+import jobs
+import metrics
+import replicas
+import scheduling
+from api import api
+from cache import cache
+from conditional import conditional, validators_for, vary_validators_on
 from config import Config
-from forms import ArtistForm, ShowForm, VenueForm
+from forms import ArtistForm, ShowBatchForm, ShowForm, VenueForm, state_choices
 from models import Artist, Show, Venue, db
+from pagination import paginate
+from queries import (
+    artist_freshness,
+    artist_listing,
+    artist_page,
+    genre_facet,
+    upcoming_listing,
+    venue_freshness,
+    venue_listing,
+    venue_page,
+)
+from replicas import replica_reads
+from search import get_search
 
 # ----------------------------------------------------------------------------#
 # App Config.
@@ -25,7 +53,22 @@ app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object(Config)
 db.init_app(app)
+# First, so that its timing wraps every other request hook.
+instrumentation.init_app(app)
 migrate = Migrate(app=app, db=db)
+assets.init_app(app)
+commands.init_app(app)
+counters.init_app(app)
+deletion.init_app(app)
+jobs.init_app(app)
+genres.init_app(app)
+feed.init_app(app)
+geo.init_app(app)
+app.register_blueprint(api)
+cache.init_app(app)
+fragments.init_app(app)
+replicas.init_app(app)
+metrics.init_app(app)
 
 
 # ----------------------------------------------------------------------------#
@@ -33,16 +76,64 @@ migrate = Migrate(app=app, db=db)
 # ----------------------------------------------------------------------------#
 
 
-def format_datetime(value, format="medium"):
-    date = dateutil.parser.parse(value)
-    if format == "full":
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == "medium":
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale="en")
+formatting.init_app(app)
+cache.vary_on(formatting.request_locale_key)
+vary_validators_on(formatting.request_locale_key)
+
+
+# ----------------------------------------------------------------------------#
+# Helpers.
+# ----------------------------------------------------------------------------#
+
+
+def venue_validators(venue_id):
+    """ETag/Last-Modified inputs for a venue page, without loading its shows."""
+    row = db.session.execute(venue_freshness(venue_id)).first()
+    if row is None:
+        abort(404)
+    return validators_for(*row)
 
 
-app.jinja_env.filters["datetime"] = format_datetime
+def artist_validators(artist_id):
+    """ETag/Last-Modified inputs for an artist page, without loading its shows."""
+    row = db.session.execute(artist_freshness(artist_id)).first()
+    if row is None:
+        abort(404)
+    return validators_for(*row)
+
+
+def venue_areas(page):
+    """Fold consecutive venues sharing a (city, state) into one area."""
+    return [
+        {"city": city, "state": state, "venues": list(rows)}
+        for (city, state), rows in groupby(page, key=lambda v: (v.city, v.state))
+    ]
+
+
+def search_filters(model):
+    """Genre/state criteria of a search, posted with the term or in the URL."""
+    genre, state = request.values.get("genre"), request.values.get("state")
+    if model is Show:
+        return genres.show_filters(genre, state)
+    return genres.filters(model, genre, state)
+
+
+def venue_cache_tags(venue_id):
+    """Cache tags of every page that renders details of this venue."""
+    artist_ids = db.session.scalars(
+        select(Show.artist_id).where(Show.venue_id == venue_id).distinct()
+    )
+    tags = ["venues", "shows", f"venue:{venue_id}"]
+    return tags + [f"artist:{artist_id}" for artist_id in artist_ids]
+
+
+def artist_cache_tags(artist_id):
+    """Cache tags of every page that renders details of this artist."""
+    venue_ids = db.session.scalars(
+        select(Show.venue_id).where(Show.artist_id == artist_id).distinct()
+    )
+    tags = ["artists", "shows", f"artist:{artist_id}"]
+    return tags + [f"venue:{venue_id}" for venue_id in venue_ids]
 
 
 # ----------------------------------------------------------------------------#
@@ -60,52 +151,75 @@ def index():
 
 
 @app.route("/venues")
+@replica_reads
+@cache.cached(tags=("venues",))
 def venues():
-    # TODO: replace with real venues data.
-    all_venues = Venue.query.all()
-    return render_template("pages/venues.html", venues=all_venues)
+    """Venues grouped by (city, state), or alphabetically with ?sort=name;
+    ?genre= and ?state= narrow the list.
+
+    Either way it is one ordered, keyset-paginated query; consecutive rows
+    sharing a city are folded into one area.
+    """
+    stmt, keys = venue_listing(
+        request.args.get("sort"), request.args.get("genre"), request.args.get("state")
+    )
+    page = paginate(stmt, keys=keys, cursor=request.args.get("cursor"))
+    return render_template(
+        "pages/venues.html",
+        areas=venue_areas(page),
+        page=page,
+        facet=db.session.execute(genre_facet(Venue)).all(),
+    )
 
 
 @app.route("/venues/search", methods=["POST"])
+@replica_reads
 def search_venues():
     """Search for venues"""
     # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
     #   search for Hop should return "The Musical Hop".
     #   search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-    search_term = request.form.get("search_term", "")
-    data = Venue.query.filter(Venue.name.ilike(f"%{search_term}%")).all()
+    search_term = request.form.get("search_term", "").strip()
+    data = get_search().venues(search_term, filters=search_filters(Venue))
     response = {"count": len(data), "data": data}
     return render_template(
         "pages/search_venues.html", results=response, search_term=search_term
     )
 
 
+@app.route("/venues/near")
+@replica_reads
+@cache.cached(tags=("venues", "shows"))
+def venues_near():
+    """Venues within ?radius= km of ?lat=&lng= (or of ?city=&state=), nearest
+    first, with their next shows; see geo.py."""
+    venues, error, point = [], None, None
+    if request.args:
+        try:
+            point = geo.search_point(request.args)
+        except ValueError as e:
+            error = str(e)
+        else:
+            venues = geo.nearby(*point, limit=app.config["NEAR_RESULT_LIMIT"])
+    return render_template(
+        "pages/venues_near.html",
+        venues=venues,
+        error=error,
+        point=point,
+        states=[state for state, _ in state_choices],
+    )
+
+
 @app.route("/venues/<int:venue_id>")
+@replica_reads
+@conditional(venue_validators)
+@cache.cached(tags=("venue:{venue_id}",))
 def show_venue(venue_id):
     """shows the venue page with the given venue_id"""
     # TODO: replace with real venue data from the venues table, using venue_id
-    venue = Venue.query.get_or_404(venue_id)
-    past_shows = []
-    upcoming_shows = []
-    for show in venue.shows:
-        temp_show = {
-            "artist_id": show.artist_id,
-            "artist_name": show.artist.name,
-            "artist_image_link": show.artist.image_link,
-            "start_time": show.start_time,
-        }
-        if datetime.strptime(show.start_time, "%Y-%m-%d %H:%M:%S") <= datetime.now():
-            past_shows.append(temp_show)
-        else:
-            upcoming_shows.append(temp_show)
-
-    data = vars(venue)  # Converts object to dict
-
-    data["past_shows"] = past_shows
-    data["upcoming_shows"] = upcoming_shows
-    data["past_shows_count"] = len(past_shows)
-    data["upcoming_shows_count"] = len(upcoming_shows)
-
+    data = venue_page(venue_id)
+    if data is None:
+        abort(404)
     return render_template("pages/show_venue.html", venue=data)
 
 
@@ -129,6 +243,7 @@ def create_venue_submission():
         form.populate_obj(venue)
         db.session.add(venue)
         db.session.commit()
+        cache.invalidate("venues")
         # on successful db insert, flash success
         flash("Venue " + request.form["name"] + " was successfully listed!")
 
@@ -142,20 +257,24 @@ def create_venue_submission():
     return render_template("pages/home.html")
 
 
-@app.route("/venues/delete/<venue_id>")
+@app.route("/venues/delete/<int:venue_id>")
 def delete_venue(venue_id):
-    # TODO: Complete this endpoint for taking a venue_id, and using
-    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
-    venue = Venue.query.get(venue_id)
+    # A soft delete, so the answer is immediate however many shows the venue
+    # has; its shows are purged by a background job (see deletion.py).
     try:
-        db.session.delete(venue)
+        stale = venue_cache_tags(venue_id)
+        deleted = deletion.soft_delete_venue(venue_id)
         db.session.commit()
-        flash("Successfully deleted")
-    except Exception as e:
+    except Exception:
         db.session.rollback()
+        app.logger.exception("Failed to delete venue %s", venue_id)
         flash("Failed to delete")
-    finally:
-        db.session.close()
+        return redirect(url_for("index"))
+    if not deleted:
+        abort(404)
+    # Its artists' show counts changed, so the artist listing did too.
+    cache.invalidate("artists", *stale)
+    flash("Successfully deleted")
     # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
     # clicking that button delete it from the db then redirect the user to the homepage
     return redirect(url_for("index"))
@@ -164,51 +283,43 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route("/artists")
+@replica_reads
+@cache.cached(tags=("artists",))
 def artists():
-    # TODO: replace with real data returned from querying the database
-    artists_all = Artist.query.all()
-    return render_template("pages/artists.html", artists=artists_all)
+    stmt, keys = artist_listing(request.args.get("genre"), request.args.get("state"))
+    page = paginate(stmt, keys=keys, cursor=request.args.get("cursor"))
+    return render_template(
+        "pages/artists.html",
+        artists=page,
+        page=page,
+        facet=db.session.execute(genre_facet(Artist)).all(),
+    )
 
 
 @app.route("/artists/search", methods=["POST"])
+@replica_reads
 def search_artists():
     # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
     # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
     # search for "band" should return "The Wild Sax Band".
-    search_term = request.form.get("search_term", "")
-    data = Artist.query.filter(Artist.name.ilike(f"%{search_term}%")).all()
+    search_term = request.form.get("search_term", "").strip()
+    data = get_search().artists(search_term, filters=search_filters(Artist))
     response = {"count": len(data), "data": data}
-    return render_template("pages/search_artists.html", results=response)
+    return render_template(
+        "pages/search_artists.html", results=response, search_term=search_term
+    )
 
 
 @app.route("/artists/<int:artist_id>")
+@replica_reads
+@conditional(artist_validators)
+@cache.cached(tags=("artist:{artist_id}",))
 def show_artist(artist_id):
     # shows the artist page with the given artist_id
     # TODO: replace with real artist data from the artist table, using artist_id
-    artist = Artist.query.get(int(artist_id))
-    shows = artist.shows
-    past_shows = []
-    upcoming_shows = []
-
-    for show in shows:
-        temp_show = {
-            "venue_id": show.venue_id,
-            "venue_name": show.venue.name,
-            "venue_image_link": show.venue.image_link,
-            "start_time": show.start_time,
-        }
-        if datetime.strptime(show.start_time, "%Y-%m-%d %H:%M:%S") <= datetime.now():
-            past_shows.append(temp_show)
-        else:
-            upcoming_shows.append(temp_show)
-
-    data = vars(artist)
-
-    data["past_shows"] = past_shows
-    data["upcoming_shows"] = upcoming_shows
-    data["past_shows_count"] = len(past_shows)
-    data["upcoming_shows_count"] = len(upcoming_shows)
-
+    data = artist_page(artist_id)
+    if data is None:
+        abort(404)
     return render_template("pages/show_artist.html", artist=data)
 
 
@@ -225,7 +336,9 @@ def edit_artist_submission(artist_id):
         form.populate_obj(artist)  # Update the artist object with the new data
 
         try:
+            feed.rename(artist)
             db.session.commit()
+            cache.invalidate(*artist_cache_tags(artist_id))
             flash(f"Artist {artist.name} was successfully updated!")
         except Exception as e:
             db.session.rollback()
@@ -248,7 +361,9 @@ def edit_venue(venue_id):
         # TODO: take values from the form submitted, and update existing
         # venue record with ID <venue_id> using the new attributes
         try:
+            feed.rename(venue)
             db.session.commit()
+            cache.invalidate(*venue_cache_tags(venue_id))
             flash(f"{venue.name} was successfully updated")
         except Exception as e:
             db.session.rollback()
@@ -281,6 +396,7 @@ def create_artist_submission():
         form.populate_obj(artist)
         db.session.add(artist)
         db.session.commit()
+        cache.invalidate("artists")
         # on successful db insert, flash success
         flash("Artist " + request.form["name"] + " was successfully listed!")
     except Exception as e:
@@ -302,57 +418,24 @@ def create_artist_submission():
 
 
 @app.route("/shows")
+@replica_reads
+@cache.cached(tags=("shows",))
 def shows():
-    # displays list of shows at /shows
-    # TODO: replace with real venues data.
-    # all_shows = Show.query.join(Artist, Show.artist_id == Artist.id) \
-    #     .join(Venue, Show.venue_id == Venue.id).all()
-    all_shows = Show.query.all()
-    data = []
-    for show in all_shows:
-        data.append(
-            {
-                "venue_id": show.venue_id,
-                "venue_name": show.venue.name,
-                "artist_id": show.artist_id,
-                "artist_name": show.artist.name,
-                "artist_image_link": show.artist.image_link,
-                "start_time": show.start_time,
-            }
-        )
-    return render_template("pages/shows.html", shows=data)
+    # displays the upcoming shows at /shows, soonest first
+    stmt, keys = upcoming_listing()
+    page = paginate(stmt, keys=keys, cursor=request.args.get("cursor"))
+    return render_template("pages/shows.html", shows=page, page=page)
 
 
 # Search shows
 @app.route("/shows/search", methods=["POST"])
+@replica_reads
 def search_shows():
     # TODO: implement search o show with partial string search.
     # seach for Hop should return "The Musical Hop".
     # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-    search_term = request.form.get("search_term", "")
-    filter_shows = (
-        Show.query.join(Artist, Show.artist_id == Artist.id)
-        .join(Venue, Show.venue_id == Venue.id)
-        .filter(
-            or_(
-                Artist.name.ilike(f"%{search_term}%"),
-                Venue.name.ilike(f"%{search_term}%"),
-            )
-        )
-        .all()
-    )
-    data = []
-    for show in filter_shows:
-        data.append(
-            {
-                "artist_image_link": show.artist.image_link,
-                "artist_name": show.artist.name,
-                "start_time": show.start_time,
-                "artist_id": show.artist_id,
-                "venue_id": show.venue_id,
-                "venue_name": show.venue.name,
-            }
-        )
+    search_term = request.form.get("search_term", "").strip()
+    data = get_search().shows(search_term, filters=search_filters(Show))
     response = {"count": len(data), "data": data}
     return render_template("pages/show.html", results=response, search_term=search_term)
 
@@ -373,7 +456,17 @@ def create_show_submission():
         new_show = Show()
         form.populate_obj(new_show)
         db.session.add(new_show)
+        db.session.flush()
+        # Also bumps updated_at on both rows, so their page ETags change.
+        counters.record_show(new_show)
+        feed.add_shows([new_show.id])
         db.session.commit()
+        cache.invalidate(
+            "shows",
+            "venues",
+            f"venue:{new_show.venue_id}",
+            f"artist:{new_show.artist_id}",
+        )
         # on successful db insert, flash success
         flash("Show was successfully listed!")
     except Exception as e:
@@ -384,6 +477,37 @@ def create_show_submission():
     return render_template("pages/home.html")
 
 
+@app.route("/shows/batch", methods=["GET", "POST"])
+def create_show_batch():
+    # Lists many shows at once (e.g. a tour): all of them, or none with the
+    # errors of each bad row. See scheduling.py.
+    form = ShowBatchForm()
+    rows = []
+    if form.validate_on_submit():
+        try:
+            text = form.file.data.read().decode("utf-8-sig") if form.file.data else ""
+        except UnicodeDecodeError:
+            text = ""
+            form.file.errors.append("The file must be UTF-8 text.")
+        rows = scheduling.rows_from_text(text + "\n" + (form.rows.data or ""))
+        limit = app.config["SHOW_BATCH_MAX_ROWS"]
+        if not rows:
+            form.rows.errors.append("Enter at least one show.")
+        elif len(rows) > limit:
+            form.rows.errors.append(f"A batch holds at most {limit} shows.")
+        elif not form.file.errors:
+            ids = scheduling.schedule(rows)
+            if ids:
+                db.session.commit()
+                cache.invalidate(*scheduling.cache_tags(rows))
+                flash(f"{len(ids)} shows were successfully listed!")
+                return render_template("pages/home.html")
+            db.session.rollback()
+    return render_template(
+        "forms/new_shows.html", form=form, rows=[row for row in rows if row.errors]
+    )
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template("errors/404.html"), 404
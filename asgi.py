@@ -0,0 +1,277 @@
+from io import BytesIO
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgiInstance
+from flask import abort, make_response, render_template, request
+from flask import session as client_session
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import is_resource_modified
+from werkzeug.routing import RequestRedirect
+
+from api import json_response
+from app import app, venue_areas
+from cache import cache
+from conditional import validators_for, with_validators
+from models import Artist, Venue
+from pagination import KeysetQuery
+from queries import (
+    artist_detail,
+    artist_freshness,
+    artist_listing,
+    artist_shows,
+    genre_facet,
+    past_and_upcoming,
+    upcoming_listing,
+    venue_detail,
+    venue_freshness,
+    venue_listing,
+    venue_shows,
+    with_shows,
+)
+
+# ----------------------------------------------------------------------------#
+# ASGI entry point.
+#
+#   uvicorn asgi:application --workers 4
+#
+# The read routes below run as coroutines on an asyncio engine (asyncpg), so
+# a slow query parks a coroutine instead of a worker thread and one process
+# keeps many requests in flight. They build the same statements (queries.py)
+# and render the same templates as their Flask views, under a Flask request
+# context, and share the page cache and ETag validators. Every other route
+# is the WSGI app, run in a thread pool.
+# ----------------------------------------------------------------------------#
+
+engine = create_async_engine(
+    app.config["ASYNC_DATABASE_URI"], **app.config["ASYNC_ENGINE_OPTIONS"]
+)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+class WsgiInstance(WsgiToAsgiInstance):
+    async def run_wsgi_app(self, body):
+        # asgiref's default runs every WSGI call on one shared thread, which
+        # would serialize the sync routes.
+        # (The base method is a SyncToAsync wrapper; take the plain function.)
+        run = WsgiToAsgiInstance.__dict__["run_wsgi_app"].func
+        await sync_to_async(run, thread_sensitive=False)(self, body)
+
+
+def environ_for(scope):
+    instance = WsgiInstance(app)
+    instance.scope = scope
+    return instance.build_environ(scope, BytesIO())
+
+
+# ----------------------------------------------------------------------------#
+# Async views.
+# ----------------------------------------------------------------------------#
+
+
+async def cached(tags, render):
+    """``cache.cached`` for a coroutine that renders the page."""
+    key = cache.page_key()
+    if key is not None:
+        body = cache.get(key)
+        if body is not None:
+            return body
+        versions = cache.snapshot(tags)
+    body = await render()
+    if key is not None and isinstance(body, str):
+        cache.set(key, body, versions=versions)
+    return body
+
+
+async def conditional(session, freshness, render):
+    """``conditional.conditional`` for a coroutine that renders the page."""
+    # Pending flash messages make the page personal; don't validate it.
+    if client_session.get("_flashes"):
+        return await render()
+    row = (await session.execute(freshness)).first()
+    if row is None:
+        abort(404)
+    etag, last_modified = validators_for(*row)
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = make_response(await render())
+    else:
+        response = make_response("", 304)
+    return with_validators(response, etag, last_modified)
+
+
+async def keyset_page(session, stmt, keys):
+    query = KeysetQuery(stmt, keys, request.args.get("cursor"))
+    return query.page((await session.execute(query.stmt)).all())
+
+
+async def detail_page(session, detail, shows):
+    row = (await session.execute(detail)).mappings().first()
+    if row is None:
+        return None
+    past, upcoming = past_and_upcoming(shows)
+    past = [dict(show) for show in (await session.execute(past)).mappings()]
+    upcoming = [dict(show) for show in (await session.execute(upcoming)).mappings()]
+    return with_shows(dict(row), past, upcoming)
+
+
+async def venues(session):
+    async def render():
+        args = request.args
+        listing = venue_listing(args.get("sort"), args.get("genre"), args.get("state"))
+        page = await keyset_page(session, *listing)
+        return render_template(
+            "pages/venues.html",
+            areas=venue_areas(page),
+            page=page,
+            facet=(await session.execute(genre_facet(Venue))).all(),
+        )
+
+    return await cached(["venues"], render)
+
+
+async def show_venue(session, venue_id):
+    async def render():
+        data = await detail_page(session, venue_detail(venue_id), venue_shows(venue_id))
+        if data is None:
+            abort(404)
+        return render_template("pages/show_venue.html", venue=data)
+
+    return await conditional(
+        session,
+        venue_freshness(venue_id),
+        lambda: cached([f"venue:{venue_id}"], render),
+    )
+
+
+async def artists(session):
+    async def render():
+        listing = artist_listing(request.args.get("genre"), request.args.get("state"))
+        page = await keyset_page(session, *listing)
+        return render_template(
+            "pages/artists.html",
+            artists=page,
+            page=page,
+            facet=(await session.execute(genre_facet(Artist))).all(),
+        )
+
+    return await cached(["artists"], render)
+
+
+async def show_artist(session, artist_id):
+    async def render():
+        data = await detail_page(
+            session, artist_detail(artist_id), artist_shows(artist_id)
+        )
+        if data is None:
+            abort(404)
+        return render_template("pages/show_artist.html", artist=data)
+
+    return await conditional(
+        session,
+        artist_freshness(artist_id),
+        lambda: cached([f"artist:{artist_id}"], render),
+    )
+
+
+async def shows(session):
+    async def render():
+        page = await keyset_page(session, *upcoming_listing())
+        return render_template("pages/shows.html", shows=page, page=page)
+
+    return await cached(["shows"], render)
+
+
+async def api_venue(session, venue_id):
+    data = await detail_page(session, venue_detail(venue_id), venue_shows(venue_id))
+    if data is None:
+        abort(404)
+    return json_response(data)
+
+
+async def api_artist(session, artist_id):
+    data = await detail_page(session, artist_detail(artist_id), artist_shows(artist_id))
+    if data is None:
+        abort(404)
+    return json_response(data)
+
+
+# Flask endpoint -> coroutine serving it.
+ASYNC_VIEWS = {
+    "venues": venues,
+    "show_venue": show_venue,
+    "artists": artists,
+    "show_artist": show_artist,
+    "shows": shows,
+    "api.venue": api_venue,
+    "api.artist": api_artist,
+}
+
+
+# ----------------------------------------------------------------------------#
+# Dispatch.
+# ----------------------------------------------------------------------------#
+
+
+def match(environ):
+    """``(endpoint, view_args)`` of a request the async views serve, or None."""
+    if environ["REQUEST_METHOD"] != "GET":
+        return None
+    try:
+        endpoint, view_args = app.url_map.bind_to_environ(environ).match()
+    except (HTTPException, RequestRedirect):
+        return None
+    if endpoint not in ASYNC_VIEWS:
+        return None
+    return endpoint, view_args
+
+
+async def dispatch(environ, endpoint, view_args):
+    """Flask's full_dispatch_request, awaiting the view."""
+    with app.request_context(environ):
+        try:
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    async with Session() as session:
+                        rv = await ASYNC_VIEWS[endpoint](session, **view_args)
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = app.finalize_request(rv)
+        except Exception as e:
+            response = app.make_response(app.handle_exception(e))
+        return (
+            response.status_code,
+            response.headers.to_wsgi_list(),
+            response.get_data(),
+        )
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    environ = environ_for(scope)
+    matched = match(environ)
+    if matched is None:
+        await WsgiInstance(app)(scope, receive, send)
+        return
+
+    status, headers, body = await dispatch(environ, *matched)
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
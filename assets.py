@@ -0,0 +1,411 @@
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+from werkzeug.exceptions import NotFound
+from werkzeug.utils import safe_join
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # no responsive variants
+    Image = None
+
+try:
+    from rjsmin import jsmin
+except ImportError:  # scripts are bundled as they are
+    jsmin = None
+
+# ----------------------------------------------------------------------------#
+# Static assets.
+#
+#   flask assets build [--clean]
+#
+# Bundles the stylesheets and scripts below into one file each (CSS is
+# minified; JS too, with rjsmin), names every output after a hash of its
+# content, writes .gz and .br (brotli) copies of the text files, and
+# records the names in a manifest. Images listed in IMAGES also get
+# resized, recompressed JPEG and WebP variants (Pillow). All three packages
+# are in requirements.txt; the build refuses to run without them unless
+# --allow-missing is given, and then skips what needs the missing ones.
+#
+# Templates ask for assets by their source name:
+#
+#   {% for url in asset_urls("css/app.css") %}<link href="{{ url }}">{% endfor %}
+#   <img src="{{ asset_url('img/front-splash.jpg') }}">
+#
+# and get the built file under ASSETS_URL, served with the precompressed
+# copy the client accepts and Cache-Control: immutable; a changed file gets
+# a new name, so it never needs revalidating. Before the first build they
+# get the separate /static files instead. Builds keep older outputs, which
+# pages rendered before a deploy (and still in the page cache) point at,
+# unless --clean is given.
+# ----------------------------------------------------------------------------#
+
+assets_cli = AppGroup("assets", help="Build fingerprinted static assets.")
+
+MANIFEST = "manifest.json"
+
+# Bundle name -> source files under static/, in load order.
+BUNDLES = {
+    "css/app.css": [
+        "css/bootstrap.min.css",
+        "css/layout.main.css",
+        "css/main.css",
+        "css/main.responsive.css",
+        "css/main.quickfix.css",
+    ],
+    "js/app.js": [
+        "js/libs/jquery-1.11.1.min.js",
+        "js/libs/bootstrap-3.1.1.min.js",
+        "js/plugins.js",
+        "js/script.js",
+    ],
+}
+# Fingerprinted on their own: needed before the bundles, or only by old IE.
+FILES = ["js/libs/modernizr-2.8.2.min.js", "js/libs/respond-1.4.2.min.js"]
+IMAGES = ["img/front-splash.jpg"]
+
+COMPRESSIBLE = {".css", ".js", ".json", ".map", ".svg", ".txt", ".eot", ".ttf", ".otf"}
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+EMPTY_MANIFEST = {"files": {}, "images": {}}
+
+
+# ----------------------------------------------------------------------------#
+# Minifying.
+# ----------------------------------------------------------------------------#
+
+CSS_TOKENS = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'|/\*.*?\*/)", re.S)
+CSS_URL = re.compile(r"url\(\s*(['\"]?)(.*?)\1\s*\)")
+SOURCE_MAP = re.compile(r"^\s*//[#@] sourceMappingURL=.*$", re.M)
+
+
+def squeeze_css(code):
+    code = re.sub(r"\s+", " ", code)
+    code = re.sub(r"\s*([{};,>])\s*", r"\1", code)
+    # Only after a colon: "a :hover" is not "a:hover".
+    return re.sub(r":\s+", ":", code).replace(";}", "}")
+
+
+def minify_css(text):
+    """Drop comments (but /*! licences) and the whitespace around punctuation,
+    leaving strings alone."""
+    out, code = [], []
+    for i, part in enumerate(CSS_TOKENS.split(text)):
+        if not i % 2:
+            code.append(part)
+        elif part.startswith("/*") and not part.startswith("/*!"):
+            code.append(" ")
+        else:
+            out.append(squeeze_css("".join(code)))
+            out.append(part)
+            code = []
+    out.append(squeeze_css("".join(code)))
+    return "".join(out).strip()
+
+
+def minify_js(name, text):
+    text = SOURCE_MAP.sub("", text)
+    if jsmin is not None and not name.endswith(".min.js"):
+        text = jsmin(text)
+    return text.strip()
+
+
+# ----------------------------------------------------------------------------#
+# Building.
+# ----------------------------------------------------------------------------#
+
+
+class Builder:
+    """Writes hashed outputs into ``out_dir`` and collects the manifest."""
+
+    def __init__(self, static_dir, out_dir, static_url):
+        self.static_dir = static_dir
+        self.out_dir = out_dir
+        self.static_url = static_url.rstrip("/")
+        self.manifest = {"files": {}, "images": {}}
+        self.written = set()
+
+    def read(self, name):
+        with open(os.path.join(self.static_dir, name), "rb") as f:
+            return f.read()
+
+    def write(self, name, data):
+        """Store ``data`` as ``name`` with its hash in the file name, plus
+        its compressed copies; returns the stored name."""
+        stem, ext = posixpath.splitext(name)
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        stored = f"{stem}.{digest}{ext}"
+        outputs = [(stored, data)]
+        if ext in COMPRESSIBLE:
+            compressed = [(".gz", gzip.compress(data, 9, mtime=0))]
+            if brotli is not None:
+                compressed.append((".br", brotli.compress(data)))
+            outputs += [(stored + s, d) for s, d in compressed if len(d) < len(data)]
+        for path, content in outputs:
+            target = os.path.join(self.out_dir, *path.split("/"))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if not os.path.exists(target):
+                tmp = f"{target}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(content)
+                os.replace(tmp, target)
+            self.written.add(path)
+        return stored
+
+    def add(self, name, data):
+        self.manifest["files"][name] = self.write(name, data)
+        return self.manifest["files"][name]
+
+    def rebase_urls(self, source, bundle, css):
+        """Point a stylesheet's relative url()s at their built copies (or, for
+        files not under static/, back at /static), as seen from ``bundle``."""
+
+        def rebase(match):
+            url = match.group(2)
+            if re.match(r"^([a-z]+:|/|#)", url):
+                return match.group(0)
+            path = re.split(r"[?#]", url, maxsplit=1)[0]
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+            suffix = url[len(path) :]
+            if os.path.isfile(os.path.join(self.static_dir, target)):
+                stored = self.manifest["files"].get(target) or self.add(
+                    target, self.read(target)
+                )
+                rebased = posixpath.relpath(stored, posixpath.dirname(bundle))
+            else:
+                rebased = f"{self.static_url}/{target}"
+            return f'url("{rebased}{suffix}")'
+
+        return CSS_URL.sub(rebase, css)
+
+    def bundle(self, name, sources):
+        if name.endswith(".css"):
+            parts = [
+                self.rebase_urls(source, name, self.read(source).decode("utf-8"))
+                for source in sources
+            ]
+            text = minify_css("\n".join(parts))
+        else:
+            parts = [
+                minify_js(source, self.read(source).decode("utf-8"))
+                for source in sources
+            ]
+            # A file may end without a semicolon.
+            text = "\n;\n".join(parts)
+        return self.add(name, text.encode("utf-8"))
+
+    def image(self, name, widths, jpeg_quality, webp_quality):
+        """Fingerprint an image, plus resized variants of it per format."""
+        self.add(name, self.read(name))
+        if Image is None:
+            return {}
+        formats = [("image/jpeg", "JPEG", ".jpg", {"quality": jpeg_quality})]
+        if features.check("webp"):
+            formats.append(
+                ("image/webp", "WEBP", ".webp", {"quality": webp_quality, "method": 6})
+            )
+        stem = posixpath.splitext(name)[0]
+        variants = {}
+        with Image.open(os.path.join(self.static_dir, name)) as original:
+            picture = ImageOps.exif_transpose(original).convert("RGB")
+        sizes = sorted(w for w in widths if w < picture.width) or [picture.width]
+        for width in sizes:
+            height = round(picture.height * width / picture.width)
+            resized = picture.resize((width, height), Image.LANCZOS)
+            for mimetype, fmt, ext, options in formats:
+                buffer = io.BytesIO()
+                resized.save(buffer, fmt, optimize=True, progressive=True, **options)
+                stored = self.write(f"{stem}-{width}w{ext}", buffer.getvalue())
+                variants.setdefault(mimetype, []).append([width, stored])
+        self.manifest["images"][name] = variants
+        return variants
+
+    def save_manifest(self):
+        target = os.path.join(self.out_dir, MANIFEST)
+        tmp = f"{target}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, target)
+
+    def clean(self):
+        """Delete outputs of earlier builds; returns how many."""
+        removed = 0
+        for root, _, names in os.walk(self.out_dir):
+            for filename in names:
+                path = os.path.relpath(os.path.join(root, filename), self.out_dir)
+                path = path.replace(os.sep, "/")
+                if path != MANIFEST and path not in self.written:
+                    os.remove(os.path.join(root, filename))
+                    removed += 1
+        return removed
+
+
+def missing_packages():
+    """Optional build dependencies that are not installed."""
+    packages = {"brotli": brotli, "Pillow": Image, "rjsmin": jsmin}
+    return [name for name, module in packages.items() if module is None]
+
+
+def build(app, clean=False):
+    config = app.config
+    builder = Builder(app.static_folder, config["ASSETS_DIR"], app.static_url_path)
+    for name, sources in BUNDLES.items():
+        builder.bundle(name, sources)
+    for name in FILES:
+        builder.add(name, builder.read(name))
+    for name in IMAGES:
+        builder.image(
+            name,
+            config["ASSETS_IMAGE_WIDTHS"],
+            config["ASSETS_JPEG_QUALITY"],
+            config["ASSETS_WEBP_QUALITY"],
+        )
+    builder.save_manifest()
+    removed = builder.clean() if clean else 0
+    app.extensions["assets"]["manifest"] = None
+    return builder, removed
+
+
+def size(path):
+    return f"{os.path.getsize(path) / 1024:.1f} KB"
+
+
+@assets_cli.command("build")
+@click.option("--clean", is_flag=True, help="Delete outputs of earlier builds.")
+@click.option(
+    "--allow-missing",
+    is_flag=True,
+    help="Build without brotli, Pillow or rjsmin, skipping what they do.",
+)
+def build_command(clean, allow_missing):
+    """Bundle, fingerprint and compress the static assets."""
+    missing = missing_packages()
+    if missing and not allow_missing:
+        raise click.ClickException(
+            f"{', '.join(missing)} not installed (see requirements.txt); "
+            "pass --allow-missing to build without them."
+        )
+    builder, removed = build(current_app._get_current_object(), clean)
+    out_dir = builder.out_dir
+    for name, stored in sorted(builder.manifest["files"].items()):
+        path = os.path.join(out_dir, stored)
+        line = f"{name} -> {stored}  {size(path)}"
+        for encoding, suffix in reversed(ENCODINGS):
+            if os.path.exists(path + suffix):
+                line += f", {encoding} {size(path + suffix)}"
+        click.echo(line)
+    for name, variants in sorted(builder.manifest["images"].items()):
+        for mimetype, entries in variants.items():
+            widths = ", ".join(
+                f"{width}w {size(os.path.join(out_dir, stored))}"
+                for width, stored in entries
+            )
+            click.echo(f"{name} [{mimetype}] {widths}")
+    if Image is None and IMAGES:
+        click.echo("Pillow is not installed; no image variants were made.")
+    if brotli is None:
+        click.echo("brotli is not installed; only gzip copies were made.")
+    if jsmin is None:
+        click.echo("rjsmin is not installed; scripts were not minified.")
+    if clean:
+        click.echo(f"Removed {removed} old files")
+
+
+# ----------------------------------------------------------------------------#
+# Serving.
+# ----------------------------------------------------------------------------#
+
+
+def manifest():
+    """The last build's manifest, re-read when it changes in debug mode."""
+    state = current_app.extensions["assets"]
+    if state["manifest"] is None or current_app.debug or state["mtime"] is None:
+        path = os.path.join(current_app.config["ASSETS_DIR"], MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+        if state["manifest"] is None or mtime != state["mtime"]:
+            if mtime is None:
+                state["manifest"] = EMPTY_MANIFEST
+            else:
+                with open(path) as f:
+                    state["manifest"] = json.load(f)
+            state["mtime"] = mtime
+    return state["manifest"]
+
+
+def asset_url(name):
+    """URL of the built ``name``, or of the /static file before a build."""
+    stored = manifest()["files"].get(name)
+    if stored is None:
+        return url_for("static", filename=name)
+    return url_for("assets", filename=stored)
+
+
+def asset_urls(name):
+    """URLs to load for ``name``: the built bundle, or before a build its
+    separate sources."""
+    if name in BUNDLES and name not in manifest()["files"]:
+        return [url_for("static", filename=source) for source in BUNDLES[name]]
+    return [asset_url(name)]
+
+
+def asset_srcset(name, mimetype=None):
+    """A srcset of the image's variants in ``mimetype`` (by default its own
+    format); without variants the image itself, or "" for another format."""
+    own = mimetypes.guess_type(name)[0]
+    variants = manifest()["images"].get(name, {}).get(mimetype or own)
+    if variants:
+        return ", ".join(
+            f"{url_for('assets', filename=stored)} {width}w"
+            for width, stored in variants
+        )
+    return asset_url(name) if mimetype in (None, own) else ""
+
+
+def send_asset(filename):
+    """A built file, precompressed if the client takes it, cached for good."""
+    directory = current_app.config["ASSETS_DIR"]
+    if filename == MANIFEST:
+        raise NotFound()
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    options = {"mimetype": mimetype, "max_age": current_app.config["ASSETS_MAX_AGE"]}
+    for encoding, suffix in ENCODINGS:
+        path = safe_join(directory, filename + suffix)
+        if request.accept_encodings[encoding] and path and os.path.isfile(path):
+            response = send_from_directory(directory, filename + suffix, **options)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, **options)
+    response.vary.add("Accept-Encoding")
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    app.extensions["assets"] = {"manifest": None, "mtime": None}
+    app.add_url_rule(
+        app.config["ASSETS_URL"].rstrip("/") + "/<path:filename>",
+        "assets",
+        send_asset,
+    )
+    app.jinja_env.globals.update(
+        asset_url=asset_url, asset_urls=asset_urls, asset_srcset=asset_srcset
+    )
+    app.cli.add_command(assets_cli)
@@ -0,0 +1,66 @@
+"""Compare the old ``datetime`` template filter with formatting.DateTimeFormatter.
+
+    python benchmarks/bench_datetime_filter.py [--n 20000]
+
+Formats the same mix of values a show listing renders: a few dozen distinct
+start times, repeated, as datetimes and as ISO strings.
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from formatting import DateTimeFormatter  # noqa: E402
+
+
+def legacy_format_datetime(value, format="medium"):
+    # The filter as it was before formatting.py.
+    date = value if isinstance(value, datetime) else dateutil.parser.parse(value)
+    if format == "full":
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == "medium":
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale="en")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--distinct", type=int, default=50)
+    args = parser.parse_args()
+
+    start = datetime(2026, 1, 1, 20, 0, tzinfo=timezone.utc)
+    times = [start + timedelta(hours=6 * i) for i in range(args.distinct)]
+    values = {
+        "datetime": [times[i % len(times)] for i in range(args.n)],
+        "iso string": [times[i % len(times)].isoformat() for i in range(args.n)],
+    }
+    formatter = DateTimeFormatter()
+
+    print(f"{'input':<12} {'filter':<10} {'total s':>9} {'us/call':>9}")
+    for kind, inputs in values.items():
+        for name, func in (
+            ("legacy", legacy_format_datetime),
+            ("formatter", formatter),
+        ):
+            try:
+                seconds = timeit.timeit(
+                    lambda: [func(value, "full") for value in inputs], number=1
+                )
+            except Exception as exc:
+                # e.g. old python-dateutil releases fail on Python 3.10+.
+                print(f"{kind:<12} {name:<10} failed: {exc!r}")
+                continue
+            per_call = seconds / len(inputs) * 1e6
+            print(f"{kind:<12} {name:<10} {seconds:>9.3f} {per_call:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
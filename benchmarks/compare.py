@@ -0,0 +1,69 @@
+"""Compare two benchmarks/run.py result files.
+
+    python benchmarks/compare.py results/base.json results/head.json
+
+Prints each route's change in p50/p95/p99 latency, throughput and queries
+per request. Exits non-zero if any route's p95 got worse by more than
+--threshold percent, or if it now issues more queries.
+"""
+
+import argparse
+import json
+import sys
+
+
+def change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def fmt(value, pct):
+    if value is None:
+        return "-"
+    return f"{value:.2f}" + ("" if pct is None else f" ({pct:+.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument(
+        "--threshold", type=float, default=10.0, help="Allowed p95 regression, %%."
+    )
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    print(f"base: {base['meta'].get('commit')} {base['meta'].get('label') or ''}")
+    print(f"head: {head['meta'].get('commit')} {head['meta'].get('label') or ''}")
+
+    columns = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "mean_queries")
+    print(f"{'route':<20}" + "".join(f"{c:>20}" for c in columns))
+    regressions = []
+    for name, new in head["routes"].items():
+        old = base["routes"].get(name)
+        if old is None:
+            print(f"{name:<20} (new route)")
+            continue
+        cells = [fmt(new[c], change(old[c], new[c])) for c in columns]
+        print(f"{name:<20}" + "".join(f"{cell:>20}" for cell in cells))
+        p95 = change(old["p95_ms"], new["p95_ms"])
+        if p95 is not None and p95 > args.threshold:
+            regressions.append(f"{name}: p95 {p95:+.0f}%")
+        if (new["mean_queries"] or 0) > (old["mean_queries"] or 0):
+            regressions.append(
+                f"{name}: queries {old['mean_queries']} -> {new['mean_queries']}"
+            )
+
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
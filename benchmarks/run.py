@@ -0,0 +1,377 @@
+"""Drive every route with concurrent clients and report latency percentiles.
+
+    python benchmarks/run.py --out results/base.json
+    python benchmarks/run.py --url http://127.0.0.1:8000 --concurrency 32
+
+Without --url the app runs in-process behind Flask's test client, against
+DATABASE_URL; with --url requests go over HTTP to a running server (e.g.
+gunicorn or `uvicorn asgi:application`). Query counts are read from the
+Server-Timing header, so they are reported in both modes.
+
+Each route gets --requests requests from --concurrency threads. Write routes
+only run with --writes, since they change the data later runs measure. The
+form posts carry no CSRF token: in-process runs switch CSRF off, and a
+server under test needs FYYUR_CSRF_ENABLED=0.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+QUERIES = re.compile(r'db;[^,]*desc="(\d+) quer')
+
+
+class Route(object):
+    def __init__(self, name, method, path, data=None, write=False):
+        self.name = name
+        self.method = method
+        # ``path`` may be a callable of the random generator, for routes
+        # that take an id.
+        self.path = path
+        self.data = data
+        self.write = write
+
+    def request(self, rng, ids):
+        path = self.path(rng, ids) if callable(self.path) else self.path
+        data = self.data(rng, ids) if callable(self.data) else self.data
+        return self.method, path, data
+
+
+def venue_path(template):
+    return lambda rng, ids: template.format(rng.choice(ids["venues"]))
+
+
+def artist_path(template):
+    return lambda rng, ids: template.format(rng.choice(ids["artists"]))
+
+
+def search_form(terms):
+    return lambda rng, ids: {"search_term": rng.choice(terms)}
+
+
+def profile_form(kind):
+    """Fields of a valid venue or artist form, for the create/edit posts."""
+
+    def data(rng, ids):
+        n = rng.randint(1, 10**6)
+        return {
+            "name": f"Bench {kind} {n}",
+            "city": rng.choice(NEAR_CITIES)[0],
+            "state": rng.choice(NEAR_CITIES)[1],
+            "address": f"{n} Bench St",
+            "phone": f"{rng.randint(200, 999)}-555-{rng.randint(1000, 9999)}",
+            "genres": rng.sample(["Jazz", "Blues", "Folk", "Punk", "Soul"], 2),
+            "facebook_link": f"https://www.facebook.com/bench{n}",
+            "website_link": f"https://bench{n}.example.com",
+        }
+
+    return data
+
+
+def show_rows(rng, ids):
+    """A few shows for /shows/batch, on random far-future nights."""
+    lines = [
+        f"{rng.choice(ids['artists'])},{rng.choice(ids['venues'])},"
+        f"2032-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+        f"{rng.randint(12, 23)}:00"
+        for _ in range(5)
+    ]
+    return {"rows": "\n".join(lines)}
+
+
+def near_path(template):
+    def path(rng, ids):
+        city, state = rng.choice(NEAR_CITIES)
+        return template.format(urllib.parse.urlencode({"city": city, "state": state}))
+
+    return path
+
+
+SEARCH_TERMS = ["blue", "hall", "band", "neon river", "san", "jazz", "wild 1"]
+# A few of the cities benchmarks/seed.py places venues in.
+NEAR_CITIES = [
+    ("San Francisco", "CA"),
+    ("New York", "NY"),
+    ("Austin", "TX"),
+    ("Chicago", "IL"),
+    ("Seattle", "WA"),
+]
+
+ROUTES = [
+    Route("index", "GET", "/"),
+    Route("venues", "GET", "/venues"),
+    Route("venues_by_name", "GET", "/venues?sort=name"),
+    Route("show_venue", "GET", venue_path("/venues/{}")),
+    Route("search_venues", "POST", "/venues/search", search_form(SEARCH_TERMS)),
+    Route("create_venue_form", "GET", "/venues/create"),
+    Route("edit_venue", "GET", venue_path("/venues/{}/edit")),
+    Route("venues_near", "GET", near_path("/venues/near?{}&radius=50")),
+    Route("artists", "GET", "/artists"),
+    Route("show_artist", "GET", artist_path("/artists/{}")),
+    Route("search_artists", "POST", "/artists/search", search_form(SEARCH_TERMS)),
+    Route("create_artist_form", "GET", "/artists/create"),
+    Route("edit_artist", "GET", artist_path("/artists/{}/edit")),
+    Route("shows", "GET", "/shows"),
+    Route("search_shows", "POST", "/shows/search", search_form(SEARCH_TERMS)),
+    Route("create_show_form", "GET", "/shows/create"),
+    Route("show_batch_form", "GET", "/shows/batch"),
+    Route("api_venues", "GET", "/api/v1/venues"),
+    Route("api_venue", "GET", venue_path("/api/v1/venues/{}")),
+    Route("api_artists", "GET", "/api/v1/artists"),
+    Route("api_artist", "GET", artist_path("/api/v1/artists/{}")),
+    Route("api_shows", "GET", "/api/v1/shows"),
+    Route("api_search_venues", "GET", "/api/v1/search/venues?q=blue"),
+    Route("api_venues_near", "GET", near_path("/api/v1/venues/near?{}&radius=50")),
+    Route(
+        "create_show",
+        "POST",
+        "/shows/create",
+        lambda rng, ids: {
+            "venue_id": str(rng.choice(ids["venues"])),
+            "artist_id": str(rng.choice(ids["artists"])),
+            "start_time": f"2031-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 20:00:00",
+        },
+        write=True,
+    ),
+    Route("create_shows_batch", "POST", "/shows/batch", show_rows, write=True),
+    Route("create_venue", "POST", "/venues/create", profile_form("Hall"), write=True),
+    Route(
+        "update_venue",
+        "POST",
+        venue_path("/venues/{}/edit"),
+        profile_form("Hall"),
+        write=True,
+    ),
+    Route("create_artist", "POST", "/artists/create", profile_form("Band"), write=True),
+    Route(
+        "update_artist",
+        "POST",
+        artist_path("/artists/{}/edit"),
+        profile_form("Band"),
+        write=True,
+    ),
+    # Last: it soft-deletes venues the other routes pick from (later picks
+    # of a deleted one answer 404, which is not counted as an error).
+    Route("delete_venue", "GET", venue_path("/venues/delete/{}"), write=True),
+]
+
+
+# ----------------------------------------------------------------------------#
+# Clients.
+# ----------------------------------------------------------------------------#
+
+
+class TestClient(object):
+    """The app in this process, through Flask's test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def __call__(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code, response.headers.get("Server-Timing", "")
+
+    def get_json(self, path):
+        return self.client.get(path).get_json()
+
+
+class HttpClient(object):
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def __call__(self, method, path, data=None):
+        body = urllib.parse.urlencode(data, doseq=True).encode() if data else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                response.read()
+                return response.status, response.headers.get("Server-Timing", "")
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get("Server-Timing", "")
+
+    def get_json(self, path):
+        with urllib.request.urlopen(self.base_url + path, timeout=60) as response:
+            return json.load(response)
+
+
+def fetch_ids(client_factory):
+    """Ids to request, from the first page of each API collection."""
+    client = client_factory()
+    ids = {}
+    for kind in ("venues", "artists"):
+        payload = client.get_json(f"/api/v1/{kind}?per_page=100")
+        ids[kind] = [row["id"] for row in payload["data"]] or [1]
+    return ids
+
+
+# ----------------------------------------------------------------------------#
+# Measurement.
+# ----------------------------------------------------------------------------#
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def bench_route(route, client_factory, ids, requests, concurrency, seed):
+    latencies, queries, errors = [], [], []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker(n):
+        client = client_factory()
+        rng = random.Random(seed * 1000 + n)
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            method, path, data = route.request(rng, ids)
+            start = time.perf_counter()
+            try:
+                status, timing = client(method, path, data)
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+                continue
+            elapsed = time.perf_counter() - start
+            match = QUERIES.search(timing)
+            with lock:
+                latencies.append(elapsed)
+                if match:
+                    queries.append(int(match.group(1)))
+                if status >= 400 and status != 404:
+                    errors.append(f"{status} {path}")
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "method": route.method,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else None,
+        "mean_queries": round(sum(queries) / len(queries), 2) if queries else None,
+        "max_queries": max(queries) if queries else None,
+    }
+
+
+def ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Benchmark a running server instead.")
+    parser.add_argument("--requests", type=int, default=200, help="Per route.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10, help="Per route.")
+    parser.add_argument("--routes", help="Comma-separated route names to run.")
+    parser.add_argument("--writes", action="store_true", help="Include writes.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", help="Free-form note stored with the results.")
+    parser.add_argument("--out", help="Write the results as JSON to this path.")
+    args = parser.parse_args()
+
+    if args.url:
+        client_factory = lambda: HttpClient(args.url)  # noqa: E731
+        target = args.url
+    else:
+        from app import app
+
+        # The posted forms carry no CSRF token.
+        app.config["WTF_CSRF_ENABLED"] = False
+        client_factory = lambda: TestClient(app)  # noqa: E731
+        target = app.config["SQLALCHEMY_DATABASE_URI"].rsplit("@", 1)[-1]
+
+    wanted = set(args.routes.split(",")) if args.routes else None
+    routes = [
+        route
+        for route in ROUTES
+        if (wanted is None or route.name in wanted) and (args.writes or not route.write)
+    ]
+    ids = fetch_ids(client_factory)
+
+    results = {}
+    print(
+        f"{'route':<20} {'req':>5} {'err':>4} {'rps':>8} "
+        f"{'p50':>8} {'p95':>8} {'p99':>8} {'queries':>7}"
+    )
+    for route in routes:
+        if args.warmup:
+            bench_route(route, client_factory, ids, args.warmup, 1, args.seed)
+        result = bench_route(
+            route, client_factory, ids, args.requests, args.concurrency, args.seed
+        )
+        results[route.name] = result
+        print(
+            f"{route.name:<20} {result['requests']:>5} {result['errors']:>4} "
+            f"{result['throughput_rps'] or 0:>8.1f} {result['p50_ms'] or 0:>8.2f} "
+            f"{result['p95_ms'] or 0:>8.2f} {result['p99_ms'] or 0:>8.2f} "
+            f"{result['mean_queries'] if result['mean_queries'] is not None else '-':>7}"
+        )
+
+    if args.out:
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "label": args.label,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "target": target,
+                "requests_per_route": args.requests,
+                "concurrency": args.concurrency,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+            },
+            "routes": results,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
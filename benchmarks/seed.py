@@ -0,0 +1,175 @@
+"""Seed a database with synthetic venues, artists and shows.
+
+    python benchmarks/seed.py --scale 100k --reset
+    DATABASE_URL=postgresql://... python benchmarks/seed.py --shows 250000
+
+Scales are measured in shows (10k, 100k, 1m); venues and artists default to
+1/20 and 1/10 of that. Start times are spread a year either side of now, so
+about half the shows are upcoming. The same --seed gives the same data.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import text  # noqa: E402
+
+import counters  # noqa: E402
+import feed  # noqa: E402
+import genres  # noqa: E402
+import geo  # noqa: E402
+from app import app  # noqa: E402
+from commands import insert_batch, reset_sequence  # noqa: E402
+from forms import genres_choices, state_choices  # noqa: E402
+from models import Artist, Show, Venue, db, utcnow  # noqa: E402
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+CITIES = [
+    "San Francisco",
+    "New York",
+    "Austin",
+    "Chicago",
+    "Seattle",
+    "Nashville",
+    "Denver",
+    "Portland",
+    "Atlanta",
+    "Boston",
+]
+WORDS = [
+    "Blue",
+    "Velvet",
+    "Electric",
+    "Hollow",
+    "Golden",
+    "Midnight",
+    "Silver",
+    "Wild",
+    "Broken",
+    "Neon",
+    "Echo",
+    "River",
+    "Static",
+    "Lantern",
+    "Harbor",
+]
+GENRES = [value for value, _ in genres_choices]
+STATES = [value for value, _ in state_choices]
+
+
+def name(rng, kind, i):
+    return f"{rng.choice(WORDS)} {rng.choice(WORDS)} {kind} {i}"
+
+
+def venue_rows(rng, count):
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "name": name(rng, "Hall", i),
+            "city": rng.choice(CITIES),
+            "state": rng.choice(STATES),
+            "address": f"{rng.randint(1, 9999)} {rng.choice(WORDS)} St",
+            "phone": f"{rng.randint(200, 999)}-555-{rng.randint(1000, 9999)}",
+            "genres": rng.sample(GENRES, rng.randint(1, 3)),
+            "image_link": f"https://example.com/venues/{i}.jpg",
+            "facebook_link": f"https://facebook.com/venue{i}",
+            "website_link": f"https://venue{i}.example.com",
+            "seeking_talent": rng.random() < 0.3,
+            "seeking_description": "",
+        }
+
+
+def artist_rows(rng, count):
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "name": name(rng, "Band", i),
+            "city": rng.choice(CITIES),
+            "state": rng.choice(STATES),
+            "phone": f"{rng.randint(200, 999)}-555-{rng.randint(1000, 9999)}",
+            "genres": rng.sample(GENRES, rng.randint(1, 3)),
+            "image_link": f"https://example.com/artists/{i}.jpg",
+            "facebook_link": f"https://facebook.com/artist{i}",
+            "website_link": f"https://artist{i}.example.com",
+            "seeking_venue": rng.random() < 0.3,
+            "seeking_description": "",
+        }
+
+
+def show_rows(rng, count, venues, artists):
+    now = utcnow().replace(minute=0, second=0, microsecond=0)
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "venue_id": rng.randint(1, venues),
+            "artist_id": rng.randint(1, artists),
+            "start_time": now + timedelta(hours=rng.randint(-24 * 365, 24 * 365)),
+        }
+
+
+def load(model, rows, batch_size):
+    table = model.__table__
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            insert_batch(table, list(batch[0]), batch)
+            db.session.commit()
+            batch = []
+    if batch:
+        insert_batch(table, list(batch[0]), batch)
+    reset_sequence(table)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--shows", type=int, help="Overrides --scale.")
+    parser.add_argument("--venues", type=int)
+    parser.add_argument("--artists", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument(
+        "--reset", action="store_true", help="Drop and recreate every table first."
+    )
+    args = parser.parse_args()
+
+    shows = args.shows or SCALES[args.scale]
+    venues = args.venues or max(shows // 20, 1)
+    artists = args.artists or max(shows // 10, 1)
+    rng = random.Random(args.seed)
+
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+            if db.engine.dialect.name == "postgresql":
+                with db.engine.begin() as connection:
+                    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            db.create_all()
+
+        start = time.perf_counter()
+        load(Venue, venue_rows(rng, venues), args.batch_size)
+        load(Artist, artist_rows(rng, artists), args.batch_size)
+        load(Show, show_rows(rng, shows, venues, artists), args.batch_size)
+        counters.refresh_all()
+        genres.rebuild(batch_size=args.batch_size)
+        geo.geocode_venues(batch_size=args.batch_size)
+        feed.rebuild()
+        db.session.commit()
+        elapsed = time.perf_counter() - start
+
+    print(
+        f"Seeded {venues} venues, {artists} artists and {shows} shows "
+        f"in {elapsed:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
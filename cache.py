@@ -0,0 +1,293 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import jsonify, request, session
+
+from replicas import pinned_to_primary
+
+# ----------------------------------------------------------------------------#
+# Backends.
+# ----------------------------------------------------------------------------#
+
+
+class BaseCache(object):
+    """Key/value store with per-key TTL. ``ttl=None`` never expires."""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+
+class NullCache(BaseCache):
+    """Caches nothing; every lookup is a miss."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUCache(BaseCache):
+    """In-process cache holding at most ``max_entries`` keys.
+
+    Fast, but private to one worker: invalidations made by other processes
+    are only seen once entries expire.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FileSystemCache(BaseCache):
+    """Cache shared by every worker on a host, one pickle file per key."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                expires_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires_at is not None and expires_at <= time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = None if ttl is None else time.time() + ttl
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((expires_at, value), f, pickle.HIGHEST_PROTOCOL)
+            # Atomic, so concurrent readers never see a half-written entry.
+            os.replace(tmp, self._path(key))
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+# ----------------------------------------------------------------------------#
+# Page cache.
+# ----------------------------------------------------------------------------#
+
+
+class PageCache(object):
+    """Caches rendered GET pages with a TTL plus tag-based invalidation.
+
+    Every entry records the version of each tag it was rendered under
+    (e.g. ``venue:3``). Write routes call ``invalidate("venue:3")``, which
+    gives the tag a new version, so every entry carrying it is stale on its
+    next read. Tag versions live in the same backend as the entries, so
+    with a shared backend an invalidation is seen by every worker.
+
+    Lookups and stores are counted per ``kind`` ("pages", or "fragments"
+    for fragments.py), and /cache/stats reports each kind separately.
+    """
+
+    backends = {
+        "null": lambda app: NullCache(),
+        "lru": lambda app: LRUCache(app.config["CACHE_LRU_MAX_ENTRIES"]),
+        "filesystem": lambda app: FileSystemCache(app.config["CACHE_DIR"]),
+    }
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.default_ttl = None
+        self.counts = {
+            kind: {"hits": 0, "misses": 0, "stores": 0}
+            for kind in ("pages", "fragments")
+        }
+        self.invalidations = 0
+        self.key_parts = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = self.backends[app.config["CACHE_TYPE"]](app)
+        self.default_ttl = app.config["CACHE_DEFAULT_TTL"]
+        app.extensions["cache"] = self
+        app.add_url_rule("/cache/stats", "cache_stats", self.stats_view)
+
+    def vary_on(self, func):
+        """Add ``func()`` to every page key, for output that varies per request."""
+        self.key_parts.append(func)
+        return func
+
+    def page_key(self):
+        """Key of the current request's page, or None if it must not be cached."""
+        if request.method != "GET" or session.get("_flashes"):
+            return None
+        # A client pinned to the primary reads its own writes, never a page
+        # that a lagging replica may have re-filled after the invalidation.
+        if pinned_to_primary():
+            return None
+        parts = [request.full_path] + [str(func()) for func in self.key_parts]
+        return "page:" + "|".join(parts)
+
+    def _tag_versions(self, tags):
+        keys = ["tag:" + tag for tag in tags]
+        versions = dict(zip(tags, self.backend.get_many(keys)))
+        for tag, version in versions.items():
+            if version is None:
+                versions[tag] = self.invalidate(tag)
+        return versions
+
+    def invalidate(self, *tags):
+        """Give each tag a new version; returns the last one issued."""
+        version = None
+        for tag in tags:
+            version = uuid.uuid4().hex
+            self.backend.set("tag:" + tag, version)
+            self.invalidations += 1
+        return version
+
+    def get(self, key, kind="pages"):
+        entry = self.backend.get(key)
+        if entry is not None:
+            tags = list(entry["tags"])
+            current = self.backend.get_many(["tag:" + tag for tag in tags])
+            if current == [entry["tags"][tag] for tag in tags]:
+                self.counts[kind]["hits"] += 1
+                return entry["value"]
+        self.counts[kind]["misses"] += 1
+        return None
+
+    def snapshot(self, tags):
+        """The current versions of ``tags``, to pass to ``set`` for a value
+        computed afterwards."""
+        return self._tag_versions(list(tags))
+
+    def set(self, key, value, tags=(), ttl=None, versions=None, kind="pages"):
+        """Store ``value`` under the tag ``versions`` it was computed from.
+
+        Take them with ``snapshot`` before computing the value: an
+        invalidation landing in between then leaves the entry stale, rather
+        than filing the old value under the new version. Without
+        ``versions`` the tags' current ones are used.
+        """
+        if versions is None:
+            versions = self.snapshot(tags)
+        entry = {"value": value, "tags": versions}
+        self.backend.set(key, entry, ttl if ttl is not None else self.default_ttl)
+        self.counts[kind]["stores"] += 1
+
+    def cached(self, tags=(), ttl=None):
+        """Cache a view's rendered body, keyed on the request path and query
+        plus any ``vary_on`` parts.
+
+        ``tags`` are formatted with the view arguments, so ``"venue:{venue_id}"``
+        tags ``/venues/3`` as ``venue:3``. Requests carrying pending flash
+        messages bypass the cache, since the layout renders them, and so do
+        requests pinned to the primary database (see replicas.py).
+        """
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                key = self.page_key()
+                if key is None:
+                    return view(**kwargs)
+                body = self.get(key)
+                if body is not None:
+                    return body
+                versions = self.snapshot(tag.format(**kwargs) for tag in tags)
+                rv = view(**kwargs)
+                if isinstance(rv, str):
+                    self.set(key, rv, ttl=ttl, versions=versions)
+                return rv
+
+            return wrapper
+
+        return decorator
+
+    def stats(self):
+        stats = {
+            "backend": type(self.backend).__name__,
+            "invalidations": self.invalidations,
+        }
+        for kind, counts in self.counts.items():
+            lookups = counts["hits"] + counts["misses"]
+            stats[kind] = dict(
+                counts, hit_ratio=counts["hits"] / lookups if lookups else 0.0
+            )
+        return stats
+
+    def stats_view(self):
+        return jsonify(self.stats())
+
+
+cache = PageCache()
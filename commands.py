@@ -0,0 +1,242 @@
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import Boolean, DateTime, Integer, delete, insert, select, text
+from sqlalchemy.types import JSON
+
+import counters
+import feed
+import genres
+import geo
+from cache import cache
+from models import Artist, ImportCheckpoint, Show, Venue, db
+
+# ----------------------------------------------------------------------------#
+# Bulk import / export.
+#
+#   flask data export venues venues.csv
+#   flask data import shows shows.jsonl --batch-size 5000
+#
+# Files are CSV with a header row, or JSON lines when the name ends in
+# .jsonl / .ndjson (or with --format). Both directions stream, so memory use
+# does not grow with the file.
+# ----------------------------------------------------------------------------#
+
+MODELS = {"venues": Venue, "artists": Artist, "shows": Show}
+
+data_cli = AppGroup("data", help="Bulk import and export of catalog data.")
+
+
+def detect_format(path, fmt):
+    if fmt:
+        return fmt
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def read_records(f, fmt):
+    if fmt == "jsonl":
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        yield from csv.DictReader(f)
+
+
+def from_text(column, value):
+    """Coerce a CSV cell to the column's Python type; JSON lines pass through."""
+    if not isinstance(value, str):
+        return value
+    if value == "":
+        return None
+    if isinstance(column.type, Integer):
+        return int(value)
+    if isinstance(column.type, Boolean):
+        return value.lower() in ("1", "t", "true", "yes", "y")
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column.type, JSON):
+        return json.loads(value)
+    return value
+
+
+def to_text(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+def insert_batch(table, columns, rows):
+    """Insert rows with COPY on PostgreSQL, executemany elsewhere."""
+    connection = db.session.connection()
+    if connection.dialect.name == "postgresql":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in rows:
+            writer.writerow([to_text(row[c]) for c in columns])
+        buf.seek(0)
+        names = ", ".join(f'"{c}"' for c in columns)
+        with connection.connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY "{table.name}" ({names}) FROM STDIN WITH (FORMAT csv)', buf
+            )
+    else:
+        db.session.execute(insert(table), rows)
+
+
+def detail_tags(entity, rows):
+    """Cache tags of the detail pages that imported ``rows`` change. Rows
+    without an id are new, so no page of theirs is cached yet."""
+    if entity == "shows":
+        keys = (("venue", "venue_id"), ("artist", "artist_id"))
+    else:
+        keys = ((entity[:-1], "id"),)
+    return {
+        f"{prefix}:{row[key]}"
+        for row in rows
+        for prefix, key in keys
+        if row.get(key) is not None
+    }
+
+
+def reset_sequence(table):
+    # Imported rows carry explicit ids; move the serial past them.
+    if db.session.connection().dialect.name == "postgresql":
+        db.session.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', 'id'), "
+                f'coalesce(max(id), 1)) FROM "{table.name}"'
+            )
+        )
+
+
+def read_checkpoint(name):
+    checkpoint = db.session.get(ImportCheckpoint, name)
+    return checkpoint.position if checkpoint is not None else 0
+
+
+def write_checkpoint(name, position):
+    """Record progress in the current transaction, i.e. with its batch."""
+    db.session.merge(ImportCheckpoint(name=name, position=position))
+
+
+def clear_checkpoint(name):
+    db.session.execute(delete(ImportCheckpoint).where(ImportCheckpoint.name == name))
+
+
+@data_cli.command("import")
+@click.argument("entity", type=click.Choice(sorted(MODELS)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]))
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option(
+    "--checkpoint",
+    help="Progress record name; defaults to ENTITY:PATH. An existing one resumes.",
+)
+@click.option("--restart", is_flag=True, help="Ignore any existing checkpoint.")
+def import_data(entity, path, fmt, batch_size, checkpoint, restart):
+    """Import ENTITY rows from PATH in batches of --batch-size.
+
+    Each batch commits on its own, together with its progress in the
+    ImportCheckpoint table, so an interrupted import re-run with the same
+    arguments resumes right after the last committed batch. The checkpoint
+    is only cleared once the recounts after the last batch have committed.
+    """
+    table = MODELS[entity].__table__
+    checkpoint = checkpoint or f"{entity}:{os.path.abspath(path)}"
+    done = 0 if restart else read_checkpoint(checkpoint)
+    if done:
+        click.echo(f"Resuming after {done} records")
+
+    fmt = detect_format(path, fmt)
+    imported = 0
+    touched = set()
+    with open(path, newline="") as f:
+        records = read_records(f, fmt)
+        columns = None
+        batch = []
+        for position, record in enumerate(records, start=1):
+            if position <= done:
+                continue
+            if columns is None:
+                columns = [c for c in record if c in table.columns]
+            batch.append(
+                {c: from_text(table.columns[c], record.get(c)) for c in columns}
+            )
+            if len(batch) >= batch_size:
+                insert_batch(table, columns, batch)
+                write_checkpoint(checkpoint, position)
+                db.session.commit()
+                imported += len(batch)
+                touched |= detail_tags(entity, batch)
+                batch = []
+        if batch:
+            insert_batch(table, columns, batch)
+            write_checkpoint(checkpoint, position)
+            db.session.commit()
+            imported += len(batch)
+            touched |= detail_tags(entity, batch)
+
+    reset_sequence(table)
+    # Imported rows bypass the per-write counter updates, genre links, venue
+    # locations and feed rows (and exported venues/artists carry counters as
+    # of the export), so recount.
+    counters.refresh_all()
+    if entity in ("venues", "artists"):
+        genres.rebuild([MODELS[entity]], batch_size)
+    if entity == "venues":
+        geo.geocode_venues(batch_size=batch_size)
+    feed.rebuild()
+    clear_checkpoint(checkpoint)
+    db.session.commit()
+    cache.invalidate(entity, "venues", "artists", "shows", *sorted(touched))
+    click.echo(f"Imported {imported} {entity}")
+
+
+@data_cli.command("export")
+@click.argument("entity", type=click.Choice(sorted(MODELS)))
+@click.argument("path", default="-")
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]))
+@click.option("--batch-size", default=1000, show_default=True)
+def export_data(entity, path, fmt, batch_size):
+    """Export every ENTITY row to PATH (default stdout).
+
+    Rows are read through a server-side cursor --batch-size at a time.
+    """
+    table = MODELS[entity].__table__
+    columns = [c.name for c in table.columns]
+    fmt = detect_format(path, fmt)
+    stmt = select(table).order_by(table.c.id).execution_options(yield_per=batch_size)
+
+    out = sys.stdout if path == "-" else open(path, "w", newline="")
+    try:
+        writer = None
+        if fmt == "csv":
+            writer = csv.writer(out)
+            writer.writerow(columns)
+        exported = 0
+        for row in db.session.execute(stmt):
+            if writer is not None:
+                writer.writerow([to_text(row._mapping[c]) for c in columns])
+            else:
+                out.write(json.dumps(dict(row._mapping), default=to_text) + "\n")
+            exported += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    click.echo(f"Exported {exported} {entity}", err=True)
+
+
+def init_app(app):
+    app.cli.add_command(data_cli)
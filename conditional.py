@@ -0,0 +1,77 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import has_request_context, make_response, request, session
+from werkzeug.http import is_resource_modified
+
+# ----------------------------------------------------------------------------#
+# HTTP conditional requests.
+# ----------------------------------------------------------------------------#
+
+etag_parts = []
+
+
+def vary_validators_on(func):
+    """Add ``func()`` to every ETag, for output that varies per request."""
+    etag_parts.append(func)
+    return func
+
+
+def validators_for(*timestamps):
+    """Strong ETag and Last-Modified for a page built from ``timestamps``.
+
+    ``None`` entries (e.g. a venue without shows) still count towards the
+    ETag, so gaining a first show changes it. So does any
+    ``vary_validators_on`` part, so a client never gets a 304 for a copy
+    rendered for another locale or timezone.
+    """
+    stamps = [as_utc(ts) for ts in timestamps]
+    parts = ["" if ts is None else ts.isoformat() for ts in stamps]
+    if has_request_context():
+        parts += [str(func()) for func in etag_parts]
+    digest = hashlib.sha1("|".join(parts).encode()).hexdigest()
+    known = [ts for ts in stamps if ts is not None]
+    return digest, max(known) if known else None
+
+
+def as_utc(ts):
+    # SQLite hands back naive datetimes; they are stored as UTC.
+    if ts is not None and ts.tzinfo is None:
+        return ts.replace(tzinfo=timezone.utc)
+    return ts
+
+
+def conditional(validators):
+    """Answer a GET with 304 Not Modified when the client's copy is current.
+
+    ``validators(**view_args)`` must return ``(etag, last_modified)`` from a
+    cheap metadata query; it runs before the view, so a 304 costs neither
+    loading relationships nor rendering the template.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # Pending flash messages make the page personal; don't validate it.
+            if request.method != "GET" or session.get("_flashes"):
+                return view(**kwargs)
+            etag, last_modified = validators(**kwargs)
+            if is_resource_modified(
+                request.environ, etag=etag, last_modified=last_modified
+            ):
+                response = make_response(view(**kwargs))
+            else:
+                response = make_response("", 304)
+            return with_validators(response, etag, last_modified)
+
+        return wrapper
+
+    return decorator
+
+
+def with_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
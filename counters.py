@@ -0,0 +1,202 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import and_, bindparam, case, exists, func, or_, select, update
+
+import jobs
+from cache import cache
+from conditional import as_utc
+from models import Artist, Show, Venue, db, utcnow
+
+# ----------------------------------------------------------------------------#
+# Denormalized show counters.
+#
+# Venue and Artist carry upcoming_shows_count, past_shows_count and
+# next_show_time so that listings never aggregate Show. Writes adjust them in
+# the same transaction as the show change; time moves shows from upcoming to
+# past, which the periodic counters.roll_forward job (or `flask counters
+# roll-forward`) catches up on. `flask counters verify` recomputes everything
+# and reports drift.
+# ----------------------------------------------------------------------------#
+
+COUNTERS = ("upcoming_shows_count", "past_shows_count", "next_show_time")
+
+counters_cli = AppGroup("counters", help="Maintain the show counters.")
+
+
+def show_key(model):
+    return Show.venue_id if model is Venue else Show.artist_id
+
+
+def computed(model, now):
+    """Correlated subqueries computing each counter of ``model`` from Show.
+
+    An artist's counts leave out shows at soft-deleted venues, which stay in
+    Show until deletion.py purges them.
+    """
+    key = show_key(model)
+    live = []
+    if model is Artist:
+        # The Table, not the entity: models.hide_deleted must not rewrite it.
+        venues = Venue.__table__
+        live.append(
+            ~exists().where(
+                venues.c.id == Show.venue_id, venues.c.deleted_at.is_not(None)
+            )
+        )
+
+    def aggregate(value, *criteria):
+        return select(value).where(key == model.id, *criteria, *live).scalar_subquery()
+
+    return {
+        "upcoming_shows_count": aggregate(func.count(Show.id), Show.start_time > now),
+        "past_shows_count": aggregate(func.count(Show.id), Show.start_time <= now),
+        "next_show_time": aggregate(func.min(Show.start_time), Show.start_time > now),
+    }
+
+
+def refresh(model, ids=None, now=None):
+    """Recompute the counters of ``ids`` (every row when None) in one UPDATE."""
+    stmt = update(model).values(**computed(model, now or utcnow()))
+    if ids is not None:
+        stmt = stmt.where(model.id.in_(list(ids)))
+    return db.session.execute(
+        stmt.execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def record_show(show, now=None):
+    """Count a newly added ``show`` on its venue and artist."""
+    record_shows([show], now)
+
+
+def record_shows(shows, now=None):
+    """Count newly added ``shows`` on their venues and artists.
+
+    Increments rather than recounts, so the cost does not grow with the shows
+    a venue or artist already has: one executemany UPDATE per table, with one
+    parameter set per distinct venue or artist.
+    """
+    now = now or utcnow()
+    for model in (Venue, Artist):
+        key = "venue_id" if model is Venue else "artist_id"
+        deltas = {}
+        for show in shows:
+            start = as_utc(show.start_time)
+            delta = deltas.setdefault(
+                getattr(show, key), {"upcoming": 0, "past": 0, "next": None}
+            )
+            if start is not None and start > now:
+                delta["upcoming"] += 1
+                if delta["next"] is None or start < delta["next"]:
+                    delta["next"] = start
+            else:
+                delta["past"] += 1
+        if not deltas:
+            continue
+        table = model.__table__
+        next_time = bindparam("next", type_=table.c.next_show_time.type)
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("parent_id"))
+            .values(
+                upcoming_shows_count=table.c.upcoming_shows_count
+                + bindparam("upcoming"),
+                past_shows_count=table.c.past_shows_count + bindparam("past"),
+                next_show_time=case(
+                    (
+                        and_(
+                            next_time.is_not(None),
+                            or_(
+                                table.c.next_show_time.is_(None),
+                                table.c.next_show_time > next_time,
+                            ),
+                        ),
+                        next_time,
+                    ),
+                    else_=table.c.next_show_time,
+                ),
+            ),
+            [{"parent_id": parent_id, **delta} for parent_id, delta in deltas.items()],
+        )
+
+
+def roll_forward(now=None):
+    """Move shows that have started from upcoming to past.
+
+    Only rows whose next_show_time has passed can be stale, and the index on
+    that column finds them.
+    """
+    now = now or utcnow()
+    rolled = 0
+    for model in (Venue, Artist):
+        rolled += db.session.execute(
+            update(model)
+            .where(model.next_show_time <= now)
+            .values(**computed(model, now))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    return rolled
+
+
+def drift(model, now=None):
+    """``(id, stored, expected)`` for every row whose counters are wrong."""
+    expected = computed(model, now or utcnow())
+    stmt = select(
+        model.id,
+        *[getattr(model, name) for name in COUNTERS],
+        *[expected[name].label(f"expected_{name}") for name in COUNTERS],
+    ).execution_options(yield_per=1000)
+    for row in db.session.execute(stmt):
+        stored = tuple(row[1 : 1 + len(COUNTERS)])
+        wanted = tuple(row[1 + len(COUNTERS) :])
+        if stored[:2] != wanted[:2] or as_utc(stored[2]) != as_utc(wanted[2]):
+            yield row.id, stored, wanted
+
+
+def refresh_all():
+    """Recompute every counter, e.g. after a bulk import."""
+    now = utcnow()
+    for model in (Venue, Artist):
+        refresh(model, now=now)
+
+
+@jobs.task("counters.roll_forward")
+def roll_forward_job():
+    """Roll the counters forward and drop the listings that changed."""
+    rolled = roll_forward()
+    db.session.commit()
+    if rolled:
+        cache.invalidate("venues", "artists")
+    return rolled
+
+
+@counters_cli.command("roll-forward")
+def roll_forward_command():
+    """Move shows that have started from upcoming to past."""
+    click.echo(f"Rolled forward {roll_forward_job()} rows")
+
+
+@counters_cli.command("verify")
+@click.option("--fix", is_flag=True, help="Recompute the counters that drifted.")
+def verify_command(fix):
+    """Compare the stored counters with a recount of Show."""
+    now = utcnow()
+    total = 0
+    for model in (Venue, Artist):
+        ids = []
+        for row_id, stored, wanted in drift(model, now):
+            click.echo(f"{model.__tablename__} {row_id}: {stored} != {wanted}")
+            ids.append(row_id)
+        if ids and fix:
+            refresh(model, ids, now)
+        total += len(ids)
+    if fix and total:
+        db.session.commit()
+        cache.invalidate("venues", "artists")
+    click.echo(f"{total} rows drifted" + (", fixed" if fix and total else ""))
+    if total and not fix:
+        raise SystemExit(1)
+
+
+def init_app(app):
+    app.cli.add_command(counters_cli)
@@ -0,0 +1,135 @@
+import logging
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, select, update
+
+import counters
+import feed
+import genres
+import jobs
+from cache import cache
+from models import Artist, Show, Venue, VenueGenre, db, utcnow
+
+# ----------------------------------------------------------------------------#
+# Venue deletion.
+#
+# Deleting a venue is a soft delete: one UPDATE sets deleted_at, after which
+# models.hide_deleted leaves the venue and its shows out of every query, so
+# the user gets an immediate answer however many shows the venue has. The
+# rows themselves are purged afterwards by a venues.purge job (see jobs.py),
+# queued in the same transaction, with set-based DELETEs of at most
+# PURGE_BATCH_SIZE shows per transaction, so a large venue never holds long
+# locks on Show.
+#
+# `flask venues purge` purges every soft-deleted venue by hand.
+# ----------------------------------------------------------------------------#
+
+venues_cli = AppGroup("venues", help="Venue maintenance.")
+
+log = logging.getLogger("fyyur.deletion")
+
+
+def soft_delete_venue(venue_id, now=None):
+    """Mark the venue deleted, recount its artists' shows and queue its
+    purge; returns False if there is no such venue. The caller commits, then
+    invalidates the "artists" listing and app.venue_cache_tags()."""
+    deleted = db.session.execute(
+        update(Venue)
+        .where(Venue.id == venue_id, Venue.deleted_at.is_(None))
+        .values(deleted_at=now or utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if deleted:
+        # Its shows drop off the artists' counts and pages now, not at the
+        # purge; the refresh also moves their updated_at, i.e. their ETags.
+        artist_ids = db.session.scalars(
+            select(Show.artist_id).where(Show.venue_id == venue_id).distinct()
+        ).all()
+        if artist_ids:
+            counters.refresh(Artist, artist_ids)
+        jobs.enqueue(
+            "venues.purge", {"venue_id": venue_id}, key=f"venues.purge:{venue_id}"
+        )
+        feed.remove_venue(venue_id)
+        # The genre facet counts only venues that are not deleted.
+        genres.refresh_counts(
+            db.session.scalars(
+                select(VenueGenre.c.genre_id).where(VenueGenre.c.venue_id == venue_id)
+            ).all()
+        )
+    return bool(deleted)
+
+
+def purge_venue(venue_id, batch_size):
+    """Delete a soft-deleted venue's shows in batches, then the venue.
+
+    Each batch commits on its own. Returns the number of shows deleted.
+    """
+    artist_ids = set(
+        db.session.scalars(
+            select(Show.artist_id).where(Show.venue_id == venue_id).distinct()
+        )
+    )
+    # Served by ix_Show_venue_id_start_time.
+    batch = (
+        select(Show.id).where(Show.venue_id == venue_id).limit(batch_size)
+    ).scalar_subquery()
+    purged = 0
+    while True:
+        deleted = db.session.execute(
+            delete(Show)
+            .where(Show.id.in_(batch))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        purged += deleted
+        if deleted < batch_size:
+            break
+
+    feed.remove_venue(venue_id)
+    db.session.execute(delete(VenueGenre).where(VenueGenre.c.venue_id == venue_id))
+    db.session.execute(
+        delete(Venue)
+        .where(Venue.id == venue_id, Venue.deleted_at.is_not(None))
+        .execution_options(synchronize_session=False)
+    )
+    # Artists who played here lose those shows from their counts and pages.
+    if artist_ids:
+        counters.refresh(Artist, artist_ids)
+    db.session.commit()
+    cache.invalidate("artists", *(f"artist:{artist_id}" for artist_id in artist_ids))
+    return purged
+
+
+def deleted_venue_ids():
+    return db.session.scalars(
+        select(Venue.id)
+        .where(Venue.deleted_at.is_not(None))
+        .order_by(Venue.deleted_at)
+        .execution_options(include_deleted=True)
+    ).all()
+
+
+@jobs.task("venues.purge")
+def purge_job(venue_id):
+    # Safe to run twice: a purged venue has nothing left to delete.
+    shows = purge_venue(venue_id, current_app.config["PURGE_BATCH_SIZE"])
+    log.info("Purged venue %s and %s shows", venue_id, shows)
+
+
+@venues_cli.command("purge")
+@click.option("--batch-size", type=int, help="Defaults to PURGE_BATCH_SIZE.")
+def purge_command(batch_size):
+    """Purge every soft-deleted venue and its shows."""
+    batch_size = batch_size or current_app.config["PURGE_BATCH_SIZE"]
+    venue_ids = deleted_venue_ids()
+    for venue_id in venue_ids:
+        shows = purge_venue(venue_id, batch_size)
+        click.echo(f"Venue {venue_id}: purged {shows} shows")
+    click.echo(f"Purged {len(venue_ids)} venues")
+
+
+def init_app(app):
+    app.cli.add_command(venues_cli)
@@ -0,0 +1,137 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, insert, select, update
+
+import jobs
+from cache import cache
+from models import Artist, Show, UpcomingShow, Venue, db, utcnow
+
+# ----------------------------------------------------------------------------#
+# The upcoming shows feed.
+#
+# UpcomingShow is a materialized copy of every show that has not started
+# yet, with the artist and venue fields its tile renders, so /shows pages
+# through one narrow table instead of joining Show to Artist and Venue.
+# Writes keep it current in their own transaction: new shows are added,
+# soft-deleted venues take their shows with them, and edits to an artist or
+# venue rewrite the copied names. Started shows are dropped by the periodic
+# feed.roll_off job (or `flask feed roll-off`); until then the listing
+# itself skips them.
+# ----------------------------------------------------------------------------#
+
+feed_cli = AppGroup("feed", help="Maintain the upcoming shows feed.")
+
+FEED_COLUMNS = (
+    "show_id",
+    "start_time",
+    "venue_id",
+    "venue_name",
+    "artist_id",
+    "artist_name",
+    "artist_image_link",
+)
+
+
+def source(now):
+    """Upcoming shows as feed rows, read from Show, Artist and Venue.
+
+    Used in INSERT ... SELECT, which models.hide_deleted does not rewrite,
+    so deleted venues are filtered here.
+    """
+    return (
+        select(
+            Show.id,
+            Show.start_time,
+            Show.venue_id,
+            Venue.name,
+            Show.artist_id,
+            Artist.name,
+            Artist.image_link,
+        )
+        .join(Artist, Show.artist_id == Artist.id)
+        .join(Venue, Show.venue_id == Venue.id)
+        .where(Show.start_time > now, Venue.deleted_at.is_(None))
+    )
+
+
+def add_shows(show_ids, now=None):
+    """Copy the newly added ``show_ids`` that are still upcoming into the feed."""
+    show_ids = list(show_ids)
+    if not show_ids:
+        return 0
+    return db.session.execute(
+        insert(UpcomingShow).from_select(
+            FEED_COLUMNS, source(now or utcnow()).where(Show.id.in_(show_ids))
+        )
+    ).rowcount
+
+
+def remove_venue(venue_id):
+    """Drop a (deleted) venue's shows from the feed."""
+    return db.session.execute(
+        delete(UpcomingShow)
+        .where(UpcomingShow.venue_id == venue_id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def rename(obj):
+    """Rewrite the copied fields of an edited venue or artist."""
+    if isinstance(obj, Venue):
+        criteria = UpcomingShow.venue_id == obj.id
+        values = {"venue_name": obj.name}
+    else:
+        criteria = UpcomingShow.artist_id == obj.id
+        values = {"artist_name": obj.name, "artist_image_link": obj.image_link}
+    return db.session.execute(
+        update(UpcomingShow)
+        .where(criteria)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def roll_off(now=None):
+    """Drop the shows that have started; a range scan of the start_time index."""
+    return db.session.execute(
+        delete(UpcomingShow)
+        .where(UpcomingShow.start_time <= (now or utcnow()))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def rebuild(now=None):
+    """Refill the feed from Show, e.g. after a bulk import."""
+    db.session.execute(delete(UpcomingShow))
+    return db.session.execute(
+        insert(UpcomingShow).from_select(FEED_COLUMNS, source(now or utcnow()))
+    ).rowcount
+
+
+@jobs.task("feed.roll_off")
+def roll_off_job():
+    """Roll the feed off and drop the cached /shows pages if it changed."""
+    dropped = roll_off()
+    db.session.commit()
+    if dropped:
+        cache.invalidate("shows")
+    return dropped
+
+
+@feed_cli.command("roll-off")
+def roll_off_command():
+    """Drop shows that have started from the feed."""
+    click.echo(f"Rolled off {roll_off_job()} shows")
+
+
+@feed_cli.command("rebuild")
+def rebuild_command():
+    """Refill the feed from every upcoming show."""
+    added = rebuild()
+    db.session.commit()
+    cache.invalidate("shows")
+    click.echo(f"Feed holds {added} shows")
+
+
+def init_app(app):
+    app.cli.add_command(feed_cli)
@@ -0,0 +1,138 @@
+from datetime import datetime
+from functools import lru_cache
+
+import dateutil.parser
+from babel import Locale, UnknownLocaleError
+from babel.dates import get_timezone, parse_pattern
+from flask import current_app, g, has_request_context, request
+
+# ----------------------------------------------------------------------------#
+# Date formatting for templates.
+#
+# Babel's format_datetime() re-resolves the locale and pattern on every call,
+# and the old filter ran dateutil's heuristic parser first. A formatter keeps
+# compiled patterns and locales, takes datetimes (or ISO strings) directly,
+# and memoizes formatted results, since a page of show tiles repeats the same
+# few timestamps.
+# ----------------------------------------------------------------------------#
+
+FORMATS = {
+    "full": "EEEE MMMM, d, y 'at' h:mma",
+    "medium": "EE MM, dd, y h:mma",
+}
+
+
+def to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        # Anything else still gets the permissive (slow) parser.
+        return dateutil.parser.parse(value)
+
+
+class DateTimeFormatter(object):
+    def __init__(self, formats=None, cache_size=4096):
+        self.formats = dict(FORMATS, **(formats or {}))
+        self._format = lru_cache(maxsize=cache_size)(self._format_uncached)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def pattern(pattern):
+        return parse_pattern(pattern)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def locale(code):
+        return Locale.parse(code)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def timezone(name):
+        return get_timezone(name)
+
+    def _format_uncached(self, value, format, locale, tzname):
+        if value.tzinfo is None:
+            # Naive values are stored as UTC.
+            value = value.replace(tzinfo=self.timezone("UTC"))
+        value = value.astimezone(self.timezone(tzname))
+        pattern = self.pattern(self.formats.get(format, format))
+        return pattern.apply(value, self.locale(locale))
+
+    def __call__(self, value, format="medium", locale="en", tzname="UTC"):
+        if value is None or value == "":
+            return ""
+        return self._format(to_datetime(value), format, locale, tzname)
+
+    def cache_info(self):
+        return self._format.cache_info()
+
+
+# ----------------------------------------------------------------------------#
+# Per-request locale and timezone.
+# ----------------------------------------------------------------------------#
+
+
+def select_locale():
+    """Best of SUPPORTED_LOCALES for the Accept-Language header."""
+    config = current_app.config
+    return (
+        request.accept_languages.best_match(config["SUPPORTED_LOCALES"])
+        or config["BABEL_DEFAULT_LOCALE"]
+    )
+
+
+def select_timezone():
+    """Timezone from the ``tz`` cookie (an IANA name), if it is a known one."""
+    name = request.cookies.get("tz")
+    if name:
+        try:
+            DateTimeFormatter.timezone(name)
+            return name
+        except LookupError:
+            pass
+    return current_app.config["BABEL_DEFAULT_TIMEZONE"]
+
+
+def request_locale_key():
+    """Part of the page cache key and ETag: pages differ per locale and timezone."""
+    return f"{g.locale}|{g.timezone}"
+
+
+def init_app(app):
+    formatter = DateTimeFormatter(cache_size=app.config["DATETIME_FORMAT_CACHE_SIZE"])
+    for code in app.config["SUPPORTED_LOCALES"]:
+        try:
+            formatter.locale(code)
+        except (UnknownLocaleError, ValueError):
+            raise ValueError(f"Unknown locale in SUPPORTED_LOCALES: {code}")
+    app.extensions["datetime_formatter"] = formatter
+
+    @app.before_request
+    def set_locale():
+        g.locale = select_locale()
+        g.timezone = select_timezone()
+
+    @app.after_request
+    def vary_on_locale(response):
+        if len(app.config["SUPPORTED_LOCALES"]) > 1:
+            response.vary.add("Accept-Language")
+        # Pages render dates in the timezone of the "tz" cookie.
+        if response.mimetype == "text/html":
+            response.vary.add("Cookie")
+        return response
+
+    def format_datetime(value, format="medium"):
+        if has_request_context() and "locale" in g:
+            return formatter(value, format, g.locale, g.timezone)
+        config = app.config
+        return formatter(
+            value,
+            format,
+            config["BABEL_DEFAULT_LOCALE"],
+            config["BABEL_DEFAULT_TIMEZONE"],
+        )
+
+    app.jinja_env.filters["datetime"] = format_datetime
+    return formatter
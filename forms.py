@@ -1,16 +1,23 @@
 from datetime import datetime
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileAllowed, FileField
 from wtforms import (
     StringField,
     SelectField,
     SelectMultipleField,
     DateTimeField,
     BooleanField,
+    TextAreaField,
 )
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms.validators import DataRequired, URL
 
 import re
 
+from instrumentation import timed
+
+# Compiled once at import, not on every call.
+PHONE_PATTERN = re.compile(r"^\(?([0-9]{3})\)?[-. ]?([0-9]{3})[-. ]?([0-9]{4})$")
+
 
 def is_valid_phone(number):
     """Validate phone numbers like:
@@ -26,8 +33,13 @@ def is_valid_phone(number):
 
     Note: (? = optional) - Learn more: https://regex101.com/
     """
-    regex = re.compile("^\(?([0-9]{3})\)?[-. ]?([0-9]{3})[-. ]?([0-9]{4})$")
-    return regex.match(number)
+    return PHONE_PATTERN.match(number or "")
+
+
+# Validators hold no per-request state, so the form classes share one instance
+# of each (URL() compiles its pattern when constructed).
+required = DataRequired()
+url = URL()
 
 
 state_choices = [
@@ -107,28 +119,50 @@ genres_choices = [
 ]
 
 
-class ShowForm(FlaskForm):
+class TimedForm(FlaskForm):
+    """A FlaskForm whose processing and validation count as "forms" time in
+    the request's Server-Timing header and metrics (see instrumentation.py).
+    """
+
+    def __init__(self, *args, **kwargs):
+        with timed("forms"):
+            super().__init__(*args, **kwargs)
+
+    def validate(self, **kwargs):
+        with timed("forms"):
+            return super().validate(**kwargs)
+
+
+class ShowForm(TimedForm):
+    # Typed as ids, or picked by name from the typeahead in new_show.html.
     artist_id = StringField("artist_id")
     venue_id = StringField("venue_id")
+    # The callable, so each form defaults to now rather than to import time.
     start_time = DateTimeField(
-        "start_time", validators=[DataRequired()], default=datetime.today()
+        "start_time", validators=[required], default=datetime.today
     )
 
 
-class VenueForm(FlaskForm):
-    name = StringField("name", validators=[DataRequired()])
-    city = StringField("city", validators=[DataRequired()])
-    state = SelectField("state", validators=[DataRequired()], choices=state_choices)
-    address = StringField("address", validators=[DataRequired()])
+class ShowBatchForm(TimedForm):
+    # One "artist_id,venue_id,start_time" line per show, pasted or uploaded.
+    rows = TextAreaField("rows")
+    file = FileField("file", validators=[FileAllowed(["csv", "txt"])])
+
+
+class VenueForm(TimedForm):
+    name = StringField("name", validators=[required])
+    city = StringField("city", validators=[required])
+    state = SelectField("state", validators=[required], choices=state_choices)
+    address = StringField("address", validators=[required])
     phone = StringField("phone")
     image_link = StringField("image_link")
     genres = SelectMultipleField(
         # TODO implement enum restriction
         "genres",
-        validators=[DataRequired()],
+        validators=[required],
         choices=genres_choices,
     )
-    facebook_link = StringField("facebook_link", validators=[URL()])
+    facebook_link = StringField("facebook_link", validators=[url])
     website_link = StringField("website_link")
 
     seeking_talent = BooleanField("seeking_talent")
@@ -139,7 +173,7 @@ class VenueForm(FlaskForm):
         # `**kwargs` to match the method's signature in the `FlaskForm` class.
 
         """Define a custom validate method in your Form:"""
-        validated = FlaskForm.validate(self)
+        validated = super().validate(**kwargs)
 
         if not validated:
             return False
@@ -152,26 +186,26 @@ class VenueForm(FlaskForm):
         return True
 
 
-class ArtistForm(FlaskForm):
-    name = StringField("name", validators=[DataRequired()])
-    city = StringField("city", validators=[DataRequired()])
-    state = SelectField("state", validators=[DataRequired()], choices=state_choices)
+class ArtistForm(TimedForm):
+    name = StringField("name", validators=[required])
+    city = StringField("city", validators=[required])
+    state = SelectField("state", validators=[required], choices=state_choices)
     phone = StringField(
         # TODO implement validation logic for state
         "phone",
-        validators=[DataRequired()],
+        validators=[required],
     )
     image_link = StringField("image_link")
     genres = SelectMultipleField(
-        "genres", validators=[DataRequired()], choices=genres_choices
+        "genres", validators=[required], choices=genres_choices
     )
     facebook_link = StringField(
         # TODO implement enum restriction
         "facebook_link",
-        validators=[URL()],
+        validators=[url],
     )
 
-    website_link = StringField("website_link", validators=[URL()])
+    website_link = StringField("website_link", validators=[url])
 
     seeking_venue = BooleanField("seeking_venue")
 
@@ -181,7 +215,7 @@ class ArtistForm(FlaskForm):
         # `**kwargs` to match the method's signature in the `FlaskForm` class.
 
         """Define a custom validate method in your Form:"""
-        validated = FlaskForm.validate(self)
+        validated = super().validate(**kwargs)
 
         if not validated:
             return False
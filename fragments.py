@@ -0,0 +1,69 @@
+import os
+
+from flask import has_request_context
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from cache import cache
+from replicas import pinned_to_primary
+
+# ----------------------------------------------------------------------------#
+# Template fragment caching.
+#
+#   {% cache "venue:" ~ venue.id ~ ":past:" ~ venue.past_shows_count,
+#            config.CACHE_FRAGMENT_TTL, ["venue:" ~ venue.id] %}
+#       ... show tiles ...
+#   {% endcache %}
+#
+# The rendered block is stored in the page cache backend under the key,
+# plus the same per-request parts (locale, timezone) that pages vary on.
+# The optional tags are the page cache's, so the write routes that
+# invalidate "venue:3" drop its fragments too. The TTL defaults to
+# CACHE_DEFAULT_TTL. Hits and misses are counted under "fragments" in
+# /cache/stats.
+#
+# A fragment only pays off if it outlives the page it sits in, so it needs
+# a longer TTL than the page and a key that changes whenever the block
+# would render differently: anything that depends on the time of the
+# request, like the upcoming/past split, must be part of the key.
+# ----------------------------------------------------------------------------#
+
+
+class FragmentCacheExtension(Extension):
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        if len(args) > 3:
+            parser.fail("cache takes a key, a TTL and tags", lineno)
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method("_cache", args)
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _cache(self, key, ttl=None, tags=(), caller=None):
+        parts = [str(key)]
+        if has_request_context():
+            # Rendered from the primary's rows; see PageCache.page_key.
+            if pinned_to_primary():
+                return Markup(caller())
+            parts += [str(func()) for func in cache.key_parts]
+        key = "fragment:" + "|".join(parts)
+        value = cache.get(key, kind="fragments")
+        if value is None:
+            versions = cache.snapshot(tags)
+            value = caller()
+            cache.set(key, str(value), ttl=ttl, versions=versions, kind="fragments")
+        return Markup(value)
+
+
+def init_app(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    directory = app.config["JINJA_BYTECODE_CACHE_DIR"]
+    if directory:
+        # Compiled templates survive restarts, so workers start warm.
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
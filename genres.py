@@ -0,0 +1,206 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, event, func, insert, inspect, or_, select, update
+from sqlalchemy.orm import Session
+
+from forms import genres_choices
+from models import Artist, ArtistGenre, Genre, Show, Venue, VenueGenre, db
+
+# ----------------------------------------------------------------------------#
+# Normalized genres.
+#
+# Venue.genres and Artist.genres stay JSON lists (the forms and the API read
+# and write them), but every flush that changes one also rewrites that row's
+# VenueGenre/ArtistGenre links and recounts the genres involved. "Jazz
+# venues in CA" is then an index lookup on the links instead of decoding
+# every row's JSON, and the listing pages read their genre facet from the
+# stored Genre counts.
+#
+# Bulk writes that bypass the ORM (imports, the benchmark seed) call
+# rebuild() afterwards; `flask genres sync` does the same by hand.
+# ----------------------------------------------------------------------------#
+
+genres_cli = AppGroup("genres", help="Maintain the genre links and counts.")
+
+# model -> (link table, its foreign key to the model, Genre count column)
+LINKS = {
+    Venue: (VenueGenre, VenueGenre.c.venue_id, Genre.venue_count),
+    Artist: (ArtistGenre, ArtistGenre.c.artist_id, Genre.artist_count),
+}
+
+
+def genre_ids(names, session=None):
+    """``{name: id}`` for ``names``, creating the genres that are missing."""
+    session = session or db.session
+    names = set(names)
+    if not names:
+        return {}
+    ids = dict(
+        session.execute(select(Genre.name, Genre.id).where(Genre.name.in_(names))).all()
+    )
+    missing = names - ids.keys()
+    if missing:
+        session.execute(insert(Genre), [{"name": name} for name in sorted(missing)])
+        ids.update(
+            session.execute(
+                select(Genre.name, Genre.id).where(Genre.name.in_(missing))
+            ).all()
+        )
+    return ids
+
+
+def relink(model, rows, session=None):
+    """Replace the genre links of ``rows`` (``(id, genres)`` pairs).
+
+    Returns the ids of every genre that gained or lost a link.
+    """
+    session = session or db.session
+    table, key, _ = LINKS[model]
+    rows = [(row_id, list(dict.fromkeys(names or []))) for row_id, names in rows]
+    if not rows:
+        return set()
+    row_ids = [row_id for row_id, _ in rows]
+    touched = set(
+        session.scalars(select(table.c.genre_id).where(key.in_(row_ids)).distinct())
+    )
+    session.execute(delete(table).where(key.in_(row_ids)))
+    ids = genre_ids([name for _, names in rows for name in names], session)
+    links = [
+        {key.name: row_id, "genre_id": ids[name]}
+        for row_id, names in rows
+        for name in names
+    ]
+    if links:
+        session.execute(insert(table), links)
+    return touched | {link["genre_id"] for link in links}
+
+
+def refresh_counts(genre_ids=None, session=None):
+    """Recount the venues and artists of ``genre_ids`` (every genre if None)."""
+    session = session or db.session
+    venues = (
+        select(func.count())
+        .select_from(VenueGenre)
+        .join(Venue, Venue.id == VenueGenre.c.venue_id)
+        .where(VenueGenre.c.genre_id == Genre.id, Venue.deleted_at.is_(None))
+        .scalar_subquery()
+    )
+    artists = (
+        select(func.count())
+        .select_from(ArtistGenre)
+        .where(ArtistGenre.c.genre_id == Genre.id)
+        .scalar_subquery()
+    )
+    stmt = update(Genre).values(venue_count=venues, artist_count=artists)
+    if genre_ids is not None:
+        stmt = stmt.where(Genre.id.in_(list(genre_ids)))
+    session.execute(stmt.execution_options(synchronize_session=False))
+
+
+@event.listens_for(Session, "after_flush")
+def sync_links(session, flush_context):
+    """Relink the venues and artists whose genres this flush wrote."""
+    touched = set()
+    for model in LINKS:
+        changed = [
+            (obj.id, obj.genres)
+            for obj in list(session.new) + list(session.dirty)
+            if isinstance(obj, model)
+            and inspect(obj).attrs.genres.history.has_changes()
+        ]
+        if changed:
+            touched |= relink(model, changed, session)
+        deleted = [obj.id for obj in session.deleted if isinstance(obj, model)]
+        if deleted:
+            # ON DELETE CASCADE does this on PostgreSQL; SQLite needs telling.
+            table, key, _ = LINKS[model]
+            touched |= set(
+                session.scalars(
+                    select(table.c.genre_id).where(key.in_(deleted)).distinct()
+                )
+            )
+            session.execute(delete(table).where(key.in_(deleted)))
+    if touched:
+        refresh_counts(touched, session)
+
+
+def seed():
+    """Create a Genre for every choice the forms offer."""
+    genre_ids([value for value, _ in genres_choices])
+
+
+def rebuild(models=(Venue, Artist), batch_size=1000):
+    """Relink every row of ``models`` from its JSON, then recount."""
+    seed()
+    for model in models:
+        last_id = 0
+        while True:
+            # Keyset batches rather than one streamed cursor, since relinking
+            # writes on the same connection.
+            rows = db.session.execute(
+                select(model.id, model.genres)
+                .where(model.id > last_id)
+                .order_by(model.id)
+                .limit(batch_size)
+                .execution_options(include_deleted=True)
+            ).all()
+            if not rows:
+                break
+            relink(model, [tuple(row) for row in rows])
+            last_id = rows[-1].id
+    refresh_counts()
+
+
+# ----------------------------------------------------------------------------#
+# Reads.
+# ----------------------------------------------------------------------------#
+
+
+def filters(model, genre=None, state=None):
+    """WHERE criteria limiting ``model`` rows to a genre and/or a state.
+
+    The genre resolves through Genre's unique name and the link table's
+    (genre_id, ...) index, never through the JSON column.
+    """
+    criteria = []
+    if genre:
+        criteria.append(model.id.in_(carrying(model, genre)))
+    if state:
+        criteria.append(model.state == state)
+    return criteria
+
+
+def carrying(model, genre):
+    """Ids of the ``model`` rows carrying ``genre``, from the link table."""
+    table, key, _ = LINKS[model]
+    return (
+        select(key).join(Genre, Genre.id == table.c.genre_id).where(Genre.name == genre)
+    )
+
+
+def show_filters(genre=None, state=None):
+    """WHERE criteria limiting shows to a genre (of the artist or of the
+    venue) and/or a state (of the venue)."""
+    criteria = []
+    if genre:
+        criteria.append(
+            or_(
+                Show.artist_id.in_(carrying(Artist, genre)),
+                Show.venue_id.in_(carrying(Venue, genre)),
+            )
+        )
+    if state:
+        criteria.append(Show.venue_id.in_(select(Venue.id).where(Venue.state == state)))
+    return criteria
+
+
+@genres_cli.command("sync")
+def sync_command():
+    """Seed the genres and rebuild every link and count from the JSON."""
+    rebuild()
+    db.session.commit()
+    click.echo("Genres synced")
+
+
+def init_app(app):
+    app.cli.add_command(genres_cli)
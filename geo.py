@@ -0,0 +1,354 @@
+import csv
+import math
+import os
+from collections import defaultdict
+from functools import lru_cache
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, event, func, inspect, select, union_all, update
+
+from models import UpcomingShow, Venue, db, utcnow
+
+# ----------------------------------------------------------------------------#
+# Venue locations and "near me".
+#
+# Venues are placed offline: their (city, state) is looked up in a local
+# table of places (GEOCODER_PLACES, a CSV shipped in data/), falling back to
+# the state's center, and the point is stored with its geohash. Creating or
+# editing a venue places it on the spot; `flask geo geocode` places rows
+# written around the ORM, e.g. by imports.
+#
+# A nearby search covers the circle with the nine geohash cells around the
+# center, at the finest precision whose cells are still as wide as the
+# radius. Each cell is a prefix, i.e. a range scan of ix_Venue_geohash, and
+# a query stops after NEAR_MAX_CANDIDATES + 1 venues, unsorted. Where the
+# cells hold more than that (geocoding is per city, so a big city is one
+# dense point), the search narrows to the finer cells around the center, one
+# precision at a time, until they fit, and keeps only the venues within the
+# distance those cells wholly cover. So a search costs a few bounded range
+# scans, never a sort of a region, and still finds the nearest venues; exact
+# distances then filter and sort them.
+# ----------------------------------------------------------------------------#
+
+geo_cli = AppGroup("geo", help="Venue locations.")
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Stored precision: cells of about 5m.
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+DEFAULT_PLACES = os.path.join(os.path.dirname(__file__), "data", "places.csv")
+
+
+# ----------------------------------------------------------------------------#
+# Geohashes and distances.
+# ----------------------------------------------------------------------------#
+
+
+def geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, char, even = [], 0, 0, True
+    while len(chars) < precision:
+        # Bits alternate, longitude first.
+        bounds, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (bounds[0] + bounds[1]) / 2
+        char <<= 1
+        if value >= mid:
+            char |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[char])
+            bits = char = 0
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """``(latitude, longitude)`` span in degrees of a cell of ``precision``."""
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2**lat_bits, 360.0 / 2 ** (5 * precision - lat_bits)
+
+
+def cover_precision(latitude, radius_km):
+    """Finest precision whose cells are at least ``radius_km`` wide."""
+    precision = GEOHASH_PRECISION
+    while precision > 1 and reach_km(latitude, precision) < radius_km:
+        precision -= 1
+    return precision
+
+
+def reach_km(latitude, precision):
+    """How far from a point the nine cells around it reach in every
+    direction: one cell span."""
+    lat_span, lng_span = cell_size(precision)
+    # Longitude degrees narrow towards the poles; measure cells at the
+    # block's poleward edge.
+    edge = min(abs(latitude) + lat_span, 89.9)
+    shrink = math.cos(math.radians(edge))
+    return min(lat_span, lng_span * shrink) * KM_PER_DEGREE
+
+
+def cells_around(latitude, longitude, precision):
+    """Geohash prefixes of the point's cell and its neighbours."""
+    lat_span, lng_span = cell_size(precision)
+    # One cell over from any point is the neighbouring cell.
+    cells = set()
+    for dlat in (-1, 0, 1):
+        lat = latitude + dlat * lat_span
+        if not -90 <= lat <= 90:
+            continue
+        for dlng in (-1, 0, 1):
+            lng = (longitude + dlng * lng_span + 180) % 360 - 180
+            cells.add(geohash(lat, lng, precision))
+    return sorted(cells)
+
+
+def cover(latitude, longitude, radius_km):
+    """Geohash prefixes whose cells together contain the circle."""
+    return cells_around(latitude, longitude, cover_precision(latitude, radius_km))
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """Great-circle (haversine) distance."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlambda = phi2 - phi1, math.radians(lng2 - lng1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+# ----------------------------------------------------------------------------#
+# Geocoding.
+# ----------------------------------------------------------------------------#
+
+
+def places_path():
+    if has_app_context():
+        return current_app.config["GEOCODER_PLACES"]
+    return DEFAULT_PLACES
+
+
+@lru_cache(maxsize=4)
+def load_places(path):
+    """``{(city, STATE): (lat, lng)}``; a blank city is the state's center."""
+    places = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            key = (row["city"].strip().lower(), row["state"].strip().upper())
+            places[key] = (float(row["latitude"]), float(row["longitude"]))
+    return places
+
+
+def geocode(city, state):
+    """``(latitude, longitude)`` of a city, else of its state, else None."""
+    if not state:
+        return None
+    places = load_places(places_path())
+    state = state.strip().upper()
+    return places.get(((city or "").strip().lower(), state)) or places.get(("", state))
+
+
+def location(city, state):
+    """Venue column values for (city, state); all None if it is not found."""
+    point = geocode(city, state)
+    if point is None:
+        return {"latitude": None, "longitude": None, "geohash": None}
+    return {"latitude": point[0], "longitude": point[1], "geohash": geohash(*point)}
+
+
+@event.listens_for(Venue, "before_insert")
+def place_new_venue(mapper, connection, venue):
+    for name, value in location(venue.city, venue.state).items():
+        setattr(venue, name, value)
+
+
+@event.listens_for(Venue, "before_update")
+def place_moved_venue(mapper, connection, venue):
+    attrs = inspect(venue).attrs
+    if attrs.city.history.has_changes() or attrs.state.history.has_changes():
+        place_new_venue(mapper, connection, venue)
+
+
+def geocode_venues(everything=False, batch_size=1000):
+    """Place venues that have no location (every venue if ``everything``).
+
+    Returns ``(placed, unresolved)``.
+    """
+    table = Venue.__table__
+    stmt = update(table).where(table.c.id == bindparam("venue_id"))
+    placed = unresolved = 0
+    last_id = 0
+    while True:
+        query = select(Venue.id, Venue.city, Venue.state).where(Venue.id > last_id)
+        if not everything:
+            query = query.where(Venue.geohash.is_(None))
+        rows = db.session.execute(query.order_by(Venue.id).limit(batch_size)).all()
+        if not rows:
+            break
+        params = []
+        for row in rows:
+            values = location(row.city, row.state)
+            if values["geohash"] is None:
+                unresolved += 1
+            else:
+                placed += 1
+            params.append({"venue_id": row.id, **values})
+        db.session.execute(stmt, params)
+        last_id = rows[-1].id
+    return placed, unresolved
+
+
+# ----------------------------------------------------------------------------#
+# Nearby venues.
+# ----------------------------------------------------------------------------#
+
+
+def upcoming_shows(venue_ids, per_venue, now=None):
+    """``{venue_id: [show, ...]}``: each venue's next ``per_venue`` shows from
+    the feed table, in one query."""
+    rank = (
+        func.row_number()
+        .over(
+            partition_by=UpcomingShow.venue_id,
+            order_by=(UpcomingShow.start_time, UpcomingShow.show_id),
+        )
+        .label("rank")
+    )
+    ranked = (
+        select(
+            UpcomingShow.venue_id,
+            UpcomingShow.start_time,
+            UpcomingShow.artist_id,
+            UpcomingShow.artist_name,
+            UpcomingShow.artist_image_link,
+            rank,
+        )
+        .where(
+            UpcomingShow.venue_id.in_(list(venue_ids)),
+            UpcomingShow.start_time > (now or utcnow()),
+        )
+        .subquery()
+    )
+    shows = defaultdict(list)
+    rows = db.session.execute(
+        select(ranked)
+        .where(ranked.c.rank <= per_venue)
+        .order_by(ranked.c.venue_id, ranked.c.rank)
+    ).mappings()
+    for row in rows:
+        show = dict(row)
+        del show["rank"]
+        shows[show.pop("venue_id")].append(show)
+    return shows
+
+
+def venues_in(cells, limit):
+    """Up to ``limit`` venues in the geohash cells, in no particular order.
+
+    One range scan of ix_Venue_geohash per cell, concatenated, so the
+    database stops reading after ``limit`` rows.
+    """
+    columns = (
+        Venue.id,
+        Venue.name,
+        Venue.address,
+        Venue.city,
+        Venue.state,
+        Venue.image_link,
+        Venue.latitude,
+        Venue.longitude,
+        Venue.upcoming_shows_count.label("num_upcoming_shows"),
+    )
+    # hide_deleted does not rewrite a UNION, so each scan leaves out
+    # soft-deleted venues itself.
+    scans = [
+        select(*columns).where(
+            Venue.geohash >= prefix,
+            Venue.geohash < prefix + "~",
+            Venue.deleted_at.is_(None),
+        )
+        for prefix in cells
+    ]
+    stmt = union_all(*scans).limit(limit) if len(scans) > 1 else scans[0].limit(limit)
+    return db.session.execute(stmt).mappings().all()
+
+
+def nearby(latitude, longitude, radius_km, limit, per_venue=None, candidates=None):
+    """Venues within ``radius_km`` of the point, nearest first, each with
+    ``distance_km`` and its next ``per_venue`` upcoming shows.
+
+    Where the cells covering the circle hold more than ``candidates``
+    venues, the search narrows to the finer cells around the point, until
+    they fit, and then only returns venues those cells wholly cover.
+    """
+    config = current_app.config
+    per_venue = config["NEAR_SHOWS_PER_VENUE"] if per_venue is None else per_venue
+    candidates = candidates or config["NEAR_MAX_CANDIDATES"]
+    precision, reach = cover_precision(latitude, radius_km), radius_km
+    while True:
+        cells = cells_around(latitude, longitude, precision)
+        rows = venues_in(cells, candidates + 1)
+        if len(rows) <= candidates or precision == GEOHASH_PRECISION:
+            break
+        precision += 1
+        reach = min(radius_km, reach_km(latitude, precision))
+    venues = []
+    for row in rows[:candidates]:
+        distance = distance_km(latitude, longitude, row["latitude"], row["longitude"])
+        if distance <= reach:
+            venues.append(dict(row, distance_km=round(distance, 2)))
+    venues.sort(key=lambda venue: (venue["distance_km"], venue["id"]))
+    venues = venues[:limit]
+    if venues and per_venue:
+        shows = upcoming_shows([venue["id"] for venue in venues], per_venue)
+        for venue in venues:
+            venue["upcoming_shows"] = shows.get(venue["id"], [])
+    return venues
+
+
+def search_point(args):
+    """``(latitude, longitude, radius_km)`` from ?lat=&lng= or ?city=&state=,
+    plus ?radius= (km, capped at NEAR_MAX_RADIUS_KM).
+
+    Raises ValueError with a message for the user.
+    """
+    config = current_app.config
+    radius = args.get("radius", config["NEAR_DEFAULT_RADIUS_KM"], type=float)
+    if radius is None or not 0 < radius <= config["NEAR_MAX_RADIUS_KM"]:
+        raise ValueError(
+            f"radius must be between 0 and {config['NEAR_MAX_RADIUS_KM']} km."
+        )
+    latitude = args.get("lat", type=float)
+    longitude = args.get("lng", type=float)
+    if latitude is None or longitude is None:
+        if not args.get("state"):
+            raise ValueError("Give lat and lng, or a city and state.")
+        point = geocode(args.get("city"), args.get("state"))
+        if point is None:
+            raise ValueError(f"Unknown place: {args.get('city')}, {args['state']}.")
+        latitude, longitude = point
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("lat must be within ±90 and lng within ±180.")
+    return latitude, longitude, radius
+
+
+@geo_cli.command("geocode")
+@click.option("--all", "everything", is_flag=True, help="Re-place every venue.")
+@click.option("--batch-size", default=1000, show_default=True)
+def geocode_command(everything, batch_size):
+    """Place venues from their city and state, offline."""
+    placed, unresolved = geocode_venues(everything, batch_size)
+    db.session.commit()
+    click.echo(f"Placed {placed} venues, {unresolved} not found")
+
+
+def init_app(app):
+    app.cli.add_command(geo_cli)
@@ -0,0 +1,263 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from flask import (
+    before_render_template,
+    g,
+    has_request_context,
+    request,
+    template_rendered,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from cache import cache
+from metrics import registry
+
+# ----------------------------------------------------------------------------#
+# Request instrumentation.
+#
+# Every request is timed as a whole and broken into database time (with a
+# query count), template rendering, form handling and JSON serialization.
+# The breakdown is exported per endpoint at /metrics and sent to the browser
+# as a Server-Timing header, which the devtools network panel displays.
+# Queries slower than SLOW_QUERY_MS go to the slow-query log with their plan.
+# ----------------------------------------------------------------------------#
+
+request_seconds = registry.histogram(
+    "fyyur_request_seconds",
+    "Request latency, by endpoint.",
+    labelnames=("endpoint", "method", "status"),
+)
+request_db_seconds = registry.histogram(
+    "fyyur_request_db_seconds",
+    "Time spent in database queries per request, by endpoint.",
+    labelnames=("endpoint",),
+)
+request_queries = registry.histogram(
+    "fyyur_request_queries",
+    "Queries issued per request, by endpoint.",
+    labelnames=("endpoint",),
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100),
+)
+request_render_seconds = registry.histogram(
+    "fyyur_request_render_seconds",
+    "Template rendering time per request, by endpoint.",
+    labelnames=("endpoint",),
+)
+request_serialize_seconds = registry.histogram(
+    "fyyur_request_serialize_seconds",
+    "JSON serialization time per request, by endpoint.",
+    labelnames=("endpoint",),
+)
+request_form_seconds = registry.histogram(
+    "fyyur_request_form_seconds",
+    "Form processing and validation time per request, by endpoint.",
+    labelnames=("endpoint",),
+)
+query_seconds = registry.histogram(
+    "fyyur_db_query_seconds", "Duration of each database query."
+)
+slow_queries = registry.counter(
+    "fyyur_db_slow_queries_total",
+    "Queries slower than SLOW_QUERY_MS, by endpoint.",
+    labelnames=("endpoint",),
+)
+
+for kind, prefix in (("pages", "page"), ("fragments", "fragment")):
+    for stat in ("hits", "misses", "stores"):
+        registry.gauge(
+            f"fyyur_{prefix}_cache_{stat}",
+            f"{prefix.capitalize()} cache {stat} since the process started.",
+            callback=lambda kind=kind, stat=stat: cache.counts[kind][stat],
+        )
+registry.gauge(
+    "fyyur_page_cache_invalidations",
+    "Page cache invalidations since the process started.",
+    callback=lambda: cache.invalidations,
+)
+
+slow_query_log = logging.getLogger("fyyur.slow_query")
+
+
+class Timings(object):
+    """What one request spent its time on, in seconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.queries = 0
+        self.render = 0.0
+        self.serialize = 0.0
+        self.forms = 0.0
+        self._render_started = []
+
+    def server_timing(self, total):
+        parts = [
+            (
+                "db",
+                self.db,
+                f"{self.queries} quer{'y' if self.queries == 1 else 'ies'}",
+            ),
+            ("render", self.render, None),
+            ("serialize", self.serialize, None),
+            ("forms", self.forms, None),
+            ("total", total, None),
+        ]
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.1f}" + (f';desc="{desc}"' if desc else "")
+            for name, seconds, desc in parts
+            if seconds or name in ("db", "total")
+        )
+
+
+def current_timings():
+    if has_request_context():
+        return g.get("timings")
+    return None
+
+
+@contextmanager
+def timed(part):
+    """Count the enclosed block towards ``part`` of the request's Timings."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = current_timings()
+        if timings is not None:
+            setattr(timings, part, getattr(timings, part) + time.perf_counter() - start)
+
+
+def serializing():
+    """Count the enclosed block as JSON serialization time."""
+    return timed("serialize")
+
+
+# ----------------------------------------------------------------------------#
+# Queries.
+# ----------------------------------------------------------------------------#
+
+
+class SlowQueryLog(object):
+    def __init__(self, threshold_ms, explain=True):
+        self.threshold = threshold_ms / 1000.0
+        self.explain = explain
+
+    def plan(self, conn, statement, parameters):
+        """The query plan, read on a separate DBAPI cursor.
+
+        Plain EXPLAIN (never ANALYZE), so the statement is not run again.
+        Errors are swallowed: the log must never break the request.
+        """
+        if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return None
+        prefix = {"postgresql": "EXPLAIN ", "sqlite": "EXPLAIN QUERY PLAN "}.get(
+            conn.dialect.name
+        )
+        if prefix is None:
+            return None
+        try:
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters)
+                return "\n".join(
+                    " ".join(str(col) for col in row) for row in cursor.fetchall()
+                )
+            finally:
+                cursor.close()
+        except Exception as e:
+            return f"(no plan: {e})"
+
+    def record(self, conn, statement, parameters, seconds):
+        endpoint = request.endpoint if has_request_context() else None
+        slow_queries.labels(endpoint=endpoint or "").inc()
+        plan = self.plan(conn, statement, parameters) if self.explain else None
+        slow_query_log.warning(
+            "%.1fms %s\n%s\nparameters: %r%s",
+            seconds * 1000,
+            f"{request.method} {request.path}" if endpoint else "(no request)",
+            statement,
+            parameters,
+            f"\nplan:\n{plan}" if plan else "",
+        )
+
+
+_slow_query_log = None
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def end_query(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_started"].pop()
+    query_seconds.observe(seconds)
+    timings = current_timings()
+    if timings is not None:
+        timings.db += seconds
+        timings.queries += 1
+    if (
+        _slow_query_log is not None
+        and seconds >= _slow_query_log.threshold
+        and not executemany
+    ):
+        _slow_query_log.record(conn, statement, parameters, seconds)
+
+
+# ----------------------------------------------------------------------------#
+# Templates and requests.
+# ----------------------------------------------------------------------------#
+
+
+def start_render(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None:
+        timings._render_started.append(time.perf_counter())
+
+
+def end_render(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None and timings._render_started:
+        timings.render += time.perf_counter() - timings._render_started.pop()
+
+
+def init_app(app):
+    global _slow_query_log
+    if app.config["SLOW_QUERY_MS"] > 0:
+        _slow_query_log = SlowQueryLog(
+            app.config["SLOW_QUERY_MS"], explain=app.config["SLOW_QUERY_EXPLAIN"]
+        )
+        if app.config["SLOW_QUERY_LOG"] and not slow_query_log.handlers:
+            handler = logging.FileHandler(app.config["SLOW_QUERY_LOG"])
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            slow_query_log.addHandler(handler)
+
+    before_render_template.connect(start_render, app)
+    template_rendered.connect(end_render, app)
+
+    @app.before_request
+    def start_timing():
+        g.timings = Timings()
+
+    @app.after_request
+    def record_timing(response):
+        timings = g.pop("timings", None)
+        if timings is None:
+            return response
+        total = time.perf_counter() - timings.started
+        endpoint = request.endpoint or ""
+        request_seconds.labels(
+            endpoint=endpoint, method=request.method, status=response.status_code
+        ).observe(total)
+        request_db_seconds.labels(endpoint=endpoint).observe(timings.db)
+        request_queries.labels(endpoint=endpoint).observe(timings.queries)
+        request_render_seconds.labels(endpoint=endpoint).observe(timings.render)
+        request_serialize_seconds.labels(endpoint=endpoint).observe(timings.serialize)
+        request_form_seconds.labels(endpoint=endpoint).observe(timings.forms)
+        if app.config["SERVER_TIMING"]:
+            response.headers["Server-Timing"] = timings.server_timing(total)
+        return response
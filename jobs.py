@@ -0,0 +1,438 @@
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+
+from conditional import as_utc
+from metrics import registry
+from models import Job, db, utcnow
+
+# ----------------------------------------------------------------------------#
+# Background jobs.
+#
+# Requests hand slow follow-up work (purging a deleted venue's shows, say) to
+# a queue kept in the Job table. enqueue() adds the row in the caller's
+# transaction, so a job exists exactly when the write that asked for it
+# commits. `flask jobs work` runs them: each poll claims as many ready jobs
+# as it has free threads, with FOR UPDATE SKIP LOCKED on PostgreSQL so any
+# number of workers can share the table. A failing job is retried with
+# exponential backoff until max_attempts, then left "failed" for
+# `flask jobs retry`. Jobs enqueued with an idempotency key are only added
+# once per key (until `jobs.prune` drops the finished row).
+#
+# Workers also enqueue the periodic jobs of JOB_SCHEDULE, one per interval
+# however many workers run, and requeue jobs whose worker died. Cache
+# invalidations made by a job reach the web processes only through a shared
+# cache backend ("filesystem"); with "lru" those pages wait for their TTL.
+# ----------------------------------------------------------------------------#
+
+jobs_cli = AppGroup("jobs", help="Run and inspect background jobs.")
+
+log = logging.getLogger("fyyur.jobs")
+
+STATUSES = ("queued", "running", "done", "failed")
+
+# Task name -> function, filled in by @task.
+TASKS = {}
+
+job_wait_seconds = registry.histogram(
+    "fyyur_job_wait_seconds",
+    "Time from a job being due to a worker starting it, by task.",
+    labelnames=("task",),
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600),
+)
+job_run_seconds = registry.histogram(
+    "fyyur_job_run_seconds",
+    "Job run time, by task and outcome (done, retry or failed).",
+    labelnames=("task", "outcome"),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300),
+)
+
+
+def task(name):
+    """Register the decorated function as the job ``name``; its keyword
+    arguments come from the job's payload."""
+
+    def decorator(func):
+        TASKS[name] = func
+        return func
+
+    return decorator
+
+
+# ----------------------------------------------------------------------------#
+# Queueing.
+# ----------------------------------------------------------------------------#
+
+
+def enqueue(name, payload=None, key=None, run_at=None, max_attempts=None):
+    """Queue ``name(**payload)`` to run at ``run_at`` (default now).
+
+    Joins the caller's transaction; returns the job id. With ``key``, a job
+    already queued (or run) under that key is returned instead of a new one.
+    """
+    values = {
+        "name": name,
+        "payload": payload or {},
+        "idempotency_key": key,
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts or current_app.config["JOB_MAX_ATTEMPTS"],
+        "run_at": run_at or utcnow(),
+        "created_at": utcnow(),
+    }
+    dialect = db.session.connection().dialect.name
+    inserts = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+    if key is None:
+        stmt = insert(Job).values(**values)
+    elif dialect in inserts:
+        stmt = (
+            inserts[dialect](Job)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=["idempotency_key"])
+        )
+    else:
+        stmt = None
+    if stmt is not None:
+        job_id = db.session.execute(stmt.returning(Job.id)).scalar()
+        if job_id is not None:
+            return job_id
+    existing = db.session.scalar(select(Job.id).where(Job.idempotency_key == key))
+    if existing is None:
+        existing = db.session.execute(
+            insert(Job).values(**values).returning(Job.id)
+        ).scalar_one()
+    return existing
+
+
+def claim(worker, limit, now=None):
+    """Mark up to ``limit`` due jobs as running on ``worker`` and return them.
+
+    One UPDATE ... RETURNING; the caller commits.
+    """
+    now = now or utcnow()
+    due = (
+        select(Job.id)
+        .where(Job.status == "queued", Job.run_at <= now)
+        .order_by(Job.run_at, Job.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return db.session.execute(
+        update(Job)
+        .where(Job.id.in_(due.scalar_subquery()), Job.status == "queued")
+        .values(
+            status="running",
+            attempts=Job.attempts + 1,
+            started_at=now,
+            worker=worker,
+        )
+        .returning(
+            Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts, Job.run_at
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+
+
+def backoff(attempts):
+    """Seconds before retry number ``attempts``: doubling, capped, jittered."""
+    config = current_app.config
+    delay = min(
+        config["JOB_BACKOFF_SECONDS"] * 2 ** (attempts - 1),
+        config["JOB_BACKOFF_MAX_SECONDS"],
+    )
+    return delay * random.uniform(0.5, 1.0)
+
+
+def complete(job_id, now=None):
+    db.session.execute(
+        update(Job)
+        .where(Job.id == job_id)
+        .values(status="done", finished_at=now or utcnow(), last_error=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def retry_or_fail(job, error, retry=True, now=None):
+    """Requeue a failed ``job`` after its backoff, or give up on its last
+    attempt (or at once without ``retry``). Returns the outcome: "retry" or
+    "failed"."""
+    now = now or utcnow()
+    if retry and job.attempts < job.max_attempts:
+        values = {
+            "status": "queued",
+            "run_at": now + timedelta(seconds=backoff(job.attempts)),
+            "worker": None,
+        }
+        outcome = "retry"
+    else:
+        values = {"status": "failed", "finished_at": now}
+        outcome = "failed"
+    db.session.execute(
+        update(Job)
+        .where(Job.id == job.id)
+        .values(last_error=error, **values)
+        .execution_options(synchronize_session=False)
+    )
+    return outcome
+
+
+def requeue_stalled(now=None):
+    """Jobs running longer than JOB_TIMEOUT_SECONDS lost their worker: count
+    that as a failed attempt."""
+    now = now or utcnow()
+    cutoff = now - timedelta(seconds=current_app.config["JOB_TIMEOUT_SECONDS"])
+    stalled = (Job.status == "running", Job.started_at < cutoff)
+    failed = db.session.execute(
+        update(Job)
+        .where(*stalled, Job.attempts >= Job.max_attempts)
+        .values(status="failed", finished_at=now, last_error="Timed out")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    requeued = db.session.execute(
+        update(Job)
+        .where(*stalled)
+        .values(status="queued", run_at=now, worker=None, last_error="Timed out")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    return requeued + failed
+
+
+def enqueue_periodic(schedule, now=None):
+    """Queue one run of each ``{name: seconds}`` job per interval.
+
+    The interval number is part of the idempotency key, so every worker
+    can call this and each run is still queued once.
+    """
+    now = now or utcnow()
+    for name, seconds in schedule.items():
+        if not seconds:
+            continue
+        slot = int(now.timestamp() // seconds)
+        enqueue(name, key=f"{name}@{slot}", max_attempts=1)
+
+
+@task("jobs.prune")
+def prune(now=None):
+    """Delete jobs that finished more than JOB_RETENTION_HOURS ago."""
+    cutoff = (now or utcnow()) - timedelta(
+        hours=current_app.config["JOB_RETENTION_HOURS"]
+    )
+    pruned = db.session.execute(
+        delete(Job)
+        .where(Job.status == "done", Job.finished_at < cutoff)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return pruned
+
+
+# ----------------------------------------------------------------------------#
+# Queue depth and latency.
+# ----------------------------------------------------------------------------#
+
+
+def depth():
+    """``{status: count}`` over the whole table."""
+    counts = dict.fromkeys(STATUSES, 0)
+    counts.update(
+        db.session.execute(select(Job.status, func.count()).group_by(Job.status))
+        .tuples()
+        .all()
+    )
+    return counts
+
+
+def oldest_ready_age(now=None):
+    """Seconds the longest-waiting due job has waited, 0 if none is."""
+    now = now or utcnow()
+    oldest = db.session.scalar(
+        select(func.min(Job.run_at)).where(Job.status == "queued", Job.run_at <= now)
+    )
+    return max((now - as_utc(oldest)).total_seconds(), 0.0) if oldest else 0.0
+
+
+def _scraped(read, empty):
+    # Gauges read the table at scrape time; a scrape must not fail with it.
+    def callback():
+        if not has_app_context():
+            return empty
+        try:
+            return read()
+        except SQLAlchemyError:
+            db.session.rollback()
+            return empty
+
+    return callback
+
+
+registry.gauge(
+    "fyyur_jobs",
+    "Jobs in the queue table, by status.",
+    labelnames=("status",),
+    callback=_scraped(lambda: {(status,): n for status, n in depth().items()}, {}),
+)
+registry.gauge(
+    "fyyur_jobs_oldest_ready_seconds",
+    "How long the oldest due job has waited for a worker.",
+    callback=_scraped(oldest_ready_age, 0.0),
+)
+
+
+# ----------------------------------------------------------------------------#
+# Workers.
+# ----------------------------------------------------------------------------#
+
+
+class Worker(object):
+    """Runs jobs on ``concurrency`` threads until stopped.
+
+    With ``burst`` it only drains the jobs already due, then returns, and
+    enqueues nothing periodic.
+    """
+
+    def __init__(self, app, concurrency=None, poll_interval=None, name=None):
+        self.app = app
+        self.concurrency = concurrency or app.config["JOB_CONCURRENCY"]
+        self.poll_interval = poll_interval or app.config["JOB_POLL_SECONDS"]
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def run(self, burst=False):
+        executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix="job")
+        running = set()
+        try:
+            while not self.stopping.is_set():
+                running = {future for future in running if not future.done()}
+                free = self.concurrency - len(running)
+                with self.app.app_context():
+                    if not burst:
+                        requeue_stalled()
+                        enqueue_periodic(self.app.config["JOB_SCHEDULE"])
+                    claimed = claim(self.name, free) if free else []
+                    db.session.commit()
+                for job in claimed:
+                    running.add(executor.submit(self.execute, job))
+                if claimed:
+                    continue
+                if burst and not running:
+                    break
+                if running:
+                    wait(running, self.poll_interval, return_when=FIRST_COMPLETED)
+                else:
+                    self.stopping.wait(self.poll_interval)
+        finally:
+            executor.shutdown(wait=True)
+
+    def execute(self, job):
+        with self.app.app_context():
+            started = utcnow()
+            job_wait_seconds.labels(task=job.name).observe(
+                max((started - as_utc(job.run_at)).total_seconds(), 0.0)
+            )
+            start = time.perf_counter()
+            func = TASKS.get(job.name)
+            try:
+                if func is None:
+                    # Another release's job, perhaps; retrying cannot help.
+                    outcome = retry_or_fail(
+                        job, f"No task named {job.name!r}", retry=False
+                    )
+                    log.error("Job %s: no task named %r", job.id, job.name)
+                else:
+                    func(**(job.payload or {}))
+                    db.session.commit()
+                    complete(job.id)
+                    outcome = "done"
+            except Exception as e:
+                db.session.rollback()
+                log.exception("Job %s (%s) failed", job.id, job.name)
+                outcome = retry_or_fail(job, f"{type(e).__name__}: {e}")
+            db.session.commit()
+            job_run_seconds.labels(task=job.name, outcome=outcome).observe(
+                time.perf_counter() - start
+            )
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(app, port):
+    """Serve this process's /metrics on ``port``, from a daemon thread."""
+
+    def metrics_app(environ, start_response):
+        with app.app_context():
+            body = registry.render().encode()
+        start_response("200 OK", [("Content-Type", "text/plain; version=0.0.4")])
+        return [body]
+
+    server = make_server("", port, metrics_app, handler_class=_QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@jobs_cli.command("work")
+@click.option("--concurrency", type=int, help="Defaults to JOB_CONCURRENCY.")
+@click.option("--burst", is_flag=True, help="Exit once no job is due.")
+@click.option("--metrics-port", type=int, help="Serve /metrics on this port.")
+def work_command(concurrency, burst, metrics_port):
+    """Run queued jobs until stopped (SIGINT/SIGTERM finish running jobs)."""
+    app = current_app._get_current_object()
+    worker = Worker(app, concurrency)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    if metrics_port:
+        serve_metrics(app, metrics_port)
+    click.echo(f"Worker {worker.name} running {worker.concurrency} at a time")
+    worker.run(burst=burst)
+    click.echo("Worker stopped")
+
+
+@jobs_cli.command("stats")
+def stats_command():
+    """Queue depth by status, and the wait of the oldest due job."""
+    for status, count in depth().items():
+        click.echo(f"{status:<8} {count}")
+    click.echo(f"oldest due job waiting {oldest_ready_age():.1f}s")
+
+
+@jobs_cli.command("retry")
+@click.argument("job_ids", nargs=-1, type=int)
+def retry_command(job_ids):
+    """Requeue failed jobs (all of them without JOB_IDS)."""
+    stmt = update(Job).where(Job.status == "failed")
+    if job_ids:
+        stmt = stmt.where(Job.id.in_(job_ids))
+    retried = db.session.execute(
+        stmt.values(status="queued", attempts=0, run_at=utcnow(), finished_at=None)
+    ).rowcount
+    db.session.commit()
+    click.echo(f"Requeued {retried} jobs")
+
+
+@jobs_cli.command("prune")
+def prune_command():
+    """Delete jobs that finished more than JOB_RETENTION_HOURS ago."""
+    click.echo(f"Pruned {prune()} jobs")
+
+
+def init_app(app):
+    app.cli.add_command(jobs_cli)
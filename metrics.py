@@ -0,0 +1,221 @@
+import threading
+from bisect import bisect_left
+
+from flask import Response
+
+# ----------------------------------------------------------------------------#
+# Minimal Prometheus-style metrics.
+#
+# Metrics are process-local and rendered in the Prometheus text exposition
+# format at /metrics; run one scrape target per worker.
+# ----------------------------------------------------------------------------#
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Metric(object):
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+        return child
+
+    def _default(self):
+        # Unlabelled metrics are a single child keyed by the empty tuple.
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        body = ",".join(
+            '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"'))
+            for k, v in pairs
+        )
+        return "{" + body + "}"
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {value:.10g}")
+        return "\n".join(lines)
+
+
+class _Value(object):
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(Metric):
+    """Monotonic count; by convention its name ends in ``_total``."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def samples(self):
+        for key, child in sorted(self._children.items()):
+            yield "", self._label_text(key), child.value
+
+
+class Gauge(Metric):
+    """A settable value, or one read from ``callback()`` at scrape time.
+
+    A labelled gauge's callback returns ``{label values tuple: value}``.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def samples(self):
+        if self.callback is not None:
+            value = self.callback()
+            if not self.labelnames:
+                yield "", "", value
+                return
+            for key, child_value in sorted(value.items()):
+                yield "", self._label_text(key), child_value
+            return
+        for key, child in sorted(self._children.items()):
+            yield "", self._label_text(key), child.value
+
+
+class _Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self.counts):
+                self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _Histogram(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def samples(self):
+        for key, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                le = self._label_text(key, [("le", f"{bound:g}")])
+                yield "_bucket", le, cumulative
+            yield "_bucket", self._label_text(key, [("le", "+Inf")]), child.count
+            yield "_sum", self._label_text(key), child.sum
+            yield "_count", self._label_text(key), child.count
+
+
+class Registry(object):
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # Re-registering (e.g. on module reload) returns the live metric.
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = Registry()
+
+
+def init_app(app):
+    def metrics_view():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -0,0 +1,34 @@
+"""Add Venue latitude, longitude and geohash
+
+Revision ID: 1c7b9e4f2a85
+Revises: f41a8c6d2b97
+Create Date: 2026-10-17 21:03:44.127560
+
+Existing venues are placed afterwards, offline, by `flask geo geocode`.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c7b9e4f2a85'
+down_revision = 'f41a8c6d2b97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+        batch_op.create_index(batch_op.f('ix_Venue_geohash'), ['geohash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_Venue_geohash'))
+        batch_op.drop_column('geohash')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
@@ -0,0 +1,68 @@
+"""Store Show.start_time as timestamptz and index it per venue/artist
+
+Revision ID: 3b1f7c2d9a41
+Revises: fac367c2835c
+Create Date: 2026-10-17 09:12:04.118322
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3b1f7c2d9a41'
+down_revision = 'fac367c2835c'
+branch_labels = None
+depends_on = None
+
+
+def swap_column(name, type_, value):
+    """Replace column ``name`` of Show by one of ``type_`` set to ``value``."""
+    with op.batch_alter_table('Show', schema=None) as batch_op:
+        batch_op.add_column(sa.Column(name + '_new', type_, nullable=True))
+    op.execute('UPDATE "Show" SET {}_new = {}'.format(name, value))
+    with op.batch_alter_table('Show', schema=None) as batch_op:
+        batch_op.drop_column(name)
+        batch_op.alter_column(name + '_new', new_column_name=name,
+                              existing_type=type_, existing_nullable=True)
+
+
+def upgrade():
+    # Existing rows hold "YYYY-MM-DD HH:MM:SS" strings written by ShowForm,
+    # which PostgreSQL casts directly; blank strings become NULL.
+    op.execute(
+        "UPDATE \"Show\" SET start_time = NULL WHERE trim(start_time) = ''"
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.batch_alter_table('Show', schema=None) as batch_op:
+            batch_op.alter_column('start_time',
+                   existing_type=sa.String(length=200),
+                   type_=sa.DateTime(timezone=True),
+                   existing_nullable=True,
+                   postgresql_using='start_time::timestamptz')
+    else:
+        # Elsewhere the cast can truncate: SQLite's batch rebuild copies with
+        # CAST(start_time AS DATETIME), a NUMERIC cast that keeps only the
+        # year. SQLite stores DateTime as the same ISO text, so copy the
+        # strings into a new column as they are.
+        swap_column('start_time', sa.DateTime(timezone=True), 'start_time')
+    with op.batch_alter_table('Show', schema=None) as batch_op:
+        batch_op.create_index('ix_Show_venue_id_start_time',
+                              ['venue_id', 'start_time'], unique=False)
+        batch_op.create_index('ix_Show_artist_id_start_time',
+                              ['artist_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('Show', schema=None) as batch_op:
+        batch_op.drop_index('ix_Show_artist_id_start_time')
+        batch_op.drop_index('ix_Show_venue_id_start_time')
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.batch_alter_table('Show', schema=None) as batch_op:
+            batch_op.alter_column('start_time',
+                   existing_type=sa.DateTime(timezone=True),
+                   type_=sa.String(length=200),
+                   existing_nullable=True,
+                   postgresql_using="to_char(start_time, 'YYYY-MM-DD HH24:MI:SS')")
+    else:
+        # Back to ShowForm's format, without the stored microseconds.
+        swap_column('start_time', sa.String(length=200), 'substr(start_time, 1, 19)')
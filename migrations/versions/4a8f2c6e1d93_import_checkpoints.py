@@ -0,0 +1,33 @@
+"""Add the ImportCheckpoint table for resumable data imports
+
+Revision ID: 4a8f2c6e1d93
+Revises: 7e2d5b8c3f14
+Create Date: 2026-10-18 09:12:40.517203
+
+Replaces the PATH.checkpoint files, which were written after a batch's
+commit rather than with it.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a8f2c6e1d93'
+down_revision = '7e2d5b8c3f14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'ImportCheckpoint',
+        sa.Column('name', sa.String(length=500), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade():
+    op.drop_table('ImportCheckpoint')
@@ -0,0 +1,68 @@
+"""Add trigram search indexes (PostgreSQL) or FTS5 tables (SQLite)
+
+Revision ID: 5d9a0e3b7c12
+Revises: 8c4e2a7d1f60
+Create Date: 2026-10-17 11:26:13.904120
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5d9a0e3b7c12'
+down_revision = '8c4e2a7d1f60'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = ('name', 'city', 'state', 'genres')
+FTS_TABLES = {'Venue': 'venue_search', 'Artist': 'artist_search'}
+
+
+def search_document():
+    # Must match models.search_document() for the planner to use the index.
+    parts = ["coalesce(CAST({} AS TEXT), '')".format(c) for c in SEARCH_COLUMNS]
+    document = parts[0]
+    for part in parts[1:]:
+        document = "({} || ' ') || {}".format(document, part)
+    return document
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for source in FTS_TABLES:
+            op.execute(
+                'CREATE INDEX "ix_{0}_search_trgm" ON "{0}" '
+                'USING gin (({1}) gin_trgm_ops)'.format(source, search_document())
+            )
+    elif dialect == 'sqlite':
+        cols = ', '.join(SEARCH_COLUMNS)
+        new = ', '.join('new.' + c for c in SEARCH_COLUMNS)
+        old = ', '.join('old.' + c for c in SEARCH_COLUMNS)
+        for source, fts in FTS_TABLES.items():
+            delete = ("INSERT INTO {0}({0}, rowid, {1}) "
+                      "VALUES ('delete', old.id, {2});".format(fts, cols, old))
+            insert = ("INSERT INTO {0}(rowid, {1}) "
+                      "VALUES (new.id, {2});".format(fts, cols, new))
+            op.execute("CREATE VIRTUAL TABLE {0} USING fts5({1}, content='{2}', "
+                       "content_rowid='id')".format(fts, cols, source))
+            op.execute('CREATE TRIGGER {0}_ai AFTER INSERT ON "{1}" '
+                       'BEGIN {2} END'.format(fts, source, insert))
+            op.execute('CREATE TRIGGER {0}_ad AFTER DELETE ON "{1}" '
+                       'BEGIN {2} END'.format(fts, source, delete))
+            op.execute('CREATE TRIGGER {0}_au AFTER UPDATE ON "{1}" '
+                       'BEGIN {2} {3} END'.format(fts, source, delete, insert))
+            op.execute("INSERT INTO {0}({0}) VALUES ('rebuild')".format(fts))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for source in FTS_TABLES:
+            op.execute('DROP INDEX IF EXISTS "ix_{}_search_trgm"'.format(source))
+    elif dialect == 'sqlite':
+        for fts in FTS_TABLES.values():
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute('DROP TRIGGER IF EXISTS {}_{}'.format(fts, suffix))
+            op.execute('DROP TABLE IF EXISTS {}'.format(fts))
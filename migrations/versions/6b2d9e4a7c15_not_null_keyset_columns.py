@@ -0,0 +1,84 @@
+"""Make the keyset pagination columns NOT NULL
+
+Revision ID: 6b2d9e4a7c15
+Revises: 4a8f2c6e1d93
+Create Date: 2026-10-18 10:04:17.902346
+
+A NULL in a keyset column stops paging dead: once such a row is the
+cursor, (name, id) > (NULL, 7) is NULL for every row. The forms already
+require these fields. Existing NULL names, cities and states become ''.
+Shows without a start time are deleted, since neither the past nor the
+upcoming split could ever list them.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b2d9e4a7c15'
+down_revision = '4a8f2c6e1d93'
+branch_labels = None
+depends_on = None
+
+KEYS = {
+    'Venue': ('name', 'city', 'state'),
+    'Artist': ('name',),
+}
+
+# The FTS5 tables of 5d9a0e3b7c12, kept in sync by triggers on the tables.
+SEARCH_COLUMNS = ('name', 'city', 'state', 'genres')
+FTS_TABLES = {'Venue': 'venue_search', 'Artist': 'artist_search'}
+
+
+def restore_after_rebuild():
+    # SQLite's batch mode rebuilds the table and loses expression indexes,
+    # and the search triggers with it.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table in KEYS:
+        op.create_index('ix_{}_name_prefix'.format(table), table,
+                        [sa.text('lower(name)')], unique=False)
+    cols = ', '.join(SEARCH_COLUMNS)
+    new = ', '.join('new.' + c for c in SEARCH_COLUMNS)
+    old = ', '.join('old.' + c for c in SEARCH_COLUMNS)
+    for source, fts in FTS_TABLES.items():
+        delete = ("INSERT INTO {0}({0}, rowid, {1}) "
+                  "VALUES ('delete', old.id, {2});".format(fts, cols, old))
+        insert = ("INSERT INTO {0}(rowid, {1}) "
+                  "VALUES (new.id, {2});".format(fts, cols, new))
+        op.execute('CREATE TRIGGER IF NOT EXISTS {0}_ai AFTER INSERT ON "{1}" '
+                   'BEGIN {2} END'.format(fts, source, insert))
+        op.execute('CREATE TRIGGER IF NOT EXISTS {0}_ad AFTER DELETE ON "{1}" '
+                   'BEGIN {2} END'.format(fts, source, delete))
+        op.execute('CREATE TRIGGER IF NOT EXISTS {0}_au AFTER UPDATE ON "{1}" '
+                   'BEGIN {2} {3} END'.format(fts, source, delete, insert))
+
+
+def upgrade():
+    for table, columns in KEYS.items():
+        for column in columns:
+            op.execute(f'UPDATE "{table}" SET {column} = \'\' WHERE {column} IS NULL')
+    op.execute('DELETE FROM "Show" WHERE start_time IS NULL')
+
+    for table, columns in KEYS.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column in columns:
+                batch_op.alter_column(
+                    column, existing_type=sa.String(length=120), nullable=False)
+    with op.batch_alter_table('Show', schema=None) as batch_op:
+        batch_op.alter_column(
+            'start_time', existing_type=sa.DateTime(timezone=True), nullable=False)
+    restore_after_rebuild()
+
+
+def downgrade():
+    with op.batch_alter_table('Show', schema=None) as batch_op:
+        batch_op.alter_column(
+            'start_time', existing_type=sa.DateTime(timezone=True), nullable=True)
+    for table, columns in KEYS.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column in columns:
+                batch_op.alter_column(
+                    column, existing_type=sa.String(length=120), nullable=True)
+    restore_after_rebuild()
@@ -0,0 +1,43 @@
+"""Add the Job table backing the background job queue
+
+Revision ID: 7e2d5b8c3f14
+Revises: 1c7b9e4f2a85
+Create Date: 2026-10-17 22:26:15.803942
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2d5b8c3f14'
+down_revision = '1c7b9e4f2a85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'Job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('idempotency_key', sa.String(length=200), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('worker', sa.String(length=120), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('idempotency_key'),
+    )
+    op.create_index('ix_Job_status_run_at', 'Job', ['status', 'run_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Job_status_run_at', table_name='Job')
+    op.drop_table('Job')
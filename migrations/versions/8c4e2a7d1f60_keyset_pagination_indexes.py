@@ -0,0 +1,37 @@
+"""Add keyset pagination indexes for venue, artist and show listings
+
+Revision ID: 8c4e2a7d1f60
+Revises: 3b1f7c2d9a41
+Create Date: 2026-10-17 10:02:41.530917
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4e2a7d1f60'
+down_revision = '3b1f7c2d9a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.create_index('ix_Venue_name_id', ['name', 'id'], unique=False)
+
+    with op.batch_alter_table('Artist', schema=None) as batch_op:
+        batch_op.create_index('ix_Artist_name_id', ['name', 'id'], unique=False)
+
+    with op.batch_alter_table('Show', schema=None) as batch_op:
+        batch_op.create_index('ix_Show_start_time_id', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('Show', schema=None) as batch_op:
+        batch_op.drop_index('ix_Show_start_time_id')
+
+    with op.batch_alter_table('Artist', schema=None) as batch_op:
+        batch_op.drop_index('ix_Artist_name_id')
+
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.drop_index('ix_Venue_name_id')
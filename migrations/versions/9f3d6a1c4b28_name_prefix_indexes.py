@@ -0,0 +1,31 @@
+"""Add lower(name) prefix indexes for the venue and artist typeahead
+
+Revision ID: 9f3d6a1c4b28
+Revises: e4b7d29c6f15
+Create Date: 2026-10-17 17:40:22.615930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f3d6a1c4b28'
+down_revision = 'e4b7d29c6f15'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+
+def upgrade():
+    # text_pattern_ops serves LIKE 'prefix%' on PostgreSQL under any collation.
+    ops = ' text_pattern_ops' if op.get_bind().dialect.name == 'postgresql' else ''
+    for table in TABLES:
+        op.create_index('ix_{}_name_prefix'.format(table), table,
+                        [sa.text('lower(name){}'.format(ops))], unique=False)
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index('ix_{}_name_prefix'.format(table), table_name=table)
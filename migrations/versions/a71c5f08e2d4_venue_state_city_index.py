@@ -0,0 +1,26 @@
+"""Add a (state, city) index for the grouped venue listing
+
+Revision ID: a71c5f08e2d4
+Revises: 5d9a0e3b7c12
+Create Date: 2026-10-17 12:48:55.271036
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a71c5f08e2d4'
+down_revision = '5d9a0e3b7c12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.create_index('ix_Venue_state_city_name_id',
+                              ['state', 'city', 'name', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.drop_index('ix_Venue_state_city_name_id')
@@ -0,0 +1,28 @@
+"""Add Venue.deleted_at for soft deletes
+
+Revision ID: b6e1f4a09d53
+Revises: 9f3d6a1c4b28
+Create Date: 2026-10-17 18:21:47.052318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e1f4a09d53'
+down_revision = '9f3d6a1c4b28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+        batch_op.create_index(batch_op.f('ix_Venue_deleted_at'), ['deleted_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_Venue_deleted_at'))
+        batch_op.drop_column('deleted_at')
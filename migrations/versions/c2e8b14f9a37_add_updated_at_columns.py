@@ -0,0 +1,56 @@
+"""Add updated_at to Venue, Artist and Show
+
+Revision ID: c2e8b14f9a37
+Revises: a71c5f08e2d4
+Create Date: 2026-10-17 14:05:37.662190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e8b14f9a37'
+down_revision = 'a71c5f08e2d4'
+branch_labels = None
+depends_on = None
+
+# The FTS5 tables of 5d9a0e3b7c12, kept in sync by triggers on the tables.
+SEARCH_COLUMNS = ('name', 'city', 'state', 'genres')
+FTS_TABLES = {'Venue': 'venue_search', 'Artist': 'artist_search'}
+
+
+def restore_search_triggers():
+    # SQLite cannot add a column with a now() default in place, so batch mode
+    # rebuilds the table, and dropping the old one drops its triggers.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    cols = ', '.join(SEARCH_COLUMNS)
+    new = ', '.join('new.' + c for c in SEARCH_COLUMNS)
+    old = ', '.join('old.' + c for c in SEARCH_COLUMNS)
+    for source, fts in FTS_TABLES.items():
+        delete = ("INSERT INTO {0}({0}, rowid, {1}) "
+                  "VALUES ('delete', old.id, {2});".format(fts, cols, old))
+        insert = ("INSERT INTO {0}(rowid, {1}) "
+                  "VALUES (new.id, {2});".format(fts, cols, new))
+        op.execute('CREATE TRIGGER IF NOT EXISTS {0}_ai AFTER INSERT ON "{1}" '
+                   'BEGIN {2} END'.format(fts, source, insert))
+        op.execute('CREATE TRIGGER IF NOT EXISTS {0}_ad AFTER DELETE ON "{1}" '
+                   'BEGIN {2} END'.format(fts, source, delete))
+        op.execute('CREATE TRIGGER IF NOT EXISTS {0}_au AFTER UPDATE ON "{1}" '
+                   'BEGIN {2} {3} END'.format(fts, source, delete, insert))
+
+
+def upgrade():
+    for table in ('Venue', 'Artist', 'Show'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(timezone=True),
+                                          server_default=sa.func.now(), nullable=False))
+    restore_search_triggers()
+
+
+def downgrade():
+    for table in ('Show', 'Artist', 'Venue'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('updated_at')
+    restore_search_triggers()
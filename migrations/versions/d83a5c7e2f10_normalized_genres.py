@@ -0,0 +1,87 @@
+"""Add Genre and the VenueGenre/ArtistGenre links, backfilled from the JSON
+
+Revision ID: d83a5c7e2f10
+Revises: b6e1f4a09d53
+Create Date: 2026-10-17 19:05:31.448207
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd83a5c7e2f10'
+down_revision = 'b6e1f4a09d53'
+branch_labels = None
+depends_on = None
+
+# forms.genres_choices as of this revision.
+GENRES = (
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+    'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop',
+    'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other',
+)
+LINKS = {'Venue': ('VenueGenre', 'venue_id'), 'Artist': ('ArtistGenre', 'artist_id')}
+
+
+def upgrade():
+    op.create_table(
+        'Genre',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.Column('venue_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('artist_count', sa.Integer(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    for source, (link, key) in LINKS.items():
+        op.create_table(
+            link,
+            sa.Column(key, sa.Integer(), nullable=False),
+            sa.Column('genre_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint([key], ['{}.id'.format(source)], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint(key, 'genre_id'),
+        )
+        op.create_index('ix_{}_genre_id_{}'.format(link, key), link, ['genre_id', key],
+                        unique=False)
+
+    # Backfill: every genre named in the forms or in the data, then the links.
+    bind = op.get_bind()
+    genre = sa.table('Genre', sa.column('id', sa.Integer), sa.column('name', sa.String))
+    rows = {}
+    names = set(GENRES)
+    for source in LINKS:
+        rows[source] = []
+        for row_id, genres in bind.execute(sa.text('SELECT id, genres FROM "{}"'.format(source))):
+            if isinstance(genres, str):
+                genres = json.loads(genres)
+            genres = list(dict.fromkeys(genres or []))
+            rows[source].append((row_id, genres))
+            names.update(genres)
+    op.bulk_insert(genre, [{'name': name} for name in sorted(names)])
+    ids = dict(bind.execute(sa.text('SELECT name, id FROM "Genre"')).fetchall())
+    for source, (link, key) in LINKS.items():
+        table = sa.table(link, sa.column(key, sa.Integer), sa.column('genre_id', sa.Integer))
+        links = [{key: row_id, 'genre_id': ids[name]}
+                 for row_id, genres in rows[source] for name in genres]
+        if links:
+            op.bulk_insert(table, links)
+
+    op.execute(
+        'UPDATE "Genre" SET '
+        'venue_count = (SELECT count(*) FROM "VenueGenre" JOIN "Venue" '
+        'ON "Venue".id = "VenueGenre".venue_id '
+        'WHERE "VenueGenre".genre_id = "Genre".id AND "Venue".deleted_at IS NULL), '
+        'artist_count = (SELECT count(*) FROM "ArtistGenre" '
+        'WHERE "ArtistGenre".genre_id = "Genre".id)'
+    )
+
+
+def downgrade():
+    for link, key in LINKS.values():
+        op.drop_index('ix_{}_genre_id_{}'.format(link, key), table_name=link)
+        op.drop_table(link)
+    op.drop_table('Genre')
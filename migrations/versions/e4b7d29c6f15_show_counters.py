@@ -0,0 +1,50 @@
+"""Add show counters to Venue and Artist
+
+Revision ID: e4b7d29c6f15
+Revises: c2e8b14f9a37
+Create Date: 2026-10-17 15:12:08.301544
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7d29c6f15'
+down_revision = 'c2e8b14f9a37'
+branch_labels = None
+depends_on = None
+
+COUNTERS = {
+    'upcoming_shows_count': 'SELECT count(*) FROM "Show" WHERE "Show".{key} = "{table}".id '
+                            'AND "Show".start_time > CURRENT_TIMESTAMP',
+    'past_shows_count': 'SELECT count(*) FROM "Show" WHERE "Show".{key} = "{table}".id '
+                        'AND "Show".start_time <= CURRENT_TIMESTAMP',
+    'next_show_time': 'SELECT min("Show".start_time) FROM "Show" WHERE "Show".{key} = "{table}".id '
+                      'AND "Show".start_time > CURRENT_TIMESTAMP',
+}
+
+
+def upgrade():
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('upcoming_shows_count', sa.Integer(),
+                                          server_default='0', nullable=False))
+            batch_op.add_column(sa.Column('past_shows_count', sa.Integer(),
+                                          server_default='0', nullable=False))
+            batch_op.add_column(sa.Column('next_show_time', sa.DateTime(timezone=True), nullable=True))
+            batch_op.create_index(f'ix_{table}_next_show_time', ['next_show_time'], unique=False)
+
+        # Backfill; afterwards counters.py keeps them current.
+        assignments = ', '.join(f'{column} = ({query.format(key=key, table=table)})'
+                                for column, query in COUNTERS.items())
+        op.execute(f'UPDATE "{table}" SET {assignments}')
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_next_show_time')
+            batch_op.drop_column('next_show_time')
+            batch_op.drop_column('past_shows_count')
+            batch_op.drop_column('upcoming_shows_count')
@@ -0,0 +1,71 @@
+"""Add the UpcomingShow feed table, backfilled from Show
+
+Revision ID: f41a8c6d2b97
+Revises: d83a5c7e2f10
+Create Date: 2026-10-17 20:12:09.614385
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f41a8c6d2b97'
+down_revision = 'd83a5c7e2f10'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ('show_id', 'start_time', 'venue_id', 'venue_name', 'artist_id', 'artist_name',
+           'artist_image_link')
+
+
+def upgrade():
+    op.create_table(
+        'UpcomingShow',
+        sa.Column('show_id', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('venue_id', sa.Integer(), nullable=True),
+        sa.Column('venue_name', sa.String(length=120), nullable=True),
+        sa.Column('artist_id', sa.Integer(), nullable=True),
+        sa.Column('artist_name', sa.String(length=120), nullable=True),
+        sa.Column('artist_image_link', sa.String(length=500), nullable=True),
+        sa.ForeignKeyConstraint(['show_id'], ['Show.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('show_id'),
+    )
+    op.create_index('ix_UpcomingShow_start_time_show_id', 'UpcomingShow',
+                    ['start_time', 'show_id'], unique=False)
+    op.create_index(op.f('ix_UpcomingShow_venue_id'), 'UpcomingShow', ['venue_id'],
+                    unique=False)
+    op.create_index(op.f('ix_UpcomingShow_artist_id'), 'UpcomingShow', ['artist_id'],
+                    unique=False)
+
+    # Backfill: every show that has not started, at a venue that is not deleted.
+    show = sa.table('Show', sa.column('id', sa.Integer),
+                    sa.column('start_time', sa.DateTime(timezone=True)),
+                    sa.column('venue_id', sa.Integer), sa.column('artist_id', sa.Integer))
+    venue = sa.table('Venue', sa.column('id', sa.Integer), sa.column('name', sa.String),
+                     sa.column('deleted_at', sa.DateTime(timezone=True)))
+    artist = sa.table('Artist', sa.column('id', sa.Integer), sa.column('name', sa.String),
+                      sa.column('image_link', sa.String))
+    feed = sa.table('UpcomingShow', *(sa.column(name) for name in COLUMNS))
+    upcoming = (
+        sa.select(show.c.id, show.c.start_time, show.c.venue_id, venue.c.name,
+                  show.c.artist_id, artist.c.name, artist.c.image_link)
+        .select_from(show)
+        .join(venue, venue.c.id == show.c.venue_id)
+        .join(artist, artist.c.id == show.c.artist_id)
+        .where(show.c.start_time > datetime.now(timezone.utc),
+               venue.c.deleted_at.is_(None))
+    )
+    op.execute(sa.insert(feed).from_select(COLUMNS, upcoming))
+
+
+def downgrade():
+    op.drop_index(op.f('ix_UpcomingShow_artist_id'), table_name='UpcomingShow')
+    op.drop_index(op.f('ix_UpcomingShow_venue_id'), table_name='UpcomingShow')
+    op.drop_index('ix_UpcomingShow_start_time_show_id', table_name='UpcomingShow')
+    op.drop_table('UpcomingShow')
@@ -1,7 +1,33 @@
+from datetime import datetime, timezone
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Select, event
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from replicas import RoutingSession
 
 # TODO: connect to a local postgresql database
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+def search_document(*columns):
+    """Text searched by search.py: the columns joined by spaces.
+
+    Built from ``||`` and ``coalesce`` only, so PostgreSQL accepts it as an
+    (immutable) index expression.
+    """
+    # Literals are inlined rather than bound so that queries render the exact
+    # expression the index was built on, whatever the driver's paramstyle.
+    empty, space = db.literal_column("''"), db.literal_column("' '")
+    parts = [db.func.coalesce(db.cast(c, db.Text), empty) for c in columns]
+    document = parts[0]
+    for part in parts[1:]:
+        document = document.op("||")(space).op("||")(part)
+    return document
 
 
 # ----------------------------------------------------------------------------#
@@ -11,11 +37,18 @@ db = SQLAlchemy()
 
 class Venue(db.Model):
     __tablename__ = "Venue"
+    # Keyset pagination cursors for the /venues listing, alphabetical and
+    # grouped by (city, state).
+    __table_args__ = (
+        db.Index("ix_Venue_name_id", "name", "id"),
+        db.Index("ix_Venue_state_city_name_id", "state", "city", "name", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(120), index=True)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    # Keyset columns are NOT NULL: a NULL cursor value would end paging.
+    name = db.Column(db.String(120), nullable=False, index=True)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
@@ -26,14 +59,44 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.Text(), default="Not seeking artist right now")
     website_link = db.Column(db.String(120))
-    shows = db.relationship("Show", backref="venue", lazy="joined", cascade="all, delete")
+    # Drives ETag/Last-Modified on the venue page. It also moves when the
+    # venue's show list changes, since counters.py updates the row then.
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=utcnow,
+        onupdate=utcnow,
+        server_default=db.func.now(),
+    )
+    # Show counters, maintained by counters.py on every show write and rolled
+    # forward as upcoming shows start; next_show_time is the next start.
+    upcoming_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    past_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    next_show_time = db.Column(db.DateTime(timezone=True), index=True)
+    # Set by a soft delete; such venues are hidden from every query (see
+    # hide_deleted below) until deletion.py purges them and their shows.
+    deleted_at = db.Column(db.DateTime(timezone=True), index=True)
+    # Set from city/state by geo.py's offline geocoder. Nearby searches are
+    # prefix ranges on the indexed geohash, then exact distances.
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12), index=True)
+    # No eager loading by default: each route in app.py asks for the
+    # relationships (or the columns) it actually renders.
+    shows = db.relationship("Show", backref="venue", cascade="all, delete")
 
 
 class Artist(db.Model):
     __tablename__ = "Artist"
+    # Keyset pagination cursor for the /artists listing.
+    __table_args__ = (db.Index("ix_Artist_name_id", "name", "id"),)
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(120), index=True)
+    name = db.Column(db.String(120), nullable=False, index=True)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
@@ -45,15 +108,226 @@ class Artist(db.Model):
     website_link = db.Column(db.String(500))
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.Text(), default="Not seeking venues right now")
-    shows = db.relationship("Show", backref="artist", lazy="joined", cascade="all, delete")
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=utcnow,
+        onupdate=utcnow,
+        server_default=db.func.now(),
+    )
+    upcoming_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    past_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    next_show_time = db.Column(db.DateTime(timezone=True), index=True)
+    shows = db.relationship("Show", backref="artist", cascade="all, delete")
 
 
 # TODO Implement Show and Artist models, and complete all model relationships
 #  and properties, as a database migration.
 class Show(db.Model):
     __tablename__ = "Show"
+    # Past/upcoming splits are range scans per venue or artist, so both
+    # foreign keys lead a composite index with start_time.
+    __table_args__ = (
+        db.Index("ix_Show_venue_id_start_time", "venue_id", "start_time"),
+        db.Index("ix_Show_artist_id_start_time", "artist_id", "start_time"),
+        db.Index("ix_Show_start_time_id", "start_time", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id"))
     artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id"))
-    start_time = db.Column(db.String(200))
+    start_time = db.Column(db.DateTime(timezone=True), nullable=False)
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=utcnow,
+        onupdate=utcnow,
+        server_default=db.func.now(),
+    )
+
+
+class UpcomingShow(db.Model):
+    """One row per show that has not started yet, with the artist and venue
+    fields its /shows tile renders, kept by feed.py.
+
+    /shows reads only this table, in (start_time, show_id) order, so each
+    page is one range scan of that index with no joins.
+    """
+
+    __tablename__ = "UpcomingShow"
+    __table_args__ = (
+        db.Index("ix_UpcomingShow_start_time_show_id", "start_time", "show_id"),
+    )
+
+    show_id = db.Column(
+        db.Integer, db.ForeignKey("Show.id", ondelete="CASCADE"), primary_key=True
+    )
+    start_time = db.Column(db.DateTime(timezone=True), nullable=False)
+    venue_id = db.Column(
+        db.Integer, db.ForeignKey("Venue.id", ondelete="CASCADE"), index=True
+    )
+    venue_name = db.Column(db.String(120))
+    artist_id = db.Column(
+        db.Integer, db.ForeignKey("Artist.id", ondelete="CASCADE"), index=True
+    )
+    artist_name = db.Column(db.String(120))
+    artist_image_link = db.Column(db.String(500))
+
+
+class Job(db.Model):
+    """A unit of background work, queued by a request and run by
+    `flask jobs work`; see jobs.py."""
+
+    __tablename__ = "Job"
+    # Workers claim the oldest ready jobs of one status.
+    __table_args__ = (db.Index("ix_Job_status_run_at", "status", "run_at"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False)
+    payload = db.Column(db.JSON)
+    # Enqueueing a key that is already queued (or ran) adds nothing.
+    idempotency_key = db.Column(db.String(200), unique=True)
+    # queued -> running -> done, or back to queued for a retry, or failed.
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow)
+    started_at = db.Column(db.DateTime(timezone=True))
+    finished_at = db.Column(db.DateTime(timezone=True))
+    worker = db.Column(db.String(120))
+    last_error = db.Column(db.Text())
+
+
+class ImportCheckpoint(db.Model):
+    """How many records of a file `flask data import` has committed.
+
+    Written in the same transaction as each batch, so it can never be
+    behind (or ahead of) the rows; see commands.py.
+    """
+
+    __tablename__ = "ImportCheckpoint"
+
+    name = db.Column(db.String(500), primary_key=True)
+    position = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(
+        db.DateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow
+    )
+
+
+class Genre(db.Model):
+    """A genre, and how many (non-deleted) venues and artists carry it.
+
+    The counts are the genre facet of the listing pages; genres.py keeps
+    them and the VenueGenre/ArtistGenre links in step with the JSON
+    ``genres`` columns, which stay what the forms read and write.
+    """
+
+    __tablename__ = "Genre"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+    venue_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    artist_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+
+# The primary keys lead with the venue/artist, for rewriting one row's links;
+# the (genre_id, ...) indexes answer "every venue/artist in this genre".
+VenueGenre = db.Table(
+    "VenueGenre",
+    db.Column(
+        "venue_id",
+        db.Integer,
+        db.ForeignKey("Venue.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column(
+        "genre_id",
+        db.Integer,
+        db.ForeignKey("Genre.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Index("ix_VenueGenre_genre_id_venue_id", "genre_id", "venue_id"),
+)
+ArtistGenre = db.Table(
+    "ArtistGenre",
+    db.Column(
+        "artist_id",
+        db.Integer,
+        db.ForeignKey("Artist.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column(
+        "genre_id",
+        db.Integer,
+        db.ForeignKey("Genre.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Index("ix_ArtistGenre_genre_id_artist_id", "genre_id", "artist_id"),
+)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def hide_deleted(orm_execute_state):
+    """Leave soft-deleted venues out of every ORM SELECT, including joins
+    from Show (so their shows disappear with them) and the asyncio sessions.
+
+    ``execution_options(include_deleted=True)`` sees them anyway. Compound
+    statements (UNION etc.) are not rewritten; filter their parts yourself.
+    """
+    if (
+        orm_execute_state.is_select
+        and isinstance(orm_execute_state.statement, Select)
+        and not orm_execute_state.is_column_load
+        and not orm_execute_state.is_relationship_load
+        and not orm_execute_state.execution_options.get("include_deleted", False)
+    ):
+        orm_execute_state.statement = orm_execute_state.statement.options(
+            with_loader_criteria(
+                Venue, Venue.deleted_at.is_(None), include_aliases=True
+            )
+        )
+
+
+# ----------------------------------------------------------------------------#
+# Search indexes.
+# ----------------------------------------------------------------------------#
+
+VENUE_SEARCH_DOCUMENT = search_document(
+    Venue.name, Venue.city, Venue.state, Venue.genres
+)
+ARTIST_SEARCH_DOCUMENT = search_document(
+    Artist.name, Artist.city, Artist.state, Artist.genres
+)
+
+# pg_trgm GIN indexes serve the infix ILIKE matches; SQLite gets FTS5 tables
+# from search.py instead.
+db.Index(
+    "ix_Venue_search_trgm",
+    VENUE_SEARCH_DOCUMENT.label("search_document"),
+    postgresql_using="gin",
+    postgresql_ops={"search_document": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+db.Index(
+    "ix_Artist_search_trgm",
+    ARTIST_SEARCH_DOCUMENT.label("search_document"),
+    postgresql_using="gin",
+    postgresql_ops={"search_document": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+
+# Typeahead prefix lookups (search.py) on lower(name). text_pattern_ops lets
+# PostgreSQL use the index for LIKE 'prefix%' whatever the database collation.
+db.Index(
+    "ix_Venue_name_prefix",
+    db.func.lower(Venue.name).label("name_prefix"),
+    postgresql_ops={"name_prefix": "text_pattern_ops"},
+)
+db.Index(
+    "ix_Artist_name_prefix",
+    db.func.lower(Artist.name).label("name_prefix"),
+    postgresql_ops={"name_prefix": "text_pattern_ops"},
+)
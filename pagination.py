@@ -0,0 +1,131 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import DateTime, tuple_
+
+from models import db
+
+# ----------------------------------------------------------------------------#
+# Keyset pagination.
+# ----------------------------------------------------------------------------#
+
+
+class Page(object):
+    """One page of rows plus opaque cursors for the neighbouring pages."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(direction, values):
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps([direction, values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, keys):
+    """Return ``(direction, values)`` or ``None`` for a malformed cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        return None
+    if direction not in ("next", "prev") or len(values) != len(keys):
+        return None
+    decoded = []
+    for key, value in zip(keys, values):
+        if value is not None and isinstance(key.type, DateTime):
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                return None
+        decoded.append(value)
+    return direction, decoded
+
+
+def get_page_size():
+    """Page size from ``?per_page=``, bounded by ``MAX_PAGE_SIZE``."""
+    default = current_app.config["PAGE_SIZE"]
+    per_page = request.args.get("per_page", default, type=int)
+    return max(1, min(per_page, current_app.config["MAX_PAGE_SIZE"]))
+
+
+def paginate(stmt, keys, cursor=None, per_page=None):
+    """Run ``stmt`` as a keyset-paginated query ordered by ``keys``.
+
+    ``keys`` must be a unique ordering (end with the primary key) and each key
+    must be selected by ``stmt`` under its own name, since cursor values are
+    read back from the result rows. Keys must be NOT NULL: a NULL cursor
+    value compares as NULL against every row and would end the listing.
+
+    Only ``per_page + 1`` rows are fetched, whatever the table size, and an
+    index on ``keys`` turns every page into a single range scan.
+    """
+    query = KeysetQuery(stmt, keys, cursor, per_page)
+    return query.page(db.session.execute(query.stmt).all())
+
+
+class KeysetQuery(object):
+    """The two halves of ``paginate``, for callers that run the statement
+    themselves (e.g. on an async session): execute ``.stmt``, then pass the
+    rows to ``.page()``.
+    """
+
+    def __init__(self, stmt, keys, cursor=None, per_page=None):
+        if per_page is None:
+            per_page = get_page_size()
+        direction, values = "next", None
+        if cursor:
+            direction, values = decode_cursor(cursor, keys) or ("next", None)
+
+        if values is not None:
+            boundary = tuple_(*keys)
+            if direction == "next":
+                stmt = stmt.where(boundary > tuple_(*values))
+            else:
+                stmt = stmt.where(boundary < tuple_(*values))
+        if direction == "next":
+            stmt = stmt.order_by(*keys)
+        else:
+            stmt = stmt.order_by(*[key.desc() for key in keys])
+
+        self.stmt = stmt.limit(per_page + 1)
+        self.keys = keys
+        self.per_page = per_page
+        self.direction = direction
+        self.values = values
+
+    def page(self, rows):
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if self.direction == "prev":
+            rows.reverse()
+
+        def cursor_for(row, to):
+            return encode_cursor(to, [getattr(row, key.key) for key in self.keys])
+
+        next_cursor = prev_cursor = None
+        if rows:
+            if has_more or self.direction == "prev":
+                next_cursor = cursor_for(rows[-1], "next")
+            if self.values is not None and (has_more or self.direction == "next"):
+                prev_cursor = cursor_for(rows[0], "prev")
+        return Page(rows, next_cursor=next_cursor, prev_cursor=prev_cursor)
@@ -0,0 +1,140 @@
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from metrics import registry
+
+# ----------------------------------------------------------------------------#
+# Connection pool configuration and instrumentation.
+# ----------------------------------------------------------------------------#
+
+checkout_seconds = registry.histogram(
+    "fyyur_db_pool_checkout_seconds",
+    "Time spent waiting for a pooled connection, including connects.",
+)
+checkout_timeouts = registry.counter(
+    "fyyur_db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT seconds.",
+)
+overflow_events = registry.counter(
+    "fyyur_db_pool_overflow_events_total",
+    "Connections opened beyond DB_POOL_SIZE.",
+)
+
+_pools = []
+
+
+def _pool_stat(stat):
+    return lambda: sum(getattr(pool, stat)() for pool in _pools)
+
+
+registry.gauge(
+    "fyyur_db_pool_in_use",
+    "Connections currently checked out.",
+    callback=_pool_stat("checkedout"),
+)
+registry.gauge(
+    "fyyur_db_pool_overflow",
+    "Connections currently open beyond DB_POOL_SIZE.",
+    callback=lambda: sum(max(pool.overflow(), 0) for pool in _pools),
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports checkout waits, timeouts and overflow use."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _pools.append(self)
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            checkout_timeouts.inc()
+            raise
+        finally:
+            checkout_seconds.observe(time.perf_counter() - start)
+
+    def _inc_overflow(self):
+        created = super()._inc_overflow()
+        if created and self._overflow > 0:
+            overflow_events.inc()
+        return created
+
+    def recreate(self):
+        # Called on dispose(); keep exporting the replacement instead.
+        pool = super().recreate()
+        if self in _pools:
+            _pools.remove(self)
+        return pool
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """The instrumented pool for asyncio engines (see asgi.py)."""
+
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_uri(uri):
+    """``uri`` with its driver swapped for the asyncio one (asyncpg, aiosqlite)."""
+    url = make_url(uri)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        return uri
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def engine_options(
+    uri,
+    pool_size=5,
+    max_overflow=10,
+    pool_timeout=30,
+    pool_recycle=1800,
+    pool_pre_ping=True,
+    statement_timeout_ms=0,
+    pgbouncer=False,
+    is_async=False,
+):
+    """``SQLALCHEMY_ENGINE_OPTIONS`` for ``uri``.
+
+    With ``pgbouncer`` the app keeps no pool of its own (PgBouncer does the
+    pooling) and sends no ``options`` startup parameter, which PgBouncer
+    rejects; set statement_timeout on the database role instead.
+
+    ``is_async`` gives the options for the asyncpg engine of the same
+    database instead.
+    """
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite":
+        return {}
+    options = {"pool_pre_ping": pool_pre_ping}
+    if pgbouncer:
+        options["poolclass"] = NullPool
+        if is_async:
+            # Prepared statements do not survive transaction pooling.
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+            }
+        return options
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+    )
+    if statement_timeout_ms and url.get_backend_name() == "postgresql":
+        if is_async:
+            settings = {"statement_timeout": str(statement_timeout_ms)}
+            options["connect_args"] = {"server_settings": settings}
+        else:
+            options["connect_args"] = {
+                "options": f"-c statement_timeout={statement_timeout_ms}"
+            }
+    return options
@@ -0,0 +1,237 @@
+from sqlalchemy import func, select
+
+import genres
+from models import Artist, Genre, Show, UpcomingShow, Venue, db, utcnow
+
+# ----------------------------------------------------------------------------#
+# Read queries shared by the HTML views and the JSON API.
+#
+# Everything selects explicit columns, so pages and payloads carry exactly
+# the fields they render and never ORM instance state.
+# ----------------------------------------------------------------------------#
+
+VENUE_COLUMNS = (
+    Venue.id,
+    Venue.name,
+    Venue.genres,
+    Venue.address,
+    Venue.city,
+    Venue.state,
+    Venue.phone,
+    Venue.website_link,
+    Venue.facebook_link,
+    Venue.seeking_talent,
+    Venue.seeking_description,
+    Venue.image_link,
+)
+
+ARTIST_COLUMNS = (
+    Artist.id,
+    Artist.name,
+    Artist.genres,
+    Artist.city,
+    Artist.state,
+    Artist.phone,
+    Artist.website_link,
+    Artist.facebook_link,
+    Artist.seeking_venue,
+    Artist.seeking_description,
+    Artist.image_link,
+)
+
+
+def show_tiles():
+    """Shows with the artist and venue fields a show tile renders."""
+    return (
+        select(
+            Show.id,
+            Show.start_time,
+            Show.venue_id,
+            Venue.name.label("venue_name"),
+            Show.artist_id,
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link"),
+        ).join(Artist, Show.artist_id == Artist.id)
+        # On the foreign key, not an explicit ON clause: only then does the
+        # soft-delete filter (models.hide_deleted) reach the join.
+        .join(Venue)
+    )
+
+
+def venue_listing(sort=None, genre=None, state=None):
+    """``(stmt, keyset)`` for /venues, grouped by city unless sort="name",
+    optionally limited to a genre and/or a state.
+
+    Upcoming show counts are the stored counters from counters.py.
+    """
+    stmt = select(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count.label("num_upcoming_shows"),
+    ).where(*genres.filters(Venue, genre, state))
+    if sort == "name":
+        return stmt, (Venue.name, Venue.id)
+    return stmt, (Venue.state, Venue.city, Venue.name, Venue.id)
+
+
+def artist_listing(genre=None, state=None):
+    stmt = select(
+        Artist.id,
+        Artist.name,
+        Artist.upcoming_shows_count.label("num_upcoming_shows"),
+    ).where(*genres.filters(Artist, genre, state))
+    return stmt, (Artist.name, Artist.id)
+
+
+def genre_facet(model):
+    """``(name, count)`` of every genre carried by ``model`` rows, by name;
+    the stored counts from genres.py, so no aggregation."""
+    count = genres.LINKS[model][2]
+    return (
+        select(Genre.name, count.label("count")).where(count > 0).order_by(Genre.name)
+    )
+
+
+def show_listing():
+    return show_tiles(), (Show.start_time, Show.id)
+
+
+def upcoming_listing(now=None):
+    """``(stmt, keyset)`` for /shows: the upcoming shows feed (feed.py).
+
+    One table and no joins, so with the keyset each page is a single range
+    scan of ix_UpcomingShow_start_time_show_id. Shows that started since the
+    last roll-off are skipped by the same scan.
+    """
+    stmt = select(
+        UpcomingShow.show_id,
+        UpcomingShow.start_time,
+        UpcomingShow.venue_id,
+        UpcomingShow.venue_name,
+        UpcomingShow.artist_id,
+        UpcomingShow.artist_name,
+        UpcomingShow.artist_image_link,
+    ).where(UpcomingShow.start_time > (now or utcnow()))
+    return stmt, (UpcomingShow.start_time, UpcomingShow.show_id)
+
+
+def venue_shows(venue_id):
+    return (
+        select(
+            Show.artist_id,
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link"),
+            Show.start_time,
+        )
+        .join(Artist, Show.artist_id == Artist.id)
+        .where(Show.venue_id == venue_id)
+    )
+
+
+def artist_shows(artist_id):
+    return (
+        select(
+            Show.venue_id,
+            Venue.name.label("venue_name"),
+            Venue.image_link.label("venue_image_link"),
+            Show.start_time,
+        )
+        .join(Venue)
+        .where(Show.artist_id == artist_id)
+    )
+
+
+def past_and_upcoming(stmt, now=None):
+    """Split a show query into past and upcoming range scans on start_time.
+
+    ``stmt`` must already be filtered on venue_id or artist_id so that both
+    halves are served by the (venue_id, start_time) / (artist_id, start_time)
+    indexes on Show.
+    """
+    now = now or utcnow()
+    past = stmt.where(Show.start_time <= now).order_by(Show.start_time.desc())
+    upcoming = stmt.where(Show.start_time > now).order_by(Show.start_time)
+    return past, upcoming
+
+
+def split_shows(stmt):
+    past, upcoming = past_and_upcoming(stmt)
+    return (
+        [dict(show) for show in db.session.execute(past).mappings()],
+        [dict(show) for show in db.session.execute(upcoming).mappings()],
+    )
+
+
+def with_shows(data, past_shows, upcoming_shows):
+    data["past_shows"] = past_shows
+    data["upcoming_shows"] = upcoming_shows
+    data["past_shows_count"] = len(past_shows)
+    data["upcoming_shows_count"] = len(upcoming_shows)
+    return data
+
+
+def venue_detail(venue_id):
+    return select(*VENUE_COLUMNS).where(Venue.id == venue_id)
+
+
+def artist_detail(artist_id):
+    return select(*ARTIST_COLUMNS).where(Artist.id == artist_id)
+
+
+def venue_page(venue_id):
+    """The venue and its past/upcoming shows as a dict, or None."""
+    row = db.session.execute(venue_detail(venue_id)).mappings().first()
+    if row is None:
+        return None
+    return with_shows(dict(row), *split_shows(venue_shows(venue_id)))
+
+
+def artist_page(artist_id):
+    """The artist and their past/upcoming shows as a dict, or None."""
+    row = db.session.execute(artist_detail(artist_id)).mappings().first()
+    if row is None:
+        return None
+    return with_shows(dict(row), *split_shows(artist_shows(artist_id)))
+
+
+def venue_freshness(venue_id):
+    """The timestamps a venue page's ETag/Last-Modified derive from.
+
+    The page changes when the venue row does (it is touched whenever its show
+    list changes), when a performing artist is edited, and when a show moves
+    from upcoming to past, i.e. at the start time of its latest past show.
+    """
+    artists_changed = (
+        select(func.max(Artist.updated_at))
+        .join(Show, Show.artist_id == Artist.id)
+        .where(Show.venue_id == Venue.id)
+        .scalar_subquery()
+    )
+    last_started = (
+        select(func.max(Show.start_time))
+        .where(Show.venue_id == Venue.id, Show.start_time <= utcnow())
+        .scalar_subquery()
+    )
+    return select(Venue.updated_at, artists_changed, last_started).where(
+        Venue.id == venue_id
+    )
+
+
+def artist_freshness(artist_id):
+    """The timestamps an artist page's validators derive from; see above."""
+    venues_changed = (
+        select(func.max(Venue.updated_at))
+        .join(Show, Show.venue_id == Venue.id)
+        .where(Show.artist_id == Artist.id)
+        .scalar_subquery()
+    )
+    last_started = (
+        select(func.max(Show.start_time))
+        .where(Show.artist_id == Artist.id, Show.start_time <= utcnow())
+        .scalar_subquery()
+    )
+    return select(Artist.updated_at, venues_changed, last_started).where(
+        Artist.id == artist_id
+    )
@@ -0,0 +1,227 @@
+import itertools
+import threading
+import time
+from functools import wraps
+
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+from metrics import registry
+
+# ----------------------------------------------------------------------------#
+# Read replicas.
+#
+# With DATABASE_REPLICA_URLS set, SELECTs issued by views marked
+# @replica_reads go to a healthy replica; everything else (writes, flushes,
+# locking reads, other views, CLI commands) goes to the primary. A request
+# that has written stays on the primary, and so does the browser that made
+# it, for REPLICA_PIN_SECONDS, so users read their own writes.
+#
+# Two SQLite files stand in for a primary and a replica in development:
+#
+#   DATABASE_URL=sqlite:////tmp/primary.db \
+#   DATABASE_REPLICA_URLS=sqlite:////tmp/replica.db flask run
+# ----------------------------------------------------------------------------#
+
+PIN_COOKIE = "fyyur_primary"
+
+routed_reads = registry.counter(
+    "fyyur_db_routed_reads_total",
+    "Replica-eligible SELECTs by the database that served them.",
+    labelnames=("target",),
+)
+replica_healthy = registry.gauge(
+    "fyyur_db_replica_healthy",
+    "1 while a replica passes its health check.",
+    labelnames=("replica",),
+)
+
+
+class Replica(object):
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.healthy = True
+        self.checked_at = 0.0
+        self.lag = None
+
+    def load(self):
+        """Connections currently checked out of the replica's pool."""
+        checkedout = getattr(self.engine.pool, "checkedout", None)
+        return checkedout() if checkedout else 0
+
+    def check(self, max_lag):
+        try:
+            with self.engine.connect() as connection:
+                if connection.dialect.name == "postgresql":
+                    # NULL on a server that is not in recovery (i.e. no lag).
+                    self.lag = connection.execute(
+                        sa.text(
+                            "SELECT extract(epoch FROM now() - "
+                            "pg_last_xact_replay_timestamp())"
+                        )
+                    ).scalar()
+                else:
+                    connection.execute(sa.text("SELECT 1"))
+            self.healthy = self.lag is None or self.lag <= max_lag
+        except sa.exc.SQLAlchemyError:
+            self.healthy = False
+        self.checked_at = time.monotonic()
+        replica_healthy.labels(replica=self.name).set(int(self.healthy))
+
+
+class ReplicaSet(object):
+    """The replicas of one app and the policy for choosing between them."""
+
+    def __init__(self, replicas, strategy="round_robin", interval=10, max_lag=30):
+        if strategy not in ("round_robin", "least_loaded"):
+            raise ValueError(f"Unknown REPLICA_STRATEGY: {strategy}")
+        self.replicas = replicas
+        self.strategy = strategy
+        self.interval = interval
+        self.max_lag = max_lag
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        for replica in replicas:
+            sa.event.listen(replica.engine, "handle_error", self._on_error(replica))
+
+    def _on_error(self, replica):
+        def mark_down(context):
+            # Stop routing to it until the next health check passes.
+            if context.is_disconnect:
+                replica.healthy = False
+                replica_healthy.labels(replica=replica.name).set(0)
+
+        return mark_down
+
+    def refresh(self):
+        """Re-check replicas whose status is older than the interval.
+
+        Runs inline, at most once per interval and by one thread at a time;
+        other threads keep using the last known status meanwhile.
+        """
+        now = time.monotonic()
+        due = [r for r in self.replicas if now - r.checked_at >= self.interval]
+        if due and self._lock.acquire(blocking=False):
+            try:
+                for replica in due:
+                    replica.check(self.max_lag)
+            finally:
+                self._lock.release()
+
+    def choose(self):
+        """A healthy replica, or None if there is none."""
+        self.refresh()
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        if self.strategy == "least_loaded":
+            return min(healthy, key=Replica.load)
+        return healthy[next(self._turn) % len(healthy)]
+
+    def dispose(self):
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+
+def replica_reads(view):
+    """Let ``view``'s SELECTs go to a replica: for read-only views only."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.replica_reads = True
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def pinned_to_primary():
+    """True if this request, or the client's last few, wrote to the primary."""
+    return bool(g.get("wrote_to_primary") or request.cookies.get(PIN_COOKIE))
+
+
+def reads_may_use_replica():
+    """True inside a @replica_reads view, unless this client just wrote."""
+    if not has_request_context() or not g.get("replica_reads"):
+        return False
+    return not pinned_to_primary()
+
+
+class RoutingSession(Session):
+    """db.session class that sends eligible SELECTs to a replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if (
+            bind is not None
+            or clause is None
+            or not getattr(clause, "is_select", False)
+            or getattr(clause, "_for_update_arg", None) is not None
+            or self._flushing
+            or self.info.get("pinned")
+        ):
+            return primary
+        replicas = current_app.extensions.get("replicas")
+        if replicas is None or not reads_may_use_replica():
+            return primary
+        replica = replicas.choose()
+        if replica is None:
+            routed_reads.labels(target="primary").inc()
+            return primary
+        routed_reads.labels(target=replica.name).inc()
+        return replica.engine
+
+
+@sa.event.listens_for(RoutingSession, "after_flush")
+def pin_to_primary(session, flush_context):
+    # Reads after a write in this session must see it.
+    session.info["pinned"] = True
+
+
+@sa.event.listens_for(RoutingSession, "do_orm_execute")
+def pin_on_dml(orm_execute_state):
+    # Bulk UPDATE/DELETE/INSERT statements write without a flush.
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["pinned"] = True
+
+
+@sa.event.listens_for(RoutingSession, "after_commit")
+def remember_write(session):
+    if session.info.pop("pinned", False) and has_request_context():
+        g.wrote_to_primary = True
+
+
+@sa.event.listens_for(RoutingSession, "after_rollback")
+def forget_pin(session):
+    session.info.pop("pinned", None)
+
+
+def init_app(app):
+    urls = [url for url in app.config["DATABASE_REPLICA_URLS"] if url]
+    if not urls:
+        return None
+    options = app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+    replicas = ReplicaSet(
+        [
+            Replica(f"replica_{i}", sa.create_engine(url, **options))
+            for i, url in enumerate(urls)
+        ],
+        strategy=app.config["REPLICA_STRATEGY"],
+        interval=app.config["REPLICA_HEALTH_INTERVAL"],
+        max_lag=app.config["REPLICA_MAX_LAG"],
+    )
+    app.extensions["replicas"] = replicas
+    pin_seconds = app.config["REPLICA_PIN_SECONDS"]
+
+    @app.after_request
+    def pin_writer(response):
+        # The writer's next requests (e.g. the page it is redirected to)
+        # read from the primary until replicas have caught up.
+        if g.get("wrote_to_primary"):
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=pin_seconds, httponly=True, samesite="Lax"
+            )
+        return response
+
+    return replicas
@@ -0,0 +1,209 @@
+import bisect
+import csv
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, insert, literal, or_, select
+
+import counters
+import feed
+from conditional import as_utc
+from models import Artist, Show, Venue, db
+
+# ----------------------------------------------------------------------------#
+# Batch show scheduling.
+#
+# A promoter submits a whole tour as (artist_id, venue_id, start_time) rows.
+# The batch is checked as a set rather than row by row: every referenced id
+# in one query, every possible clash in one indexed range query, and then
+# either all rows go in as a single multi-row INSERT or none do and each bad
+# row gets its errors back.
+# ----------------------------------------------------------------------------#
+
+COLUMNS = ("artist_id", "venue_id", "start_time")
+
+
+class BatchRow(object):
+    """One submitted show, with whatever is wrong with it."""
+
+    def __init__(self, number, artist_id=None, venue_id=None, start_time=None):
+        self.number = number
+        self.artist_id = artist_id
+        self.venue_id = venue_id
+        self.start_time = start_time
+        self.errors = []
+
+    def as_dict(self):
+        return {
+            "row": self.number,
+            "artist_id": self.artist_id,
+            "venue_id": self.venue_id,
+            "start_time": self.start_time,
+            "errors": self.errors,
+        }
+
+
+def parse_row(number, artist_id, venue_id, start_time):
+    row = BatchRow(number)
+    for name, value in (("artist_id", artist_id), ("venue_id", venue_id)):
+        try:
+            setattr(row, name, int(str(value).strip()))
+        except (TypeError, ValueError):
+            row.errors.append(f"{name} must be an integer, not {value!r}.")
+    if isinstance(start_time, datetime):
+        row.start_time = start_time
+    else:
+        try:
+            row.start_time = datetime.fromisoformat(str(start_time).strip())
+        except (TypeError, ValueError):
+            row.errors.append(
+                f"start_time must look like YYYY-MM-DD HH:MM, not {start_time!r}."
+            )
+    return row
+
+
+def rows_from_text(text):
+    """Rows of CSV text, one ``artist_id,venue_id,start_time`` per line.
+
+    A header line naming the columns is optional.
+    """
+    rows = []
+    lines = [line for line in text.splitlines() if line.strip()]
+    for number, cells in enumerate(csv.reader(lines), start=1):
+        cells = [cell.strip() for cell in cells]
+        if number == 1 and cells[:1] == ["artist_id"]:
+            continue
+        if len(cells) != len(COLUMNS):
+            row = BatchRow(number)
+            row.errors.append(f"Expected {len(COLUMNS)} values, got {len(cells)}.")
+            rows.append(row)
+            continue
+        rows.append(parse_row(number, *cells))
+    return rows
+
+
+def rows_from_records(records):
+    """Rows of JSON objects with artist_id, venue_id and start_time keys."""
+    rows = []
+    for number, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            row = BatchRow(number)
+            row.errors.append("Expected an object.")
+            rows.append(row)
+            continue
+        rows.append(parse_row(number, *(record.get(c) for c in COLUMNS)))
+    return rows
+
+
+# ----------------------------------------------------------------------------#
+# Checks.
+# ----------------------------------------------------------------------------#
+
+
+def check_references(rows):
+    """Flag rows whose venue or artist does not exist, in one query."""
+    venue_ids = {row.venue_id for row in rows if row.venue_id is not None}
+    artist_ids = {row.artist_id for row in rows if row.artist_id is not None}
+    if not venue_ids and not artist_ids:
+        return
+    # A UNION, which models.hide_deleted leaves alone: filter deleted venues.
+    stmt = select(literal("venue").label("kind"), Venue.id).where(
+        Venue.id.in_(venue_ids), Venue.deleted_at.is_(None)
+    )
+    stmt = stmt.union_all(
+        select(literal("artist").label("kind"), Artist.id).where(
+            Artist.id.in_(artist_ids)
+        )
+    )
+    found = set(db.session.execute(stmt).tuples())
+    for row in rows:
+        if row.venue_id is not None and ("venue", row.venue_id) not in found:
+            row.errors.append(f"There is no venue {row.venue_id}.")
+        if row.artist_id is not None and ("artist", row.artist_id) not in found:
+            row.errors.append(f"There is no artist {row.artist_id}.")
+
+
+def check_conflicts(rows, duration):
+    """Flag rows that overlap another show at the same venue.
+
+    Shows last ``duration``, so two starts closer than that clash. Existing
+    shows are fetched with one query: a start_time range per venue, which is
+    a range scan of ix_Show_venue_id_start_time.
+    """
+    by_venue = defaultdict(list)
+    for row in rows:
+        if row.venue_id is not None and row.start_time is not None:
+            by_venue[row.venue_id].append(row)
+    if not by_venue:
+        return
+
+    windows = []
+    for venue_id, venue_rows in by_venue.items():
+        starts = [as_utc(row.start_time) for row in venue_rows]
+        windows.append(
+            and_(
+                Show.venue_id == venue_id,
+                Show.start_time > min(starts) - duration,
+                Show.start_time < max(starts) + duration,
+            )
+        )
+    existing = defaultdict(list)
+    for venue_id, start_time in db.session.execute(
+        select(Show.venue_id, Show.start_time).where(or_(*windows))
+    ):
+        existing[venue_id].append(as_utc(start_time))
+
+    for venue_id, venue_rows in by_venue.items():
+        taken = sorted(existing[venue_id])
+        for row in venue_rows:
+            start = as_utc(row.start_time)
+            i = bisect.bisect_right(taken, start - duration)
+            if i < len(taken) and taken[i] < start + duration:
+                row.errors.append(
+                    f"Venue {venue_id} already has a show at "
+                    f"{taken[i]:%Y-%m-%d %H:%M}."
+                )
+        # ...and rows of this batch that clash with each other.
+        venue_rows = sorted(venue_rows, key=lambda row: as_utc(row.start_time))
+        for earlier, later in zip(venue_rows, venue_rows[1:]):
+            if as_utc(later.start_time) - as_utc(earlier.start_time) < duration:
+                later.errors.append(
+                    f"Overlaps row {earlier.number} at venue {venue_id}."
+                )
+
+
+def schedule(rows, duration=None, now=None):
+    """Check ``rows`` and insert them all, or none if any has errors.
+
+    Returns the new show ids; the caller commits. Rows that fail carry their
+    messages in ``row.errors``. ``duration`` defaults to SHOW_DURATION_MINUTES.
+    """
+    if duration is None:
+        duration = timedelta(minutes=current_app.config["SHOW_DURATION_MINUTES"])
+    check_references(rows)
+    check_conflicts(rows, duration)
+    if not rows or any(row.errors for row in rows):
+        return []
+    ids = db.session.scalars(
+        insert(Show).returning(Show.id),
+        [
+            {
+                "artist_id": row.artist_id,
+                "venue_id": row.venue_id,
+                "start_time": as_utc(row.start_time),
+            }
+            for row in rows
+        ],
+    ).all()
+    counters.record_shows(rows, now)
+    feed.add_shows(ids, now)
+    return ids
+
+
+def cache_tags(rows):
+    """Cache tags of every page showing one of the new shows."""
+    tags = {"shows", "venues", "artists"}
+    tags.update(f"venue:{row.venue_id}" for row in rows)
+    tags.update(f"artist:{row.artist_id}" for row in rows)
+    return sorted(tags)
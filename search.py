@@ -0,0 +1,200 @@
+import re
+
+from flask import current_app
+from sqlalchemy import (
+    and_,
+    column,
+    event,
+    func,
+    literal_column,
+    or_,
+    select,
+    table,
+    text,
+)
+
+from models import (
+    ARTIST_SEARCH_DOCUMENT,
+    VENUE_SEARCH_DOCUMENT,
+    Artist,
+    Show,
+    Venue,
+    db,
+)
+from queries import show_tiles
+
+# ----------------------------------------------------------------------------#
+# Search backends.
+#
+# PostgreSQL matches against a trigram GIN index over name, city, state and
+# genres and ranks by name similarity. SQLite uses FTS5 shadow tables kept in
+# sync by triggers. Anything else falls back to a plain ILIKE scan.
+# ----------------------------------------------------------------------------#
+
+
+def escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class SearchBackend(object):
+    """ILIKE search; correct everywhere, but a sequential scan."""
+
+    def __init__(self, limit):
+        self.limit = limit
+
+    def _match(self, model, document, term, limit, filters=()):
+        stmt = select(model.id, model.name).where(*filters)
+        if term:
+            stmt = stmt.where(document.ilike(f"%{escape_like(term)}%", escape="\\"))
+        return db.session.execute(
+            stmt.order_by(model.name, model.id).limit(limit)
+        ).all()
+
+    def venues(self, term, limit=None, filters=()):
+        """Venues matching ``term``, within ``filters`` (see genres.filters)."""
+        return self._match(
+            Venue, VENUE_SEARCH_DOCUMENT, term, limit or self.limit, filters
+        )
+
+    def artists(self, term, limit=None, filters=()):
+        return self._match(
+            Artist, ARTIST_SEARCH_DOCUMENT, term, limit or self.limit, filters
+        )
+
+    def shows(self, term, limit=None, filters=()):
+        """Shows whose artist or venue matches ``term``, within ``filters``
+        (see genres.show_filters).
+
+        Matching artists and venues are resolved through their own indexes
+        first, then shows are fetched by foreign key, instead of joining all
+        three tables and filtering the product.
+        """
+        limit = limit or self.limit
+        venue_ids = [row.id for row in self.venues(term, limit)]
+        artist_ids = [row.id for row in self.artists(term, limit)]
+        if not venue_ids and not artist_ids:
+            return []
+        stmt = (
+            show_tiles()
+            .where(or_(Show.venue_id.in_(venue_ids), Show.artist_id.in_(artist_ids)))
+            .where(*filters)
+            .order_by(Show.start_time.desc(), Show.id)
+            .limit(limit)
+        )
+        return db.session.execute(stmt).all()
+
+    def _starts_with(self, lowered, prefix):
+        # text_pattern_ops lets PostgreSQL serve this from ix_*_name_prefix.
+        return lowered.like(escape_like(prefix) + "%", escape="\\")
+
+    def names(self, model, prefix, limit):
+        """Typeahead: up to ``limit`` rows whose name starts with ``prefix``,
+        case-insensitively, from the lower(name) index."""
+        lowered = func.lower(model.name)
+        stmt = (
+            select(model.id, model.name, model.city, model.state)
+            .where(self._starts_with(lowered, prefix.lower()))
+            .order_by(lowered, model.id)
+            .limit(limit)
+        )
+        return db.session.execute(stmt).all()
+
+
+class PostgresSearch(SearchBackend):
+    """pg_trgm search; ILIKE on the indexed document, ranked by similarity."""
+
+    def _match(self, model, document, term, limit, filters=()):
+        if not term:
+            return super()._match(model, document, term, limit, filters)
+        stmt = (
+            select(model.id, model.name)
+            .where(*filters)
+            .where(document.ilike(f"%{escape_like(term)}%", escape="\\"))
+            .order_by(func.similarity(model.name, term).desc(), model.name, model.id)
+            .limit(limit)
+        )
+        return db.session.execute(stmt).all()
+
+
+class SqliteSearch(SearchBackend):
+    """FTS5 search; every word of ``term`` is matched as a token prefix."""
+
+    def _starts_with(self, lowered, prefix):
+        # SQLite only turns LIKE into an index range on a bare column, so
+        # spell out the range over the (binary-ordered) expression index.
+        return and_(lowered >= prefix, lowered < prefix + "\U0010ffff")
+
+    def _match(self, model, document, term, limit, filters=()):
+        query = fts_query(term)
+        if not query:
+            return super()._match(model, document, term, limit, filters)
+        fts = table(FTS_TABLES[model.__tablename__], column("rowid"))
+        stmt = (
+            select(model.id, model.name)
+            .join(fts, fts.c.rowid == model.id)
+            .where(*filters)
+            .where(literal_column(fts.name).op("MATCH")(query))
+            .order_by(literal_column(f"{fts.name}.rank"), model.id)
+            .limit(limit)
+        )
+        return db.session.execute(stmt).all()
+
+
+def fts_query(term):
+    words = re.findall(r"\w+", term or "")
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def get_search():
+    """The search backend for the current app's database dialect."""
+    backend = current_app.extensions.get("search")
+    if backend is None:
+        dialect = db.engine.dialect.name
+        cls = {"postgresql": PostgresSearch, "sqlite": SqliteSearch}.get(
+            dialect, SearchBackend
+        )
+        backend = cls(current_app.config["SEARCH_RESULT_LIMIT"])
+        current_app.extensions["search"] = backend
+    return backend
+
+
+# ----------------------------------------------------------------------------#
+# SQLite FTS5 tables.
+# ----------------------------------------------------------------------------#
+
+FTS_TABLES = {"Venue": "venue_search", "Artist": "artist_search"}
+FTS_COLUMNS = ("name", "city", "state", "genres")
+
+
+def sqlite_fts_ddl():
+    """DDL for external-content FTS5 tables over Venue and Artist."""
+    cols = ", ".join(FTS_COLUMNS)
+    new = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+    old = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+    statements = []
+    for source, fts in FTS_TABLES.items():
+        delete = (
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) "
+            f"VALUES ('delete', old.id, {old});"
+        )
+        insert = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});"
+        statements += [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{cols}, content='{source}', content_rowid='id')",
+            f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON "{source}" '
+            f"BEGIN {insert} END",
+            f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON "{source}" '
+            f"BEGIN {delete} END",
+            f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON "{source}" '
+            f"BEGIN {delete} {insert} END",
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ]
+    return statements
+
+
+@event.listens_for(db.metadata, "after_create")
+def install_sqlite_fts(target, connection, **kw):
+    # Lets db.create_all() produce a searchable SQLite database for local runs.
+    if connection.dialect.name == "sqlite":
+        for statement in sqlite_fts_ddl():
+            connection.execute(text(statement))
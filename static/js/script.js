@@ -2,3 +2,77 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Name pickers: <input data-typeahead="/api/v1/typeahead/artists"
+// data-target="artist_id" list="..."> suggests names as the user types and
+// copies the chosen one's id into the target field.
+(function () {
+  var DELAY_MS = 150;
+
+  function label(row) {
+    return row.name + ' (' + [row.city, row.state].filter(Boolean).join(', ') + ')';
+  }
+
+  function attach(input) {
+    var list = document.getElementById(input.getAttribute('list'));
+    var target = document.getElementById(input.getAttribute('data-target'));
+    var ids = {};
+    var timer = null;
+    var latest = 0;
+
+    input.addEventListener('input', function () {
+      if (ids.hasOwnProperty(input.value)) {
+        target.value = ids[input.value];
+        return;
+      }
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        var request = ++latest;
+        var url = input.getAttribute('data-typeahead') + '?q=' + encodeURIComponent(input.value);
+        fetch(url).then(function (response) {
+          return response.json();
+        }).then(function (payload) {
+          if (request !== latest) {
+            return;  // A later keystroke's answer is (or will be) shown.
+          }
+          ids = {};
+          list.innerHTML = '';
+          payload.data.forEach(function (row) {
+            var option = document.createElement('option');
+            option.value = label(row);
+            ids[option.value] = row.id;
+            list.appendChild(option);
+          });
+        });
+      }, DELAY_MS);
+    });
+  }
+
+  document.querySelectorAll('input[data-typeahead]').forEach(attach);
+})();
+
+// "Use my location" on /venues/near: fills the form's hidden lat/lng from
+// the browser and submits. Picking a city or state clears them again, since
+// coordinates win over a place name.
+(function () {
+  document.querySelectorAll('form[data-geolocate]').forEach(function (form) {
+    var button = form.querySelector('[data-geolocate-button]');
+    if (!navigator.geolocation) {
+      button.style.display = 'none';
+      return;
+    }
+    button.addEventListener('click', function () {
+      navigator.geolocation.getCurrentPosition(function (position) {
+        form.elements.lat.value = position.coords.latitude.toFixed(5);
+        form.elements.lng.value = position.coords.longitude.toFixed(5);
+        form.submit();
+      });
+    });
+    ['city', 'state'].forEach(function (name) {
+      form.elements[name].addEventListener('change', function () {
+        form.elements.lat.value = '';
+        form.elements.lng.value = '';
+      });
+    });
+  });
+})();
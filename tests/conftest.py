@@ -0,0 +1,145 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import event
+
+# ----------------------------------------------------------------------------#
+# Test setup.
+#
+# config.py reads the environment when app.py is imported, so it is set
+# here first: every test runs against a fresh SQLite file in a temporary
+# directory, with form CSRF off and a per-process page cache that is
+# emptied between tests.
+# ----------------------------------------------------------------------------#
+
+TMP_DIR = tempfile.mkdtemp(prefix="fyyur-tests-")
+
+os.environ.update(
+    {
+        "DATABASE_URL": "sqlite:///" + os.path.join(TMP_DIR, "fyyur.db"),
+        "DATABASE_REPLICA_URLS": "",
+        "FYYUR_CSRF_ENABLED": "0",
+        "FYYUR_CACHE_TYPE": "lru",
+        "FYYUR_CACHE_DIR": os.path.join(TMP_DIR, "cache"),
+        "FYYUR_JINJA_CACHE_DIR": "",
+        "FYYUR_ASSETS_DIR": os.path.join(TMP_DIR, "assets"),
+        "SLOW_QUERY_MS": "0",
+        "SERVER_TIMING": "0",
+    }
+)
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import app
+
+    app.config["TESTING"] = True
+    yield app
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db(app):
+    """An empty database and page cache, inside an app context."""
+    from cache import cache
+    from models import db
+
+    with app.app_context():
+        db.create_all()
+        cache.backend.clear()
+        yield db
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+class StatementCounter(object):
+    """The SQL statements run on an engine while it is listening."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "before_cursor_execute", self)
+
+    def __len__(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def queries(db):
+    """``with queries as counted: ...`` then ``len(counted)``."""
+    return StatementCounter(db.engine)
+
+
+class Seed(object):
+    """Creates rows directly, then brings the counters and the feed up to
+    date in ``done``, as `flask data import` does."""
+
+    def __init__(self, db):
+        self.db = db
+        self.made = 0
+
+    def _add(self, row):
+        self.db.session.add(row)
+        self.db.session.flush()
+        self.made += 1
+        return row
+
+    def venue(self, **fields):
+        from models import Venue
+
+        fields.setdefault("name", f"Venue {self.made}")
+        fields.setdefault("city", "San Francisco")
+        fields.setdefault("state", "CA")
+        fields.setdefault("address", "1 Main St")
+        fields.setdefault("phone", "415-555-0100")
+        fields.setdefault("genres", ["Jazz"])
+        return self._add(Venue(**fields))
+
+    def artist(self, **fields):
+        from models import Artist
+
+        fields.setdefault("name", f"Artist {self.made}")
+        fields.setdefault("city", "San Francisco")
+        fields.setdefault("state", "CA")
+        fields.setdefault("phone", "415-555-0101")
+        fields.setdefault("genres", ["Jazz"])
+        return self._add(Artist(**fields))
+
+    def show(self, venue, artist, days=1):
+        """A show ``days`` from now (negative for a past one)."""
+        from models import Show, utcnow
+
+        start_time = utcnow() + timedelta(days=days)
+        return self._add(Show(venue=venue, artist=artist, start_time=start_time))
+
+    def done(self):
+        import counters
+        import feed
+
+        self.db.session.commit()
+        counters.refresh_all()
+        feed.rebuild()
+        self.db.session.commit()
+
+
+@pytest.fixture
+def seed(db):
+    return Seed(db)
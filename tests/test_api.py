@@ -0,0 +1,58 @@
+import json
+
+import api
+
+
+def test_detail_payloads(client, seed):
+    venue = seed.venue(name="Hall")
+    artist = seed.artist(name="Act")
+    seed.show(venue, artist, days=-1)
+    seed.show(venue, artist, days=1)
+    seed.done()
+    body = client.get(f"/api/v1/venues/{venue.id}").get_json()
+    assert body["name"] == "Hall"
+    assert (body["past_shows_count"], body["upcoming_shows_count"]) == (1, 1)
+    assert body["upcoming_shows"][0]["artist_name"] == "Act"
+    # Datetimes are ISO 8601 strings.
+    assert body["upcoming_shows"][0]["start_time"][:4].isdigit()
+
+    body = client.get(f"/api/v1/artists/{artist.id}").get_json()
+    assert body["past_shows"][0]["venue_name"] == "Hall"
+
+
+def test_unknown_ids_are_json_404s(client):
+    for path in ("/api/v1/venues/404", "/api/v1/artists/404"):
+        response = client.get(path)
+        assert response.status_code == 404
+        assert response.get_json() == {"error": "not found"}
+
+
+def test_collections_stream_as_ndjson_in_batches(client, seed, monkeypatch):
+    monkeypatch.setattr(api, "STREAM_BATCH_SIZE", 2)
+    for i in range(5):
+        seed.artist(name=f"Artist {i}")
+    seed.done()
+    for kwargs in (
+        {"path": "/api/v1/artists?stream=1"},
+        {"path": "/api/v1/artists", "headers": {"Accept": api.NDJSON}},
+    ):
+        response = client.get(**kwargs)
+        assert response.mimetype == api.NDJSON
+        assert response.is_streamed
+        chunks = list(response.response)
+        assert len(chunks) == 3
+        rows = [json.loads(line) for line in b"".join(chunks).splitlines()]
+        assert [row["name"] for row in rows] == [f"Artist {i}" for i in range(5)]
+
+
+def test_json_is_preferred_unless_ndjson_is_asked_for(client, seed):
+    seed.artist()
+    seed.done()
+    for accept in (
+        "*/*",
+        "text/html,*/*;q=0.8",
+        f"application/json,{api.NDJSON};q=0.5",
+    ):
+        response = client.get("/api/v1/artists", headers={"Accept": accept})
+        assert response.mimetype == "application/json", accept
+        assert set(response.get_json()) == {"data", "next_cursor", "prev_cursor"}
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from cache import cache
+
+
+@pytest.fixture
+def asgi(db):
+    """``asgi(*requests)``: runs (method, path, headers) requests through the
+    ASGI app on one event loop and returns (status, headers, body) for each."""
+    import asgi
+
+    async def call(method, path, headers=()):
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"localhost")]
+            + [(k.lower().encode(), v.encode()) for k, v in headers],
+            "client": ("127.0.0.1", 1234),
+            "server": ("localhost", 80),
+        }
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        await asgi.application(scope, receive, send)
+        start = sent[0]
+        headers = {k.decode(): v.decode() for k, v in start["headers"]}
+        body = b"".join(m.get("body", b"") for m in sent[1:])
+        return start["status"], headers, body
+
+    def run(*requests):
+        async def main():
+            try:
+                return [await call(*r) for r in requests]
+            finally:
+                # The pool's connections belong to this loop.
+                await asgi.engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def venue(seed):
+    venue = seed.venue(name="The Fillmore")
+    seed.show(venue, seed.artist(name="Bonobo"), days=3)
+    seed.show(venue, seed.artist(name="Khruangbin"), days=-3)
+    seed.done()
+    return venue
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/venues",
+        "/venues/{id}",
+        "/artists",
+        "/artists/1",
+        "/shows",
+        "/api/v1/venues/{id}",
+    ],
+)
+def test_async_views_render_what_the_flask_views_do(client, asgi, venue, path):
+    path = path.format(id=venue.id)
+    expected = client.get(path)
+    cache.backend.clear()
+    [(status, headers, body)] = asgi(("GET", path))
+    assert status == expected.status_code == 200
+    assert body == expected.data
+    assert headers["content-type"] == expected.headers["Content-Type"]
+
+
+def test_async_detail_pages_answer_304(asgi, venue):
+    [(status, headers, _)] = asgi(("GET", f"/venues/{venue.id}"))
+    [(again, _, body)] = asgi(
+        ("GET", f"/venues/{venue.id}", [("If-None-Match", headers["etag"])])
+    )
+    assert (status, again, body) == (200, 304, b"")
+
+
+def test_missing_rows_are_404(asgi, venue):
+    results = asgi(("GET", "/venues/999"), ("GET", "/api/v1/venues/999"))
+    assert [status for status, _, _ in results] == [404, 404]
+    assert b"not found" in results[1][2]
+
+
+def test_other_routes_fall_through_to_the_wsgi_app(asgi, venue):
+    [(status, _, body), (metrics, _, _)] = asgi(
+        ("GET", "/venues/create"), ("GET", "/metrics")
+    )
+    assert status == 200 and b"<form" in body
+    assert metrics == 200
@@ -0,0 +1,84 @@
+import gzip
+import re
+
+import pytest
+
+import assets
+
+
+@pytest.fixture
+def built(app, tmp_path, monkeypatch):
+    """A fresh build in a temporary ASSETS_DIR; its manifest."""
+    monkeypatch.setitem(app.config, "ASSETS_DIR", str(tmp_path))
+    monkeypatch.setitem(app.extensions, "assets", {"manifest": None, "mtime": None})
+    builder, _ = assets.build(app)
+    return builder.manifest
+
+
+def test_pages_load_the_separate_files_before_a_build(client):
+    page = client.get("/").get_data(as_text=True)
+    assert "/static/css/bootstrap.min.css" in page
+    assert "/assets/" not in page
+
+
+def test_pages_load_the_fingerprinted_bundles_after_a_build(client, built):
+    page = client.get("/").get_data(as_text=True)
+    css = built["files"]["css/app.css"]
+    assert re.fullmatch(r"css/app\.[0-9a-f]{12}\.css", css)
+    assert f"/assets/{css}" in page
+    assert f"/assets/{built['files']['js/app.js']}" in page
+    assert "/static/css/bootstrap.min.css" not in page
+
+
+def test_rebuilding_unchanged_sources_keeps_the_names(app, built):
+    builder, _ = assets.build(app)
+    assert builder.manifest["files"] == built["files"]
+
+
+def test_assets_are_served_precompressed_and_immutable(client, built):
+    path = f"/assets/{built['files']['css/app.css']}"
+    plain = client.get(path)
+    assert plain.status_code == 200
+    assert plain.content_encoding is None
+    assert plain.mimetype == "text/css"
+
+    zipped = client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert zipped.content_encoding == "gzip"
+    assert gzip.decompress(zipped.data) == plain.data
+    for response in (plain, zipped):
+        assert response.cache_control.immutable
+        assert response.cache_control.max_age == 365 * 24 * 3600
+        assert "Accept-Encoding" in response.vary
+
+
+@pytest.mark.skipif(assets.brotli is None, reason="brotli is not installed")
+def test_brotli_is_preferred_when_accepted(client, built):
+    path = f"/assets/{built['files']['js/app.js']}"
+    plain = client.get(path)
+    response = client.get(path, headers={"Accept-Encoding": "gzip, br"})
+    assert response.content_encoding == "br"
+    assert assets.brotli.decompress(response.data) == plain.data
+
+
+def test_manifest_and_paths_outside_the_build_are_not_served(client, built):
+    assert client.get("/assets/manifest.json").status_code == 404
+    assert client.get("/assets/../config.py").status_code == 404
+
+
+def test_minify_css_keeps_strings_and_licences():
+    css = '/*! MIT */\na  :hover {\n  content: "a  /* b */" ;\n}\n/* note */ b > i { }'
+    assert assets.minify_css(css) == '/*! MIT */ a :hover{content:"a  /* b */"}b>i{}'
+
+
+def test_build_refuses_to_skip_missing_packages(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, "ASSETS_DIR", str(tmp_path))
+    monkeypatch.setitem(app.extensions, "assets", {"manifest": None, "mtime": None})
+    monkeypatch.setattr(assets, "jsmin", None)
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["assets", "build"])
+    assert result.exit_code == 1
+    assert "rjsmin" in result.output and "--allow-missing" in result.output
+
+    result = runner.invoke(args=["assets", "build", "--allow-missing"])
+    assert result.exit_code == 0
+    assert "rjsmin is not installed; scripts were not minified." in result.output
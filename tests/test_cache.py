@@ -0,0 +1,72 @@
+from cache import LRUCache, PageCache, cache
+from models import Venue
+
+
+def edit_form(venue, **changes):
+    data = {
+        "name": venue.name,
+        "city": venue.city,
+        "state": venue.state,
+        "address": venue.address,
+        "phone": venue.phone,
+        "genres": venue.genres,
+        "facebook_link": "https://www.facebook.com/venue",
+    }
+    data.update(changes)
+    return data
+
+
+def test_page_is_served_from_cache_until_its_tag_is_invalidated(client, seed, db):
+    venue = seed.venue(name="Old Name")
+    seed.done()
+    assert "Old Name" in client.get(f"/venues/{venue.id}").get_data(as_text=True)
+
+    # Behind the cache's back: the cached page still has the old name.
+    db.session.get(Venue, venue.id).name = "New Name"
+    db.session.commit()
+    assert "Old Name" in client.get(f"/venues/{venue.id}").get_data(as_text=True)
+
+    cache.invalidate(f"venue:{venue.id}")
+    assert "New Name" in client.get(f"/venues/{venue.id}").get_data(as_text=True)
+
+
+def test_editing_a_venue_refreshes_every_page_that_shows_it(app, client, seed):
+    venue = seed.venue(name="Old Name")
+    artist = seed.artist()
+    seed.show(venue, artist, days=3)
+    seed.done()
+    pages = ["/venues", f"/venues/{venue.id}", f"/artists/{artist.id}", "/shows"]
+    for path in pages:
+        assert "Old Name" in client.get(path).get_data(as_text=True)
+
+    response = client.post(
+        f"/venues/{venue.id}/edit",
+        data=edit_form(venue, name="New Name"),
+        follow_redirects=True,
+    )
+    assert response.status_code == 200
+
+    for path in pages:
+        body = app.test_client().get(path).get_data(as_text=True)
+        assert "New Name" in body and "Old Name" not in body, path
+
+
+def test_entry_rendered_across_an_invalidation_is_stale():
+    pages = PageCache()
+    pages.backend = LRUCache(16)
+    versions = pages.snapshot(["venue:1"])
+    pages.invalidate("venue:1")
+    pages.set("page:/venues/1", "rendered before the edit", versions=versions)
+    assert pages.get("page:/venues/1") is None
+
+    pages.set("page:/venues/1", "rendered after the edit", tags=["venue:1"])
+    assert pages.get("page:/venues/1") == "rendered after the edit"
+
+
+def test_pending_flash_bypasses_the_cache(client, seed):
+    venue = seed.venue()
+    seed.done()
+    client.get(f"/venues/{venue.id}")
+    with client.session_transaction() as session:
+        session["_flashes"] = [("message", "Saved")]
+    assert "Saved" in client.get(f"/venues/{venue.id}").get_data(as_text=True)
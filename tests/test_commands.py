@@ -0,0 +1,97 @@
+import json
+
+from sqlalchemy import func, select
+
+import commands
+from models import Artist, ImportCheckpoint, Venue
+
+
+def write_artists(path, count):
+    with open(path, "w") as f:
+        for i in range(count):
+            f.write(json.dumps({"name": f"Artist {i}", "genres": ["Jazz"]}) + "\n")
+
+
+def artist_names(db):
+    return db.session.scalars(select(Artist.name).order_by(Artist.name)).all()
+
+
+def test_export_then_import_round_trips(app, db, seed, tmp_path):
+    for i in range(3):
+        seed.venue(name=f"Venue {i}", genres=["Folk", "Jazz"])
+    seed.done()
+    path = str(tmp_path / "venues.csv")
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["data", "export", "venues", path])
+    assert result.exit_code == 0, result.output
+
+    db.drop_all()
+    db.create_all()
+    result = runner.invoke(args=["data", "import", "venues", path])
+    assert result.exit_code == 0, result.output
+    assert "Imported 3 venues" in result.output
+    rows = db.session.execute(select(Venue.name, Venue.genres).order_by(Venue.id))
+    assert [tuple(row) for row in rows] == [
+        (f"Venue {i}", ["Folk", "Jazz"]) for i in range(3)
+    ]
+
+
+def test_interrupted_import_resumes_after_the_last_committed_batch(
+    app, db, tmp_path, monkeypatch
+):
+    path = str(tmp_path / "artists.jsonl")
+    write_artists(path, 5)
+    insert_batch = commands.insert_batch
+    calls = []
+
+    def crash_on_third_batch(*args):
+        calls.append(args)
+        if len(calls) == 3:
+            raise RuntimeError("connection lost")
+        insert_batch(*args)
+
+    monkeypatch.setattr(commands, "insert_batch", crash_on_third_batch)
+    runner = app.test_cli_runner()
+    args = ["data", "import", "artists", path, "--batch-size", "2"]
+    result = runner.invoke(args=args)
+    assert isinstance(result.exception, RuntimeError)
+    db.session.rollback()
+    # Two batches committed, each with its checkpoint.
+    assert len(artist_names(db)) == 4
+    assert db.session.scalars(select(ImportCheckpoint.position)).all() == [4]
+
+    monkeypatch.setattr(commands, "insert_batch", insert_batch)
+    result = runner.invoke(args=args)
+    assert result.exit_code == 0, result.output
+    assert "Resuming after 4 records" in result.output
+    assert artist_names(db) == [f"Artist {i}" for i in range(5)]
+    assert db.session.scalar(select(func.count()).select_from(ImportCheckpoint)) == 0
+
+
+def test_from_text_coerces_csv_cells_and_passes_json_values_through():
+    columns = Artist.__table__.c
+    assert commands.from_text(columns.genres, '["Jazz"]') == ["Jazz"]
+    assert commands.from_text(columns.genres, ["Jazz"]) == ["Jazz"]
+    assert commands.from_text(columns.seeking_venue, "yes") is True
+    assert commands.from_text(columns.city, "") is None
+
+
+def test_import_refreshes_the_cached_pages_of_touched_rows(app, client, seed, tmp_path):
+    venue, artist = seed.venue(), seed.artist(name="Imported Act")
+    seed.done()
+    ids = {"venue_id": venue.id, "artist_id": artist.id}
+    page = client.get(f"/venues/{venue.id}").get_data(as_text=True)
+    assert "0 Upcoming Shows" in page
+
+    path = tmp_path / "shows.jsonl"
+    path.write_text(json.dumps(dict(ids, start_time="2035-05-21T21:30:00")) + "\n")
+    result = app.test_cli_runner().invoke(args=["data", "import", "shows", str(path)])
+    assert result.exit_code == 0, result.output
+    page = client.get(f"/venues/{venue.id}").get_data(as_text=True)
+    assert "1 Upcoming Show" in page and "Imported Act" in page
+
+
+def test_detail_tags():
+    rows = [{"id": 3, "venue_id": 1, "artist_id": 2}, {"venue_id": 1, "artist_id": 5}]
+    assert commands.detail_tags("shows", rows) == {"venue:1", "artist:2", "artist:5"}
+    assert commands.detail_tags("venues", rows) == {"venue:3"}
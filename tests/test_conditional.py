@@ -0,0 +1,78 @@
+from models import Artist
+
+
+def test_matching_etag_gets_304_without_rendering(client, seed, queries):
+    venue = seed.venue()
+    seed.show(venue, seed.artist(), days=2)
+    seed.done()
+    first = client.get(f"/venues/{venue.id}")
+    assert first.status_code == 200
+    assert first.headers["ETag"] and first.headers["Last-Modified"]
+    assert "no-cache" in first.headers["Cache-Control"]
+
+    with queries as counted:
+        again = client.get(
+            f"/venues/{venue.id}", headers={"If-None-Match": first.headers["ETag"]}
+        )
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+    # The freshness lookup only; the shows are never loaded.
+    assert len(counted) == 1
+
+
+def test_last_modified_validates_too(client, seed):
+    artist = seed.artist()
+    seed.show(seed.venue(), artist, days=-2)
+    seed.done()
+    first = client.get(f"/artists/{artist.id}")
+    again = client.get(
+        f"/artists/{artist.id}",
+        headers={"If-Modified-Since": first.headers["Last-Modified"]},
+    )
+    assert again.status_code == 304
+
+
+def test_editing_a_performing_artist_changes_the_venue_etag(client, seed, db):
+    venue = seed.venue()
+    artist = seed.artist(name="Old Name")
+    seed.show(venue, artist, days=2)
+    seed.done()
+    etag = client.get(f"/venues/{venue.id}").headers["ETag"]
+
+    db.session.get(Artist, artist.id).name = "New Name"
+    db.session.commit()
+    response = client.get(f"/venues/{venue.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_a_show_that_has_started_changes_the_etag(client, seed):
+    venue = seed.venue()
+    artist = seed.artist()
+    seed.done()
+    etag = client.get(f"/venues/{venue.id}").headers["ETag"]
+    seed.show(venue, artist, days=-1)
+    seed.done()
+    response = client.get(f"/venues/{venue.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_missing_venue_is_404(client):
+    assert client.get("/venues/404").status_code == 404
+
+
+def test_the_etag_differs_per_timezone(client, seed):
+    venue = seed.venue()
+    seed.show(venue, seed.artist(), days=2)
+    seed.done()
+    first = client.get(f"/venues/{venue.id}")
+    assert "Cookie" in first.headers["Vary"]
+
+    client.set_cookie("localhost", "tz", "Asia/Tokyo")
+    response = client.get(
+        f"/venues/{venue.id}", headers={"If-None-Match": first.headers["ETag"]}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != first.headers["ETag"]
+    assert response.data != first.data
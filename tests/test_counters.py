@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from sqlalchemy import update
+
+import counters
+from conditional import as_utc
+from models import Artist, Venue
+
+
+def counts(db, model, row_id):
+    row = db.session.get(model, row_id)
+    db.session.refresh(row)
+    return row.upcoming_shows_count, row.past_shows_count, as_utc(row.next_show_time)
+
+
+def test_creating_a_show_counts_it_on_its_venue_and_artist(client, seed, db):
+    venue, artist = seed.venue(), seed.artist()
+    seed.done()
+    response = client.post(
+        "/shows/create",
+        data={
+            "artist_id": artist.id,
+            "venue_id": venue.id,
+            "start_time": "2035-01-01 20:00:00",
+        },
+    )
+    assert response.status_code == 200
+    for model, row_id in ((Venue, venue.id), (Artist, artist.id)):
+        upcoming, past, next_show_time = counts(db, model, row_id)
+        assert (upcoming, past) == (1, 0)
+        assert next_show_time.year == 2035
+    assert not list(counters.drift(Venue)) and not list(counters.drift(Artist))
+
+
+def test_record_shows_increments_per_parent(seed, db):
+    venue, artist = seed.venue(), seed.artist()
+    seed.done()
+    shows = [
+        seed.show(venue, artist, days=-3),
+        seed.show(venue, artist, days=5),
+        seed.show(venue, artist, days=2),
+    ]
+    counters.record_shows(shows)
+    db.session.commit()
+    upcoming, past, next_show_time = counts(db, Venue, venue.id)
+    assert (upcoming, past) == (2, 1)
+    assert next_show_time == as_utc(shows[2].start_time)
+    assert not list(counters.drift(Venue)) and not list(counters.drift(Artist))
+
+
+def test_roll_forward_moves_started_shows_to_past(seed, db):
+    venue, artist = seed.venue(), seed.artist()
+    soon = seed.show(venue, artist, days=1)
+    seed.show(venue, artist, days=10)
+    seed.done()
+    later = as_utc(soon.start_time) + timedelta(minutes=1)
+    assert counters.roll_forward(later) == 2
+    db.session.commit()
+    upcoming, past, _ = counts(db, Artist, artist.id)
+    assert (upcoming, past) == (1, 1)
+    # Nothing is due again until the next show starts.
+    assert counters.roll_forward(later) == 0
+
+
+def test_verify_reports_and_fixes_drift(app, seed, db):
+    venue = seed.venue()
+    seed.show(venue, seed.artist(), days=1)
+    seed.done()
+    db.session.execute(
+        update(Venue).where(Venue.id == venue.id).values(upcoming_shows_count=7)
+    )
+    db.session.commit()
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["counters", "verify"])
+    assert result.exit_code == 1
+    assert f"Venue {venue.id}: (7," in result.output
+    result = runner.invoke(args=["counters", "verify", "--fix"])
+    assert "1 rows drifted, fixed" in result.output
+    assert runner.invoke(args=["counters", "verify"]).exit_code == 0
+    assert counts(db, Venue, venue.id)[0] == 1
+
+
+def test_listing_reads_the_stored_counter(client, seed, db):
+    venue = seed.venue()
+    seed.show(venue, seed.artist(), days=1)
+    seed.done()
+    db.session.execute(
+        update(Venue).where(Venue.id == venue.id).values(upcoming_shows_count=42)
+    )
+    db.session.commit()
+    # The stored counter is served, not a recount of Show.
+    (row,) = client.get("/api/v1/venues").get_json()["data"]
+    assert row["num_upcoming_shows"] == 42
@@ -0,0 +1,88 @@
+from sqlalchemy import func, select
+
+import counters
+import deletion
+from models import Artist, Job, Show, Venue
+
+
+def rows(db, model, **options):
+    stmt = select(func.count()).select_from(model)
+    return db.session.scalar(stmt.execution_options(**options))
+
+
+def test_deleted_venue_disappears_from_every_page(app, client, seed):
+    venue = seed.venue(name="Gone Hall")
+    artist = seed.artist()
+    seed.show(venue, artist, days=-2)
+    seed.show(venue, artist, days=2)
+    seed.done()
+    pages = ["/venues", "/shows", f"/artists/{artist.id}", "/api/v1/venues"]
+    for path in pages:
+        assert "Gone Hall" in client.get(path).get_data(as_text=True)
+
+    assert client.get(f"/venues/delete/{venue.id}").status_code == 302
+
+    fresh = app.test_client()
+    for path in pages:
+        assert "Gone Hall" not in fresh.get(path).get_data(as_text=True), path
+    assert fresh.get(f"/venues/{venue.id}").status_code == 404
+
+
+def test_soft_delete_recounts_and_revalidates_its_artists(client, seed, db):
+    venue, other = seed.venue(), seed.venue()
+    artist = seed.artist()
+    for days in (-2, 2, 3):
+        seed.show(venue, artist, days=days)
+    seed.show(other, artist, days=4)
+    seed.done()
+    etag = client.get(f"/artists/{artist.id}").headers["ETag"]
+
+    client.get(f"/venues/delete/{venue.id}")
+    db.session.expire_all()
+    artist = db.session.get(Artist, artist.id)
+    assert (artist.upcoming_shows_count, artist.past_shows_count) == (1, 0)
+    assert not list(counters.drift(Artist))
+    response = client.get(f"/artists/{artist.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_delete_queues_one_purge_and_keeps_the_rows_until_it_runs(client, seed, db):
+    venue = seed.venue()
+    seed.show(venue, seed.artist(), days=2)
+    seed.done()
+    client.get(f"/venues/delete/{venue.id}")
+    client.get(f"/venues/delete/{venue.id}")
+    assert db.session.scalars(select(Job.name)).all() == ["venues.purge"]
+    assert rows(db, Venue) == 0
+    assert rows(db, Venue, include_deleted=True) == 1
+    assert rows(db, Show) == 1
+
+
+def test_purge_deletes_the_shows_in_batches_and_then_the_venue(seed, db):
+    venue = seed.venue()
+    for days in range(1, 6):
+        seed.show(venue, seed.artist(), days=days)
+    seed.done()
+    venue_id = venue.id
+    assert deletion.soft_delete_venue(venue_id)
+    db.session.commit()
+    assert deletion.purge_venue(venue_id, batch_size=2) == 5
+    assert rows(db, Show) == 0
+    assert rows(db, Venue, include_deleted=True) == 0
+    # Running it again (a retried job) is harmless.
+    assert deletion.purge_venue(venue_id, batch_size=2) == 0
+
+
+def test_purge_command_purges_every_deleted_venue(app, seed, db):
+    venues = [seed.venue() for _ in range(2)]
+    seed.done()
+    for venue in venues:
+        deletion.soft_delete_venue(venue.id)
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=["venues", "purge"])
+    assert "Purged 2 venues" in result.output
+    assert rows(db, Venue, include_deleted=True) == 0
+
+
+def test_deleting_an_unknown_venue_is_404(client):
+    assert client.get("/venues/delete/404").status_code == 404
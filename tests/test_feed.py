@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from sqlalchemy import select
+
+import feed
+import queries
+from conditional import as_utc
+from models import Artist, UpcomingShow, utcnow
+
+
+def feed_rows(db):
+    return db.session.execute(
+        select(UpcomingShow.artist_name, UpcomingShow.venue_name).order_by(
+            UpcomingShow.start_time
+        )
+    ).all()
+
+
+def test_feed_holds_only_upcoming_shows_with_their_names(seed, db):
+    venue = seed.venue(name="Hall")
+    artist = seed.artist(name="Act")
+    seed.show(venue, artist, days=-1)
+    seed.show(venue, artist, days=1)
+    seed.done()
+    assert feed_rows(db) == [("Act", "Hall")]
+
+
+def test_new_show_is_added_and_listed(client, seed, db):
+    venue, artist = seed.venue(name="Hall"), seed.artist(name="Act")
+    seed.done()
+    client.post(
+        "/shows/create",
+        data={
+            "artist_id": artist.id,
+            "venue_id": venue.id,
+            "start_time": "2035-01-01 20:00:00",
+        },
+    )
+    assert feed_rows(db) == [("Act", "Hall")]
+    assert "Act" in client.get("/shows").get_data(as_text=True)
+
+
+def test_editing_an_artist_rewrites_the_copied_name(seed, db):
+    artist = seed.artist(name="Old Name")
+    seed.show(seed.venue(name="Hall"), artist, days=1)
+    seed.done()
+    artist = db.session.get(Artist, artist.id)
+    artist.name = "New Name"
+    assert feed.rename(artist) == 1
+    db.session.commit()
+    assert feed_rows(db) == [("New Name", "Hall")]
+
+
+def test_listing_skips_started_shows_until_roll_off_drops_them(
+    client, seed, db, monkeypatch
+):
+    venue = seed.venue(name="Hall")
+    soon = seed.show(venue, seed.artist(name="Soon Act"), days=1)
+    seed.show(venue, seed.artist(name="Later Act"), days=5)
+    seed.done()
+    later = as_utc(soon.start_time) + timedelta(minutes=1)
+
+    monkeypatch.setattr(queries, "utcnow", lambda: later)
+    body = client.get("/shows").get_data(as_text=True)
+    assert "Later Act" in body and "Soon Act" not in body
+
+    assert feed.roll_off(later) == 1
+    db.session.commit()
+    assert feed_rows(db) == [("Later Act", "Hall")]
+    assert feed.roll_off(later) == 0
+
+
+def test_rebuild_refills_the_feed(seed, db):
+    venue, artist = seed.venue(), seed.artist()
+    for days in (1, 2, 3):
+        seed.show(venue, artist, days=days)
+    seed.done()
+    db.session.execute(UpcomingShow.__table__.delete())
+    assert feed.rebuild(utcnow()) == 3
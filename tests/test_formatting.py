@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+
+from formatting import DateTimeFormatter
+
+SHOW = datetime(2035, 5, 21, 21, 30, tzinfo=timezone.utc)
+
+
+def test_formats_match_the_original_filter():
+    formatter = DateTimeFormatter()
+    assert formatter(SHOW, "full") == "Monday May, 21, 2035 at 9:30PM"
+    assert formatter(SHOW) == "Mon 05, 21, 2035 9:30PM"
+
+
+def test_iso_strings_and_naive_values_are_utc():
+    formatter = DateTimeFormatter()
+    assert formatter("2035-05-21T21:30:00") == formatter(SHOW)
+    assert formatter(SHOW.replace(tzinfo=None)) == formatter(SHOW)
+    assert formatter(None) == formatter("") == ""
+
+
+def test_timezone_and_locale():
+    formatter = DateTimeFormatter()
+    assert formatter(SHOW, "full", tzname="America/New_York").endswith("5:30PM")
+    assert formatter(SHOW, "full", locale="fr") == "lundi mai, 21, 2035 at 9:30PM"
+
+
+def test_repeated_values_are_formatted_once():
+    formatter = DateTimeFormatter(cache_size=8)
+    for _ in range(3):
+        formatter(SHOW, "full")
+    info = formatter.cache_info()
+    assert (info.hits, info.misses) == (2, 1)
+
+
+def test_pages_use_the_tz_cookie(app, client, seed):
+    venue = seed.venue()
+    seed.show(venue, seed.artist(), days=1)
+    seed.done()
+    utc = client.get(f"/venues/{venue.id}").get_data(as_text=True)
+    other = app.test_client()
+    other.set_cookie("localhost", "tz", "Asia/Tokyo")
+    tokyo = other.get(f"/venues/{venue.id}").get_data(as_text=True)
+    # Different renderings, each cached under its own key.
+    assert utc != tokyo
+    other.set_cookie("localhost", "tz", "Not/AZone")
+    assert other.get(f"/venues/{venue.id}").get_data(as_text=True) == utc
@@ -0,0 +1,74 @@
+import pytest
+
+from forms import VenueForm, is_valid_phone
+
+
+@pytest.mark.parametrize(
+    "number", ["4155550100", "415.555.0100", "415-555-0100", "(415) 555 0100"]
+)
+def test_valid_phone(number):
+    assert is_valid_phone(number)
+
+
+@pytest.mark.parametrize("number", ["", None, "555-0100", "415-555-01000"])
+def test_invalid_phone(number):
+    assert not is_valid_phone(number)
+
+
+def test_venue_form_rejects_a_bad_phone(app, db):
+    data = {
+        "name": "The Chapel",
+        "city": "San Francisco",
+        "state": "CA",
+        "address": "777 Valencia St",
+        "phone": "not a phone",
+        "genres": ["Jazz"],
+        "facebook_link": "https://www.facebook.com/thechapel",
+    }
+    with app.test_request_context(method="POST", data=data):
+        form = VenueForm()
+        assert not form.validate()
+        assert form.phone.errors == ["Invalid phone."]
+    data["phone"] = "415-555-0100"
+    with app.test_request_context(method="POST", data=data):
+        assert VenueForm().validate()
+
+
+def names(client, kind, q):
+    response = client.get(f"/api/v1/typeahead/{kind}", query_string={"q": q})
+    assert response.status_code == 200
+    return [row["name"] for row in response.get_json()["data"]]
+
+
+def test_typeahead_matches_name_prefixes(client, seed):
+    for name in ("Blue Note", "blues bar", "Bluebird", "Red Room", "100% Blue"):
+        seed.venue(name=name)
+    seed.artist(name="Blue Man")
+    seed.done()
+    assert names(client, "venues", "blue") == ["Blue Note", "Bluebird", "blues bar"]
+    assert names(client, "venues", "BLUES") == ["blues bar"]
+    assert names(client, "artists", "blu") == ["Blue Man"]
+    # LIKE wildcards are matched literally.
+    assert names(client, "venues", "100%") == ["100% Blue"]
+    assert names(client, "venues", "1_0") == []
+
+
+def test_typeahead_needs_a_minimum_prefix_and_stops_at_the_limit(
+    app, client, seed, monkeypatch
+):
+    for i in range(5):
+        seed.venue(name=f"Club {i}")
+    seed.done()
+    assert names(client, "venues", "C") == []
+    monkeypatch.setitem(app.config, "TYPEAHEAD_LIMIT", 3)
+    assert names(client, "venues", "club") == ["Club 0", "Club 1", "Club 2"]
+
+
+def test_typeahead_rows_carry_id_and_place(client, seed):
+    venue = seed.venue(name="Bottom of the Hill", city="Oakland")
+    seed.done()
+    response = client.get("/api/v1/typeahead/venues?q=bot")
+    assert response.get_json()["data"] == [
+        {"id": venue.id, "name": "Bottom of the Hill", "city": "Oakland", "state": "CA"}
+    ]
+    assert client.get("/api/v1/typeahead/shows?q=bot").status_code == 404
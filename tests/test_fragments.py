@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+import queries
+from cache import cache
+from models import utcnow
+
+
+def drop_pages():
+    """What a page entry expiring looks like; fragments stay."""
+    for key in list(cache.backend._data):
+        if key.startswith("page:"):
+            cache.backend.delete(key)
+
+
+def stats():
+    return {kind: dict(counts) for kind, counts in cache.counts.items()}
+
+
+def delta(before, after, kind):
+    return {stat: after[kind][stat] - before[kind][stat] for stat in before[kind]}
+
+
+def test_past_shows_fragment_outlives_its_page(client, seed):
+    venue = seed.venue()
+    seed.show(venue, seed.artist(name="Past Act"), days=-1)
+    seed.done()
+    before = stats()
+    client.get(f"/venues/{venue.id}")
+    drop_pages()
+    body = client.get(f"/venues/{venue.id}").get_data(as_text=True)
+    assert "Past Act" in body
+    after = stats()
+    assert delta(before, after, "fragments") == {"hits": 1, "misses": 1, "stores": 1}
+    assert delta(before, after, "pages") == {"hits": 0, "misses": 2, "stores": 2}
+
+
+def test_show_rolling_into_the_past_renders_a_new_fragment(client, seed, monkeypatch):
+    venue = seed.venue()
+    seed.show(venue, seed.artist(name="Past Act"), days=-1)
+    seed.show(venue, seed.artist(name="Soon Act"), days=1)
+    seed.done()
+    client.get(f"/venues/{venue.id}")
+
+    later = utcnow() + timedelta(days=2)
+    monkeypatch.setattr(queries, "utcnow", lambda: later)
+    drop_pages()
+    body = client.get(f"/venues/{venue.id}").get_data(as_text=True)
+    past = body[body.index("2 Past Shows") :]
+    assert "Past Act" in past and "Soon Act" in past
+
+
+def test_shows_listing_is_not_fragment_cached(client, seed):
+    seed.show(seed.venue(), seed.artist(), days=1)
+    seed.done()
+    before = stats()
+    client.get("/shows")
+    assert delta(before, stats(), "fragments") == {"hits": 0, "misses": 0, "stores": 0}
+
+
+def test_stats_report_pages_and_fragments_apart(client):
+    body = client.get("/cache/stats").get_json()
+    assert (
+        set(body["pages"])
+        == set(body["fragments"])
+        == {
+            "hits",
+            "misses",
+            "stores",
+            "hit_ratio",
+        }
+    )
@@ -0,0 +1,64 @@
+from models import Venue
+
+
+def names(response):
+    return sorted(row["name"] for row in response.get_json()["data"])
+
+
+def test_listings_filter_by_genre_and_state(client, seed):
+    seed.venue(name="Jazz CA", genres=["Jazz"], state="CA")
+    seed.venue(name="Jazz NY", genres=["Jazz", "Folk"], state="NY")
+    seed.venue(name="Folk CA", genres=["Folk"], state="CA")
+    seed.done()
+    assert names(client.get("/api/v1/venues?genre=Jazz")) == ["Jazz CA", "Jazz NY"]
+    assert names(client.get("/api/v1/venues?genre=Jazz&state=CA")) == ["Jazz CA"]
+    assert names(client.get("/api/v1/venues?genre=Punk")) == []
+    page = client.get("/venues?genre=Folk").get_data(as_text=True)
+    assert "Folk CA" in page and "Jazz NY" in page and "Jazz CA" not in page
+
+
+def test_editing_genres_relinks_and_recounts(client, seed, db):
+    venue = seed.venue(name="Hall", genres=["Jazz"])
+    seed.artist(genres=["Jazz"])
+    seed.done()
+    counts = {
+        row["name"]: row for row in client.get("/api/v1/genres").get_json()["data"]
+    }
+    assert (counts["Jazz"]["venue_count"], counts["Jazz"]["artist_count"]) == (1, 1)
+
+    db.session.get(Venue, venue.id).genres = ["Blues"]
+    db.session.commit()
+    assert names(client.get("/api/v1/venues?genre=Jazz")) == []
+    assert names(client.get("/api/v1/venues?genre=Blues")) == ["Hall"]
+    counts = {
+        row["name"]: row for row in client.get("/api/v1/genres").get_json()["data"]
+    }
+    assert counts["Jazz"]["venue_count"] == 0
+    assert counts["Blues"]["venue_count"] == 1
+
+
+def test_show_search_matches_the_artist_or_venue_genre_and_venue_state(client, seed):
+    folk_venue = seed.venue(name="Folk Room", genres=["Folk"], state="CA")
+    jazz_venue = seed.venue(name="Jazz Room", genres=["Jazz"], state="NY")
+    folk_artist = seed.artist(name="Folk Singer", genres=["Folk"])
+    jazz_artist = seed.artist(name="Jazz Trio", genres=["Jazz"])
+    seed.show(folk_venue, jazz_artist, days=1)
+    seed.show(jazz_venue, folk_artist, days=2)
+    seed.show(jazz_venue, jazz_artist, days=3)
+    seed.done()
+
+    def shows(query):
+        data = client.get(f"/api/v1/search/shows?q=&{query}").get_json()["data"]
+        return sorted((row["venue_name"], row["artist_name"]) for row in data)
+
+    assert shows("genre=Folk") == [
+        ("Folk Room", "Jazz Trio"),
+        ("Jazz Room", "Folk Singer"),
+    ]
+    assert shows("genre=Folk&state=NY") == [("Jazz Room", "Folk Singer")]
+    assert len(shows("")) == 3
+
+    page = client.post(
+        "/shows/search", data={"search_term": "", "genre": "Folk", "state": "CA"}
+    ).get_data(as_text=True)
+    assert "Folk Room" in page and "Jazz Room" not in page
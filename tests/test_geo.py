@@ -0,0 +1,113 @@
+import math
+import random
+
+import geo
+from models import Venue
+
+SF = (37.7749, -122.4194)
+
+
+def test_geohash_matches_the_reference_encoding():
+    assert geo.geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geo.geohash(*SF, precision=5) == "9q8yy"
+
+
+def test_distance_km():
+    assert round(geo.distance_km(*SF, 37.8044, -122.2712)) == 13
+    assert geo.distance_km(*SF, *SF) == 0
+
+
+def test_cover_contains_every_point_of_the_circle():
+    rng = random.Random(7)
+    for latitude, longitude, radius in [
+        (*SF, 25),
+        (64.1, -21.9, 150),
+        (0.0, 179.9, 50),
+    ]:
+        cells = geo.cover(latitude, longitude, radius)
+        for _ in range(200):
+            bearing = rng.uniform(0, 2 * math.pi)
+            km = rng.uniform(0, radius)
+            lat = latitude + km * math.cos(bearing) / geo.KM_PER_DEGREE
+            lng = longitude + km * math.sin(bearing) / (
+                geo.KM_PER_DEGREE * math.cos(math.radians(lat))
+            )
+            lng = (lng + 180) % 360 - 180
+            point = geo.geohash(lat, lng)
+            assert any(point.startswith(cell) for cell in cells)
+
+
+def test_venues_are_placed_from_their_city_and_moved_with_it(seed, db):
+    venue = seed.venue(city="San Francisco", state="CA")
+    seed.done()
+    assert (venue.latitude, venue.longitude) == SF
+    assert venue.geohash == geo.geohash(*SF)
+    venue = db.session.get(Venue, venue.id)
+    venue.city, venue.state = "New York", "NY"
+    db.session.commit()
+    assert venue.geohash.startswith("dr5r")
+
+
+def test_nearby_returns_venues_in_the_radius_nearest_first(app, seed):
+    seed.venue(name="Oakland Room", city="Oakland")
+    sf = seed.venue(name="SF Room", city="San Francisco")
+    seed.venue(name="NY Room", city="New York", state="NY")
+    seed.show(sf, seed.artist(name="Act"), days=1)
+    seed.done()
+    venues = geo.nearby(*SF, radius_km=25, limit=10)
+    assert [venue["name"] for venue in venues] == ["SF Room", "Oakland Room"]
+    assert [venue["distance_km"] for venue in venues] == [0, 13.43]
+    assert [show["artist_name"] for show in venues[0]["upcoming_shows"]] == ["Act"]
+    assert venues[1]["upcoming_shows"] == []
+
+
+def test_candidate_cap_keeps_the_nearest_venues(app, seed):
+    # Oakland comes first in id (and so in an unordered scan).
+    seed.venue(name="Oakland Room", city="Oakland")
+    seed.venue(name="SF Room", city="San Francisco")
+    seed.done()
+    venues = geo.nearby(*SF, radius_km=25, limit=1, candidates=1)
+    assert [venue["name"] for venue in venues] == ["SF Room"]
+
+
+def test_near_api_and_its_errors(client, seed):
+    seed.venue(name="SF Room", city="San Francisco")
+    seed.done()
+    body = client.get("/api/v1/venues/near?city=San Francisco&state=CA").get_json()
+    assert body["count"] == 1 and body["data"][0]["name"] == "SF Room"
+    assert body["center"] == {"lat": SF[0], "lng": SF[1]}
+    for query in ("radius=5000&state=CA", "state=ZZ", "lat=95&lng=0", ""):
+        response = client.get(f"/api/v1/venues/near?{query}")
+        assert response.status_code == 400, query
+        assert response.get_json()["error"]
+    page = client.get("/venues/near?lat=37.7749&lng=-122.4194&radius=5")
+    assert "SF Room" in page.get_data(as_text=True)
+
+
+def test_dense_areas_narrow_the_search_instead_of_sorting_it(app, seed, queries):
+    for i in range(4):
+        seed.venue(name=f"SF Room {i}", city="San Francisco")
+    seed.venue(name="Oakland Room", city="Oakland")
+    seed.done()
+    with queries as counted:
+        venues = geo.nearby(*SF, radius_km=25, limit=10, per_venue=0, candidates=4)
+    # Five venues are in range: too many, so only the SF cells are searched.
+    assert [venue["name"] for venue in venues] == [f"SF Room {i}" for i in range(4)]
+    assert len(counted) >= 2
+    for statement in counted.statements:
+        assert "ORDER BY" not in statement
+        assert "LIMIT" in statement
+
+    venues = geo.nearby(*SF, radius_km=25, limit=10, per_venue=0, candidates=5)
+    assert len(venues) == 5
+
+
+def test_deleted_venues_are_not_nearby(app, seed):
+    from deletion import soft_delete_venue
+
+    gone = seed.venue(name="Gone Room", city="San Francisco")
+    seed.venue(name="SF Room", city="San Francisco")
+    seed.done()
+    soft_delete_venue(gone.id)
+    venues = geo.nearby(*SF, radius_km=25, limit=10, per_venue=0)
+    assert [venue["name"] for venue in venues] == ["SF Room"]
@@ -0,0 +1,65 @@
+import logging
+
+import pytest
+
+import instrumentation
+from instrumentation import SlowQueryLog, Timings
+
+
+def test_server_timing_header_lists_the_parts():
+    timings = Timings()
+    timings.db, timings.queries, timings.render = 0.0123, 1, 0.004
+    header = timings.server_timing(0.02)
+    assert header == ('db;dur=12.3;desc="1 query", render;dur=4.0, total;dur=20.0')
+    timings.queries = 3
+    assert 'desc="3 queries"' in timings.server_timing(0.02)
+
+
+def test_server_timing_on_responses(app, client, seed, monkeypatch):
+    seed.venue()
+    seed.done()
+    assert "Server-Timing" not in client.get("/venues").headers
+    monkeypatch.setitem(app.config, "SERVER_TIMING", True)
+    header = client.get("/venues?per_page=5").headers["Server-Timing"]
+    parts = dict(part.split(";", 1) for part in header.split(", "))
+    assert {"db", "render", "total"} <= set(parts)
+    assert "quer" in parts["db"]
+
+
+def test_metrics_count_requests_by_endpoint(client):
+    client.get("/venues")
+    body = client.get("/metrics").get_data(as_text=True)
+    assert (
+        'fyyur_request_seconds_count{endpoint="venues",method="GET",status="200"}'
+        in body
+    )
+    assert "fyyur_page_cache_hits" in body
+    assert "fyyur_fragment_cache_hits" in body
+
+
+@pytest.fixture
+def slow_log(monkeypatch):
+    """Every query counts as slow, with its plan."""
+    monkeypatch.setattr(instrumentation, "_slow_query_log", SlowQueryLog(0))
+    return logging.getLogger("fyyur.slow_query")
+
+
+def test_slow_queries_are_logged_with_their_plan(client, seed, slow_log, caplog):
+    seed.venue()
+    seed.done()
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger=slow_log.name):
+        client.get("/venues/1")
+    messages = [r.getMessage() for r in caplog.records if r.name == slow_log.name]
+    assert messages
+    select = next(m for m in messages if "SELECT" in m)
+    assert "GET /venues/1" in select
+    assert "plan:" in select
+
+
+def test_plan_is_not_read_for_writes(db):
+    log = SlowQueryLog(0)
+    with db.engine.connect() as conn:
+        assert log.plan(conn, "DELETE FROM venue", ()) is None
+        assert "venue" in log.plan(conn, "SELECT id FROM venue", ()).lower()
+        assert log.plan(conn, "SELECT nope FROM nowhere", ()).startswith("(no plan:")
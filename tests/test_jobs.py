@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+import jobs
+from conditional import as_utc
+from models import Job, Show, Venue, utcnow
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Payloads of the test.record job, which fails on {"fail": True}."""
+    made = []
+
+    def record(**payload):
+        made.append(payload)
+        if payload.get("fail"):
+            raise RuntimeError("boom")
+
+    monkeypatch.setitem(jobs.TASKS, "test.record", record)
+    return made
+
+
+def drain(app):
+    jobs.Worker(app, concurrency=2, poll_interval=0.01).run(burst=True)
+
+
+def job(db, job_id):
+    db.session.expire_all()
+    return db.session.get(Job, job_id)
+
+
+def test_worker_runs_due_jobs_and_leaves_later_ones(app, db, calls):
+    now_id = jobs.enqueue("test.record", {"n": 1})
+    later_id = jobs.enqueue(
+        "test.record", {"n": 2}, run_at=utcnow() + timedelta(hours=1)
+    )
+    db.session.commit()
+    drain(app)
+    assert calls == [{"n": 1}]
+    assert job(db, now_id).status == "done"
+    assert job(db, later_id).status == "queued"
+    assert jobs.depth() == {"queued": 1, "running": 0, "done": 1, "failed": 0}
+
+
+def test_a_job_exists_only_if_its_transaction_commits(app, db, calls):
+    jobs.enqueue("test.record")
+    db.session.rollback()
+    assert db.session.scalar(select(func.count()).select_from(Job)) == 0
+
+
+def test_idempotency_key_queues_once(app, db):
+    first = jobs.enqueue("test.record", key="once")
+    assert jobs.enqueue("test.record", key="once") == first
+    db.session.commit()
+    now = utcnow()
+    jobs.enqueue_periodic({"test.record": 60}, now)
+    jobs.enqueue_periodic({"test.record": 60}, now)
+    assert db.session.scalar(select(func.count()).select_from(Job)) == 2
+
+
+def test_failing_job_backs_off_then_fails_then_can_be_retried(app, db, calls):
+    job_id = jobs.enqueue("test.record", {"fail": True}, max_attempts=2)
+    db.session.commit()
+    drain(app)
+    retried = job(db, job_id)
+    assert (retried.status, retried.attempts) == ("queued", 1)
+    assert retried.last_error == "RuntimeError: boom"
+    assert as_utc(retried.run_at) > utcnow()
+
+    retried.run_at = utcnow()
+    db.session.commit()
+    drain(app)
+    assert job(db, job_id).status == "failed"
+    assert len(calls) == 2
+
+    result = app.test_cli_runner().invoke(args=["jobs", "retry", str(job_id)])
+    assert "Requeued 1 jobs" in result.output
+    assert (job(db, job_id).status, job(db, job_id).attempts) == ("queued", 0)
+
+
+def test_unknown_task_fails_without_retrying(app, db):
+    job_id = jobs.enqueue("test.missing")
+    db.session.commit()
+    drain(app)
+    assert job(db, job_id).status == "failed"
+    assert job(db, job_id).attempts == 1
+
+
+def test_jobs_whose_worker_died_are_requeued(app, db):
+    job_id = jobs.enqueue("test.record")
+    db.session.commit()
+    assert len(jobs.claim("dead-worker", 1)) == 1
+    db.session.commit()
+    assert jobs.claim("other-worker", 1) == []
+    later = utcnow() + timedelta(seconds=app.config["JOB_TIMEOUT_SECONDS"] + 1)
+    assert jobs.requeue_stalled(later) == 1
+    assert job(db, job_id).status == "queued"
+
+
+def test_deleting_a_venue_purges_its_shows_in_the_background(app, client, seed, db):
+    venue = seed.venue()
+    for days in (1, 2):
+        seed.show(venue, seed.artist(), days=days)
+    seed.done()
+    client.get(f"/venues/delete/{venue.id}")
+    assert db.session.scalar(select(func.count()).select_from(Show)) == 2
+    drain(app)
+    assert db.session.scalar(select(func.count()).select_from(Show)) == 0
+    assert (
+        db.session.scalar(
+            select(func.count())
+            .select_from(Venue)
+            .execution_options(include_deleted=True)
+        )
+        == 0
+    )
@@ -0,0 +1,50 @@
+import re
+
+
+def headings(page):
+    return re.findall(r"<h3>(.*?)</h3>", page)
+
+
+def venue_names(page):
+    return re.findall(r"<h5>(.*?)</h5>", page)
+
+
+def test_venues_are_grouped_by_city_in_one_ordered_pass(client, seed):
+    seed.venue(name="Zed", city="San Francisco", state="CA")
+    seed.venue(name="Alpha", city="New York", state="NY")
+    seed.venue(name="Beta", city="San Francisco", state="CA")
+    seed.venue(name="Gamma", city="Oakland", state="CA")
+    seed.done()
+    page = client.get("/venues").get_data(as_text=True)
+    # By state, then city, then name.
+    assert headings(page) == ["Oakland, CA", "San Francisco, CA", "New York, NY"]
+    assert venue_names(page) == ["Gamma", "Beta", "Zed", "Alpha"]
+
+
+def test_an_area_split_across_pages_continues_on_the_next(client, seed):
+    for name in ("A", "B", "C"):
+        seed.venue(name=name, city="San Francisco", state="CA")
+    seed.done()
+    first = client.get("/venues?per_page=2").get_data(as_text=True)
+    assert headings(first) == ["San Francisco, CA"]
+    assert venue_names(first) == ["A", "B"]
+    cursor = re.search(r"cursor=([\w-]+)", first).group(1)
+    second = client.get(f"/venues?per_page=2&cursor={cursor}").get_data(as_text=True)
+    assert headings(second) == ["San Francisco, CA"]
+    assert venue_names(second) == ["C"]
+
+
+def test_sort_by_name(client, seed):
+    seed.venue(name="Zed", city="Oakland")
+    seed.venue(name="Alpha", city="San Francisco")
+    seed.done()
+    page = client.get("/venues?sort=name").get_data(as_text=True)
+    assert venue_names(page) == ["Alpha", "Zed"]
+
+
+def test_upcoming_counts_are_shown(client, seed):
+    venue = seed.venue(name="Hall")
+    for days in (1, 2, -1):
+        seed.show(venue, seed.artist(), days=days)
+    seed.done()
+    assert "2 upcoming shows" in client.get("/venues").get_data(as_text=True)
@@ -0,0 +1,177 @@
+import logging
+import os
+
+import flask_migrate
+import pytest
+import sqlalchemy as sa
+
+# The schema as the original app created it, before the first revision.
+LEGACY = sa.MetaData()
+
+
+def profile_columns():
+    return [
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("name", sa.String(120), index=True),
+        sa.Column("city", sa.String(120)),
+        sa.Column("state", sa.String(120)),
+        sa.Column("phone", sa.String(120)),
+        sa.Column("genres", sa.JSON),
+        sa.Column("image_link", sa.String(500)),
+        sa.Column("facebook_link", sa.String(120)),
+        sa.Column("website_link", sa.String(120)),
+        sa.Column("seeking_description", sa.Text),
+    ]
+
+
+sa.Table(
+    "Venue",
+    LEGACY,
+    *profile_columns(),
+    sa.Column("address", sa.String(120)),
+    sa.Column("seeking_talent", sa.Boolean),
+)
+sa.Table("Artist", LEGACY, *profile_columns(), sa.Column("seeking_venue", sa.Boolean))
+sa.Table(
+    "Show",
+    LEGACY,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("venue_id", sa.ForeignKey("Venue.id")),
+    sa.Column("artist_id", sa.ForeignKey("Artist.id")),
+    # The first revision makes this a string; ShowForm wrote start times as
+    # "%Y-%m-%d %H:%M:%S".
+    sa.Column("start_time", sa.String(200)),
+)
+
+PAST, UPCOMING = "2019-05-21 21:30:00", "2035-04-01 20:00:00"
+
+
+@pytest.fixture
+def legacy(app):
+    """The app's database in the original schema, holding one venue with a
+    past and an upcoming show; call it to run ``flask db upgrade [revision]``."""
+    from cache import cache
+    from models import db
+
+    def upgrade(revision="head"):
+        # env.py's fileConfig() disables every logger it does not list.
+        enabled = [
+            logger
+            for logger in logging.Logger.manager.loggerDict.values()
+            if isinstance(logger, logging.Logger) and not logger.disabled
+        ]
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+        try:
+            flask_migrate.upgrade(
+                directory=os.path.join(app.root_path, "migrations"), revision=revision
+            )
+        finally:
+            for logger in enabled:
+                logger.disabled = False
+            root.handlers[:], root.level = handlers, level
+
+    with app.app_context():
+        path = db.engine.url.database
+        db.engine.dispose()
+        if os.path.exists(path):
+            os.remove(path)
+        with db.engine.begin() as conn:
+            LEGACY.create_all(conn)
+            conn.execute(
+                LEGACY.tables["Venue"].insert(),
+                {
+                    "name": "The Musical Hop",
+                    "city": "San Francisco",
+                    "state": "CA",
+                    "address": "1015 Folsom Street",
+                    "phone": "123-123-1234",
+                    "genres": ["Jazz", "Reggae"],
+                },
+            )
+            conn.execute(
+                LEGACY.tables["Artist"].insert(),
+                {"name": "Guns N Petals", "city": "San Francisco", "state": "CA"},
+            )
+            conn.execute(
+                LEGACY.tables["Show"].insert(),
+                [
+                    {"venue_id": 1, "artist_id": 1, "start_time": start_time}
+                    for start_time in (PAST, UPCOMING)
+                ],
+            )
+        cache.backend.clear()
+        yield upgrade
+        db.session.remove()
+        db.engine.dispose()
+        os.remove(path)
+
+
+def test_upgrade_keeps_show_start_times(app, legacy):
+    from models import Show, db
+
+    legacy()
+    starts = db.session.execute(sa.select(Show.start_time).order_by(Show.id))
+    assert [str(start) for start in starts.scalars()] == [PAST, UPCOMING]
+
+    response = app.test_client().get("/venues/1")
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert "Guns N Petals" in page
+    assert "1 Past Show" in page and "1 Upcoming Show" in page
+
+
+def sqlite_objects(kind):
+    from models import db
+
+    rows = db.session.execute(
+        sa.text("SELECT name FROM sqlite_master WHERE type = :kind"), {"kind": kind}
+    )
+    return set(rows.scalars())
+
+
+SEARCH_TRIGGERS = {
+    f"{fts}_{suffix}"
+    for fts in ("venue_search", "artist_search")
+    for suffix in ("ai", "ad", "au")
+}
+
+
+def test_table_rebuilds_keep_the_search_triggers_and_prefix_indexes(legacy):
+    legacy()
+    assert SEARCH_TRIGGERS <= sqlite_objects("trigger")
+    assert {"ix_Venue_name_prefix", "ix_Artist_name_prefix"} <= sqlite_objects("index")
+
+
+def test_venues_added_after_upgrading_are_searchable(app, legacy):
+    from models import db
+    from search import get_search
+
+    # Stop right after the updated_at rebuild, and add a venue there.
+    legacy("c2e8b14f9a37")
+    assert SEARCH_TRIGGERS <= sqlite_objects("trigger")
+    db.session.execute(
+        sa.text(
+            'INSERT INTO "Venue" (name, city, state, genres) '
+            "VALUES ('Zebra Lounge', 'Oakland', 'CA', '[\"Jazz\"]')"
+        )
+    )
+    db.session.commit()
+
+    legacy()
+    response = app.test_client().post(
+        "/venues/create",
+        data={
+            "name": "Yak Club",
+            "city": "Oakland",
+            "state": "CA",
+            "address": "1 Broadway",
+            "phone": "510-555-0100",
+            "genres": ["Jazz"],
+            "facebook_link": "https://www.facebook.com/yakclub",
+        },
+    )
+    assert response.status_code in (200, 302)
+    for name in ("Zebra Lounge", "Yak Club"):
+        hits = get_search().venues(name.split()[0].lower())
+        assert [row.name for row in hits] == [name]
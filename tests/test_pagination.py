@@ -0,0 +1,80 @@
+from models import Artist
+from pagination import decode_cursor, encode_cursor
+
+
+def walk(client, path):
+    """The ids on every page of ``path``, following the next cursors."""
+    pages = []
+    url = path
+    while url:
+        body = client.get(url).get_json()
+        pages.append([row["id"] for row in body["data"]])
+        cursor = body["next_cursor"]
+        url = f"{path}&cursor={cursor}" if cursor else None
+    return pages
+
+
+def test_pages_cover_every_row_once_in_order(client, seed):
+    # Repeated names: the id breaks the tie, so no row is skipped or repeated.
+    artists = [seed.artist(name=f"Artist {i % 3}") for i in range(7)]
+    seed.done()
+    pages = walk(client, "/api/v1/artists?per_page=3")
+    assert [len(page) for page in pages] == [3, 3, 1]
+    expected = sorted(artists, key=lambda artist: (artist.name, artist.id))
+    assert sum(pages, []) == [artist.id for artist in expected]
+
+
+def test_prev_cursor_returns_the_previous_page(client, seed):
+    for i in range(5):
+        seed.artist(name=f"Artist {i}")
+    seed.done()
+    first = client.get("/api/v1/artists?per_page=2").get_json()
+    assert first["prev_cursor"] is None
+    second = client.get(
+        f"/api/v1/artists?per_page=2&cursor={first['next_cursor']}"
+    ).get_json()
+    back = client.get(
+        f"/api/v1/artists?per_page=2&cursor={second['prev_cursor']}"
+    ).get_json()
+    assert back["data"] == first["data"]
+    assert back["prev_cursor"] is None
+
+
+def test_a_row_inserted_before_the_cursor_does_not_shift_later_pages(client, seed):
+    for i in range(4):
+        seed.artist(name=f"Artist {i}")
+    seed.done()
+    first = client.get("/api/v1/artists?per_page=2").get_json()
+    seed.artist(name="Aardvark")
+    seed.done()
+    second = client.get(
+        f"/api/v1/artists?per_page=2&cursor={first['next_cursor']}"
+    ).get_json()
+    assert [row["name"] for row in second["data"]] == ["Artist 2", "Artist 3"]
+
+
+def test_malformed_cursor_starts_from_the_first_page(client, seed):
+    for i in range(3):
+        seed.artist(name=f"Artist {i}")
+    seed.done()
+    first = client.get("/api/v1/artists?per_page=2").get_json()
+    assert client.get("/api/v1/artists?per_page=2&cursor=garbage").get_json() == first
+
+
+def test_cursor_round_trip(db):
+    keys = (Artist.name, Artist.id)
+    assert decode_cursor(encode_cursor("prev", ["Artist", 3]), keys) == (
+        "prev",
+        ["Artist", 3],
+    )
+    assert decode_cursor(encode_cursor("sideways", ["Artist", 3]), keys) is None
+    assert decode_cursor(encode_cursor("next", ["Artist"]), keys) is None
+
+
+def test_html_listing_links_the_next_page(client, seed):
+    for i in range(3):
+        seed.artist(name=f"Artist {i}")
+    seed.done()
+    page = client.get("/artists?per_page=2").get_data(as_text=True)
+    assert "Artist 1" in page and "Artist 2" not in page
+    assert "cursor=" in page
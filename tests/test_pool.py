@@ -0,0 +1,84 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import NullPool
+
+import pool
+from pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool
+
+PG = "postgresql://fyyur:secret@db:5432/fyyur"
+
+
+def test_sqlite_keeps_its_default_pool():
+    assert pool.engine_options("sqlite:///fyyur.db") == {}
+
+
+def test_postgres_gets_the_instrumented_pool():
+    options = pool.engine_options(
+        PG, pool_size=8, max_overflow=2, pool_timeout=5, statement_timeout_ms=1500
+    )
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert (options["pool_size"], options["max_overflow"]) == (8, 2)
+    assert options["pool_timeout"] == 5
+    assert options["connect_args"] == {"options": "-c statement_timeout=1500"}
+
+
+def test_async_engines_set_the_timeout_as_a_server_setting():
+    options = pool.engine_options(PG, statement_timeout_ms=1500, is_async=True)
+    assert options["poolclass"] is InstrumentedAsyncQueuePool
+    assert options["connect_args"] == {"server_settings": {"statement_timeout": "1500"}}
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+def test_pgbouncer_leaves_pooling_to_pgbouncer(is_async):
+    options = pool.engine_options(
+        PG, pgbouncer=True, statement_timeout_ms=1500, is_async=is_async
+    )
+    assert options["poolclass"] is NullPool
+    # No "options" startup parameter, which PgBouncer rejects.
+    assert "options" not in options.get("connect_args", {})
+    if is_async:
+        assert options["connect_args"]["statement_cache_size"] == 0
+
+
+def test_async_uri_swaps_the_driver():
+    assert pool.async_uri(PG) == "postgresql+asyncpg://fyyur:secret@db:5432/fyyur"
+    assert pool.async_uri("sqlite:///fyyur.db") == "sqlite+aiosqlite:///fyyur.db"
+    assert pool.async_uri("mysql://db/fyyur") == "mysql://db/fyyur"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.05,
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_pool_reports_overflow_and_timeouts(engine):
+    overflows = pool.overflow_events._default().value
+    timeouts = pool.checkout_timeouts._default().value
+    first = engine.connect()
+    second = engine.connect()
+    assert pool.overflow_events._default().value == overflows + 1
+    assert pool._pool_stat("checkedout")() >= 2
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    assert pool.checkout_timeouts._default().value == timeouts + 1
+    first.close()
+    second.close()
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_disposed_pools_stop_being_exported(engine):
+    with engine.connect():
+        assert engine.pool in pool._pools
+    old = engine.pool
+    engine.dispose()
+    assert old not in pool._pools
+    assert engine.pool in pool._pools
@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from models import utcnow
+from queries import artist_shows, past_and_upcoming, split_shows, venue_shows
+
+
+def test_shows_split_at_now_in_order(db, seed):
+    venue = seed.venue()
+    for days in (-2, 5, -9, 1):
+        seed.show(venue, seed.artist(name=f"Artist {days}"), days=days)
+    seed.done()
+    past, upcoming = split_shows(venue_shows(venue.id))
+    assert [s["artist_name"] for s in past] == ["Artist -2", "Artist -9"]
+    assert [s["artist_name"] for s in upcoming] == ["Artist 1", "Artist 5"]
+
+
+def test_a_show_starting_now_is_past(db, seed):
+    venue, artist = seed.venue(), seed.artist()
+    show = seed.show(venue, artist, days=0)
+    seed.done()
+    past, upcoming = past_and_upcoming(artist_shows(artist.id), now=show.start_time)
+    assert len(db.session.execute(past).all()) == 1
+    assert db.session.execute(upcoming).all() == []
+    earlier = show.start_time - timedelta(seconds=1)
+    past, upcoming = past_and_upcoming(artist_shows(artist.id), now=earlier)
+    assert db.session.execute(past).all() == []
+    assert len(db.session.execute(upcoming).all()) == 1
+
+
+def test_range_scans_use_the_show_indexes(db):
+    for stmt, index in (
+        (venue_shows(1), "ix_Show_venue_id_start_time"),
+        (artist_shows(1), "ix_Show_artist_id_start_time"),
+    ):
+        for half in past_and_upcoming(stmt, now=utcnow()):
+            compiled = half.compile(db.engine, compile_kwargs={"literal_binds": True})
+            with db.engine.connect() as conn:
+                plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").all()
+            assert any(index in row[-1] for row in plan), plan
@@ -0,0 +1,52 @@
+import pytest
+
+from cache import cache
+
+# Statements per uncached page view. Each must stay the same however many
+# venues, artists and shows there are: one more row must never mean one
+# more query.
+PAGES = [
+    ("/venues", 2),
+    ("/artists", 2),
+    ("/shows", 1),
+    ("/venues/1", 4),
+    ("/artists/1", 4),
+]
+
+
+def grow(seed, size):
+    """``size`` more venues and artists, each venue with past and upcoming
+    shows by three of the artists."""
+    venues = [seed.venue() for _ in range(size)]
+    artists = [seed.artist() for _ in range(size)]
+    for i, venue in enumerate(venues):
+        for j, artist in enumerate(artists[:3]):
+            seed.show(venue, artist, days=-(i + j + 1))
+            seed.show(venue, artist, days=i + j + 1)
+    seed.done()
+
+
+def count(client, queries, path):
+    cache.backend.clear()
+    with queries as counted:
+        response = client.get(path)
+    assert response.status_code == 200
+    return len(counted)
+
+
+@pytest.mark.parametrize("path,expected", PAGES)
+def test_query_count_does_not_grow_with_rows(client, seed, queries, path, expected):
+    grow(seed, 2)
+    assert count(client, queries, path) == expected
+    grow(seed, 20)
+    assert count(client, queries, path) == expected
+
+
+@pytest.mark.parametrize("path", [path for path, _ in PAGES])
+def test_cached_page_runs_no_queries_but_validation(client, seed, queries, path):
+    grow(seed, 2)
+    uncached = count(client, queries, path)
+    with queries as counted:
+        assert client.get(path).status_code == 200
+    # At most the freshness lookup behind the ETag is left.
+    assert len(counted) < uncached
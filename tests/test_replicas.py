@@ -0,0 +1,108 @@
+import time
+
+import pytest
+import sqlalchemy as sa
+from flask import g
+
+from cache import cache
+from models import Venue
+from replicas import PIN_COOKIE, Replica, ReplicaSet
+
+
+@pytest.fixture
+def replica(app, db, seed, tmp_path, monkeypatch):
+    """A second SQLite file as the replica, holding a venue 1 of its own
+    name, so every read shows which database served it."""
+    seed.venue(name="Primary Hall")
+    seed.done()
+    engine = sa.create_engine("sqlite:///" + str(tmp_path / "replica.db"))
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            sa.insert(Venue.__table__).values(
+                id=1,
+                name="Replica Hall",
+                city="San Francisco",
+                state="CA",
+                genres=["Jazz"],
+            )
+        )
+    replica = Replica("replica_0", engine)
+    monkeypatch.setitem(app.extensions, "replicas", ReplicaSet([replica]))
+    yield replica
+    engine.dispose()
+
+
+def venue_name(db):
+    return db.session.scalar(sa.select(Venue.name).where(Venue.id == 1))
+
+
+def replica_names(replica):
+    with replica.engine.connect() as connection:
+        return connection.scalars(sa.select(Venue.__table__.c.name)).all()
+
+
+def test_replica_reads_views_read_from_the_replica(client, replica):
+    assert client.get("/api/v1/venues/1").get_json()["name"] == "Replica Hall"
+    assert "Replica Hall" in client.get("/venues/1").get_data(as_text=True)
+
+
+def test_other_views_read_from_the_primary(client, replica):
+    assert "Primary Hall" in client.get("/venues/1/edit").get_data(as_text=True)
+
+
+def test_writes_and_later_reads_in_the_request_use_the_primary(app, db, replica):
+    with app.test_request_context("/venues/1"):
+        g.replica_reads = True
+        assert venue_name(db) == "Replica Hall"
+
+        db.session.add(Venue(name="New Hall", city="Oakland", state="CA"))
+        db.session.flush()
+        assert venue_name(db) == "Primary Hall"
+        db.session.commit()
+        assert venue_name(db) == "Primary Hall"
+
+    assert replica_names(replica) == ["Replica Hall"]
+    assert db.session.scalar(sa.select(Venue.id).where(Venue.name == "New Hall"))
+
+
+def test_form_writes_go_to_the_primary(client, db, replica):
+    response = client.post(
+        "/venues/create",
+        data={
+            "name": "New Hall",
+            "city": "Oakland",
+            "state": "CA",
+            "address": "1 Main St",
+            "phone": "510-555-0100",
+            "genres": ["Jazz"],
+            "facebook_link": "https://www.facebook.com/newhall",
+        },
+    )
+    assert response.status_code == 200
+    assert replica_names(replica) == ["Replica Hall"]
+    assert db.session.scalar(sa.select(Venue.id).where(Venue.name == "New Hall"))
+
+
+def test_client_pinned_after_a_write_reads_from_the_primary(client, replica):
+    client.set_cookie("localhost", PIN_COOKIE, "1")
+    assert client.get("/api/v1/venues/1").get_json()["name"] == "Primary Hall"
+
+
+def test_pinned_clients_skip_the_page_cache(app, client, replica):
+    # A replica read re-fills the page after the write invalidated it.
+    assert "Replica Hall" in client.get("/venues/1").get_data(as_text=True)
+
+    pinned = app.test_client()
+    pinned.set_cookie("localhost", PIN_COOKIE, "1")
+    fragments = dict(cache.counts["fragments"])
+    assert "Primary Hall" in pinned.get("/venues/1").get_data(as_text=True)
+    assert cache.counts["fragments"] == fragments
+    # Nor is the pinned rendering stored for everyone else.
+    assert "Replica Hall" in client.get("/venues/1").get_data(as_text=True)
+
+
+def test_unhealthy_replica_falls_back_to_the_primary(client, replica):
+    replica.healthy = False
+    replica.checked_at = time.monotonic()
+    assert client.get("/api/v1/venues/1").get_json()["name"] == "Primary Hall"
@@ -0,0 +1,75 @@
+from sqlalchemy import func, select
+
+import counters
+import scheduling
+from models import Show, UpcomingShow, Venue
+
+
+def show_count(db, model=Show):
+    return db.session.scalar(select(func.count()).select_from(model))
+
+
+def post_batch(client, shows):
+    return client.post("/api/v1/shows/batch", json={"shows": shows})
+
+
+def test_batch_inserts_every_show_with_counters_and_feed(client, seed, db):
+    venue, artist = seed.venue(), seed.artist()
+    seed.done()
+    shows = [
+        {"artist_id": artist.id, "venue_id": venue.id, "start_time": start}
+        for start in ("2035-01-01 20:00", "2035-01-02 20:00", "2035-01-03 20:00")
+    ]
+    response = post_batch(client, shows)
+    assert response.status_code == 201
+    assert response.get_json()["created"] == 3
+    assert show_count(db) == show_count(db, UpcomingShow) == 3
+    assert db.session.get(Venue, venue.id).upcoming_shows_count == 3
+    assert not list(counters.drift(Venue))
+
+
+def test_one_bad_row_rejects_the_whole_batch(client, seed, db):
+    venue, artist = seed.venue(), seed.artist()
+    seed.show(venue, artist, days=30)
+    seed.done()
+    taken = db.session.scalar(select(Show.start_time)).strftime("%Y-%m-%d %H:%M")
+    response = post_batch(
+        client,
+        [
+            {"artist_id": artist.id, "venue_id": venue.id, "start_time": "2035-05-01"},
+            {"artist_id": 999, "venue_id": venue.id, "start_time": "2035-06-01"},
+            {"artist_id": artist.id, "venue_id": venue.id, "start_time": taken},
+            {"artist_id": "x", "venue_id": venue.id, "start_time": "soon"},
+        ],
+    )
+    assert response.status_code == 422
+    errors = {row["row"]: row["errors"] for row in response.get_json()["errors"]}
+    assert set(errors) == {2, 3, 4}
+    assert errors[2] == ["There is no artist 999."]
+    assert errors[3][0].startswith(f"Venue {venue.id} already has a show")
+    assert len(errors[4]) == 2
+    assert show_count(db) == 1
+
+
+def test_rows_of_one_batch_may_not_overlap(app, seed, db):
+    venue, artist = seed.venue(), seed.artist()
+    seed.done()
+    rows = scheduling.rows_from_text(
+        "artist_id,venue_id,start_time\n"
+        f"{artist.id},{venue.id},2035-01-01 20:00\n"
+        f"{artist.id},{venue.id},2035-01-01 21:00\n"
+    )
+    assert scheduling.schedule(rows) == []
+    # Rows are numbered by line, header included.
+    assert rows[1].errors == [f"Overlaps row 2 at venue {venue.id}."]
+
+
+def test_batch_form_lists_the_shows(client, seed, db):
+    venue, artist = seed.venue(), seed.artist()
+    seed.done()
+    response = client.post(
+        "/shows/batch",
+        data={"rows": f"{artist.id},{venue.id},2035-01-01 20:00"},
+    )
+    assert "1 shows were successfully listed!" in response.get_data(as_text=True)
+    assert show_count(db) == 1
@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import select
+
+from models import Venue
+from search import SearchBackend, SqliteSearch, get_search
+
+
+@pytest.fixture
+def venues(seed):
+    seed.venue(name="The Musical Hop", city="San Francisco")
+    seed.venue(name="Park Square Live Music & Coffee", city="Oakland")
+    seed.venue(name="The Dueling Pianos Bar", city="New York", state="NY")
+    seed.venue(name="100% Jazz_Club")
+    seed.done()
+
+
+def names(rows):
+    return sorted(row.name for row in rows)
+
+
+@pytest.mark.parametrize("backend", [SqliteSearch(50), SearchBackend(50)])
+def test_search_is_partial_and_case_insensitive(venues, backend):
+    assert names(backend.venues("Hop")) == ["The Musical Hop"]
+    assert names(backend.venues("music")) == [
+        "Park Square Live Music & Coffee",
+        "The Musical Hop",
+    ]
+    # City, state and genres are searched too.
+    assert names(backend.venues("oakland")) == ["Park Square Live Music & Coffee"]
+    assert names(backend.venues("ny")) == ["The Dueling Pianos Bar"]
+
+
+def test_like_wildcards_are_literal(venues):
+    assert names(SearchBackend(50).venues("100%")) == ["100% Jazz_Club"]
+    assert names(SearchBackend(50).venues("z_c")) == ["100% Jazz_Club"]
+    assert SearchBackend(50).venues("0_%") == []
+
+
+def test_sqlite_index_follows_edits(venues, db):
+    venue = db.session.scalar(select(Venue).where(Venue.name == "The Musical Hop"))
+    venue.name = "The Quiet Room"
+    db.session.commit()
+    backend = get_search()
+    assert names(backend.venues("hop")) == []
+    assert names(backend.venues("quiet")) == ["The Quiet Room"]
+
+
+def test_show_search_matches_artist_or_venue(client, seed):
+    hop = seed.venue(name="The Musical Hop")
+    bar = seed.venue(name="The Dueling Pianos Bar")
+    guns = seed.artist(name="Guns N Petals")
+    seed.show(hop, guns, days=1)
+    seed.show(bar, seed.artist(name="Matt Quevedo"), days=2)
+    seed.done()
+    results = get_search().shows("petals")
+    assert [row.venue_name for row in results] == ["The Musical Hop"]
+    results = get_search().shows("pianos")
+    assert [row.artist_name for row in results] == ["Matt Quevedo"]
+
+    page = client.post("/artists/search", data={"search_term": "GUNS"})
+    assert "Guns N Petals" in page.get_data(as_text=True)
+    assert "Matt Quevedo" not in page.get_data(as_text=True)